@@ -1,124 +1,157 @@
 """Главный файл приложения SmartHome Dashboard"""
 import sys
+from src.utils.timing import StageTimer
+
+# Замер начинается до импорта Qt и остальных модулей
+startup_timer = StageTimer()
+
 from PySide6.QtWidgets import QApplication
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 from src.storage.storage import Storage
 from src.core.event_bus import EventBus
 from src.core.simulator import SimulatorManager
-from src.core.automation import AutomationEngine
+from src.core.automation import AutomationEngine, RuleActionExecutor
+from src.core.scheduler import Scheduler
+from src.core.health import HealthMonitor
+from src.core.scenes import SceneManager
 from src.utils.logger import Logger
+from src.utils.retention import LogCompactor
 from src.ui.main_window import MainWindow
-from src.ui.dashboard import DashboardWidget
-from src.ui.rooms import RoomsWidget
-from src.ui.devices import DevicesWidget
-from src.ui.automations import AutomationsWidget
-from src.ui.logs import LogsWidget
-from src.ui.settings import SettingsWidget
+from src.ui.styles import APP_STYLESHEET
 
 
 def main():
     """Главная функция"""
+    startup_timer.mark("импорт")
+    
     # Создать приложение
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
     
     # Тёмная тема
-    app.setStyleSheet("""
-        QMainWindow {
-            background-color: #1e1e1e;
-        }
-        QWidget {
-            background-color: #1e1e1e;
-            color: white;
-        }
-        QDialog {
-            background-color: #2b2b2b;
-        }
-        QLineEdit, QSpinBox, QDoubleSpinBox, QComboBox {
-            background-color: #1e1e1e;
-            color: white;
-            border: 1px solid #3a3a3a;
-            padding: 5px;
-            border-radius: 4px;
-        }
-        QLineEdit:focus, QSpinBox:focus, QDoubleSpinBox:focus, QComboBox:focus {
-            border: 1px solid #0078d4;
-        }
-        QPushButton {
-            background-color: #0078d4;
-            color: white;
-            border: none;
-            padding: 8px 16px;
-            border-radius: 6px;
-        }
-        QPushButton:hover {
-            background-color: #106ebe;
-        }
-        QPushButton:pressed {
-            background-color: #005a9e;
-        }
-    """)
+    app.setStyleSheet(APP_STYLESHEET)
+    startup_timer.mark("QApplication")
     
     # Инициализировать компоненты
     storage = Storage()
     event_bus = EventBus()
-    simulator_manager = SimulatorManager(event_bus)
-    automation_engine = AutomationEngine(event_bus)
+    simulator_manager = SimulatorManager(event_bus, storage)
+    scheduler = Scheduler()
+    automation_engine = AutomationEngine(event_bus, scheduler)
     logger = Logger(storage, event_bus)
     
-    # Загрузить устройства и создать симуляторы
+    # Режим MQTT: показания и состояния приходят от устройств через брокер
+    mqtt_bridge = None
+    settings = storage.get_settings()
+    if settings.get("mode") == "mqtt":
+        from src.mqtt.transport import MqttBridge, create_connection
+        mqtt = settings.get("mqtt", {})
+        try:
+            connection = create_connection(mqtt)
+        except (RuntimeError, OSError) as e:
+            print(f"MQTT unavailable, using local simulation: {e}")
+        else:
+            mqtt_bridge = MqttBridge(storage, event_bus, connection, mqtt.get("base_topic", "smarthome"))
+            # Несохранённые состояния записываются до закрытия хранилища
+            app.aboutToQuit.connect(mqtt_bridge.stop)
+            app.aboutToQuit.connect(connection.close)
+    
+    # Буфер логов и показания датчиков дописываются до закрытия хранилища
+    app.aboutToQuit.connect(simulator_manager.save_pending)
+    app.aboutToQuit.connect(logger.close)
+    app.aboutToQuit.connect(storage.close)
+    
+    # Запись всех событий в файлы захвата (для воспроизведения и отладки)
+    capture = storage.get_settings().get("capture", {})
+    if capture.get("enabled"):
+        from src.storage.capture import EventRecorder
+        recorder = EventRecorder(event_bus, capture.get("directory", "data/captures"))
+        app.aboutToQuit.connect(recorder.close)
+    
+    # Загрузить устройства и создать симуляторы (в режиме MQTT - только для управления актуаторами)
     devices = storage.get_devices()
     for device in devices:
-        simulator_manager.add_device(device)
+        if mqtt_bridge is None or device.category == "actuator":
+            simulator_manager.add_device(device)
     
     # Загрузить правила
     rules = {r.id: r for r in storage.get_rules()}
     devices_dict = {d.id: d for d in devices}
+    automation_engine.set_location(storage.get_settings().get("location"))
     automation_engine.set_rules(rules)
     automation_engine.set_devices(devices_dict)
+    scene_manager = SceneManager(storage, event_bus, simulator_manager)
+    startup_timer.mark("хранилище и симуляторы")
     
     # Подключить управление устройствами из правил
-    def on_rule_triggered(event: dict):
-        data = event.get("data", {})
-        device_id = data.get("device_id")
-        action = data.get("action")
-        action_value = data.get("action_value")
-        simulator_manager.control_device(device_id, action, action_value)
+    rule_executor = RuleActionExecutor(event_bus, simulator_manager, scheduler)
     
-    event_bus.subscribe("rule_triggered", on_rule_triggered)
+    # Контроль связи с устройствами
+    health_monitor = HealthMonitor(storage, event_bus, scheduler)
+    
+    # Уплотнение логов по срокам хранения
+    log_compactor = LogCompactor(storage, scheduler, event_bus)
+    log_compactor.start()
     
     # Создать главное окно
     main_window = MainWindow()
     
-    # Создать виджеты экранов
-    dashboard = DashboardWidget(storage, event_bus, simulator_manager)
-    rooms = RoomsWidget(storage, event_bus, simulator_manager)
-    devices_widget = DevicesWidget(storage, event_bus, simulator_manager)
-    automations = AutomationsWidget(storage, event_bus, automation_engine)
-    logs = LogsWidget(storage, event_bus)
-    settings = SettingsWidget(storage, event_bus)
-    
-    # Добавить виджеты в главное окно
-    main_window.add_widget("dashboard", dashboard)
-    main_window.add_widget("rooms", rooms)
-    main_window.add_widget("devices", devices_widget)
-    main_window.add_widget("automations", automations)
-    main_window.add_widget("logs", logs)
-    main_window.add_widget("settings", settings)
-    
-    # Подключить обновление дашборда
-    dashboard.refresh_needed.connect(lambda: (
-        dashboard.refresh(),
-        rooms.refresh(),
-        devices_widget.refresh()
-    ))
+    # Экраны создаются при первом открытии, модули UI импортируются там же
+    def create_dashboard():
+        from src.ui.dashboard import DashboardWidget
+        return DashboardWidget(storage, event_bus, simulator_manager, scene_manager)
+    
+    def create_rooms():
+        from src.ui.rooms import RoomsWidget
+        return RoomsWidget(storage, event_bus, simulator_manager)
+    
+    def create_devices():
+        from src.ui.devices import DevicesWidget
+        return DevicesWidget(storage, event_bus, simulator_manager, health_monitor)
+    
+    def create_automations():
+        from src.ui.automations import AutomationsWidget
+        return AutomationsWidget(storage, event_bus, automation_engine)
+    
+    def create_logs():
+        from src.ui.logs import LogsWidget
+        return LogsWidget(storage, event_bus)
+    
+    def create_settings():
+        from src.ui.settings import SettingsWidget
+        return SettingsWidget(storage, event_bus)
+    
+    main_window.add_screen("dashboard", create_dashboard)
+    main_window.add_screen("rooms", create_rooms)
+    main_window.add_screen("devices", create_devices)
+    main_window.add_screen("automations", create_automations)
+    main_window.add_screen("logs", create_logs)
+    main_window.add_screen("settings", create_settings)
+    startup_timer.mark("главное окно")
     
     # Логировать запуск
     logger.log_system("Приложение запущено")
     
+    # Загрузка состояния парка из retained сообщений и приём показаний
+    if mqtt_bridge is not None:
+        event_bus.subscribe("fleet_synced", lambda event: logger.log_system(
+            f"Состояние устройств загружено из MQTT за {event['data']['seconds']:.2f} с: "
+            f"устройств {event['data']['devices']}, новых {event['data']['added']}, "
+            f"обновлено {event['data']['updated']}"
+        ))
+        mqtt_bridge.start()
+    
     # Показать окно
     main_window.show()
     
+    # Отчёт о времени запуска после первой отрисовки окна
+    def report_startup():
+        startup_timer.mark("первая отрисовка")
+        screens = ", ".join(f"{key} {ms:.0f} мс" for key, ms in main_window.build_times.items())
+        logger.log_system(f"Время запуска: {startup_timer.summary()} (экраны: {screens})")
+    
+    QTimer.singleShot(0, report_startup)
+    
     # Запустить приложение
     sys.exit(app.exec())
 
@@ -0,0 +1,153 @@
+"""Агрегаты значений датчиков по скользящему окну
+
+Каждый агрегат обновляется за амортизированное O(1) на отсчёт: значения
+хранятся в кольцевом буфере (deque), среднее считается по текущей сумме,
+минимум и максимум - по монотонной очереди. Устаревшие отсчёты удаляются
+с начала буфера при добавлении нового значения или при чтении.
+
+Формат условия с агрегатом:
+    {"sensor_id": "dev_1", "aggregate": "avg", "window": 300, "condition": ">", "value": 26.0}
+    {"sensor_id": "dev_3", "aggregate": "count", "window": 60, "condition": ">", "value": 2}
+"""
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+
+# Максимум отсчётов в окне - защита от слишком частых обновлений
+MAX_SAMPLES = 10000
+
+AGGREGATE_KINDS = ("avg", "count", "min", "max")
+
+
+def _number(value: Any) -> Optional[float]:
+    """Числовое значение отсчёта или None"""
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+class WindowAggregate(ABC):
+    """Базовый агрегат по окну window секунд"""
+    
+    def __init__(self, window: float):
+        self.window = window
+    
+    @abstractmethod
+    def add(self, t: float, value: Any):
+        """Добавить отсчёт в момент t (секунды)"""
+    
+    @abstractmethod
+    def value(self, t: float) -> Optional[float]:
+        """Значение агрегата в момент t"""
+
+
+class AvgAggregate(WindowAggregate):
+    """Среднее значение: буфер отсчётов и текущая сумма"""
+    
+    def __init__(self, window: float):
+        super().__init__(window)
+        self._samples: deque = deque()
+        self._sum = 0.0
+    
+    def _expire(self, t: float):
+        samples = self._samples
+        limit = t - self.window
+        while samples and (samples[0][0] < limit or len(samples) > MAX_SAMPLES):
+            self._sum -= samples.popleft()[1]
+        if not samples:
+            # Сбросить накопленную ошибку округления
+            self._sum = 0.0
+    
+    def add(self, t: float, value: Any):
+        number = _number(value)
+        if number is None:
+            return
+        self._samples.append((t, number))
+        self._sum += number
+        self._expire(t)
+    
+    def value(self, t: float) -> Optional[float]:
+        self._expire(t)
+        if not self._samples:
+            return None
+        return self._sum / len(self._samples)
+
+
+class CountAggregate(WindowAggregate):
+    """Число срабатываний (истинных отсчётов) в окне"""
+    
+    def __init__(self, window: float):
+        super().__init__(window)
+        self._times: deque = deque(maxlen=MAX_SAMPLES)
+    
+    def _expire(self, t: float):
+        times = self._times
+        limit = t - self.window
+        while times and times[0] < limit:
+            times.popleft()
+    
+    def add(self, t: float, value: Any):
+        if value:
+            self._times.append(t)
+        self._expire(t)
+    
+    def value(self, t: float) -> Optional[float]:
+        self._expire(t)
+        return float(len(self._times))
+
+
+class ExtremeAggregate(WindowAggregate):
+    """Минимум или максимум: монотонная очередь кандидатов"""
+    
+    def __init__(self, window: float, is_max: bool):
+        super().__init__(window)
+        self.is_max = is_max
+        self._candidates: deque = deque()
+    
+    def _expire(self, t: float):
+        candidates = self._candidates
+        limit = t - self.window
+        while candidates and candidates[0][0] < limit:
+            candidates.popleft()
+    
+    def add(self, t: float, value: Any):
+        number = _number(value)
+        if number is None:
+            return
+        candidates = self._candidates
+        # Отсчёты, которые уже никогда не станут экстремумом, удаляются
+        if self.is_max:
+            while candidates and candidates[-1][1] <= number:
+                candidates.pop()
+        else:
+            while candidates and candidates[-1][1] >= number:
+                candidates.pop()
+        candidates.append((t, number))
+        self._expire(t)
+    
+    def value(self, t: float) -> Optional[float]:
+        self._expire(t)
+        if not self._candidates:
+            return None
+        return self._candidates[0][1]
+
+
+def create_aggregate(kind: str, window: float) -> WindowAggregate:
+    """Создать агрегат по виду"""
+    if kind == "avg":
+        return AvgAggregate(window)
+    if kind == "count":
+        return CountAggregate(window)
+    if kind in ("min", "max"):
+        return ExtremeAggregate(window, kind == "max")
+    raise ValueError(f"Неизвестный агрегат: {kind}")
+
+
+def aggregate_key(spec: Dict[str, Any]) -> Optional[Tuple[str, str, float]]:
+    """Ключ общего агрегата условия (датчик, вид, окно) или None"""
+    kind = spec.get("aggregate")
+    if not kind:
+        return None
+    return (spec["sensor_id"], kind, float(spec.get("window", 60)))
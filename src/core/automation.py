@@ -1,24 +1,165 @@
 """Движок автоматизации (правила if-then)"""
-from datetime import datetime
-from typing import Dict, Any, Optional
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from .clock import SystemClock
 from .models import AutomationRule, Device
-from .event_bus import EventBus
+from .event_bus import EventBus, batch_items
+from .conditions import ConditionNetwork, condition_sensors, in_time_window
+from .scheduler import Scheduler
+from .triggers import next_trigger_time, next_window_edge
+
+
+def find_rule_cycle(rules: Iterable[AutomationRule]) -> Optional[List[str]]:
+    """Найти цикл в графе правил, вернуть ID правил цикла или None
+    
+    Ребро A -> B есть, если действие правила A меняет устройство, от
+    которого зависит условие правила B.
+    """
+    rules = [rule for rule in rules if rule.enabled]
+    readers: Dict[str, List[str]] = {}
+    for rule in rules:
+        for device_id in set(condition_sensors(rule.condition_tree())):
+            readers.setdefault(device_id, []).append(rule.id)
+    graph = {
+        rule.id: list(dict.fromkeys(
+            reader for action in rule.action_list()
+            for reader in readers.get(action.get("device_id"), [])
+        ))
+        for rule in rules
+    }
+    
+    # Поиск в глубину без рекурсии: 1 - в стеке обхода, 2 - обработано
+    state: Dict[str, int] = {}
+    for start in graph:
+        if start in state:
+            continue
+        path = [start]
+        iterators = [iter(graph[start])]
+        state[start] = 1
+        while iterators:
+            next_id = next(iterators[-1], None)
+            if next_id is None:
+                state[path.pop()] = 2
+                iterators.pop()
+            elif state.get(next_id) == 1:
+                return path[path.index(next_id):] + [next_id]
+            elif next_id not in state:
+                state[next_id] = 1
+                path.append(next_id)
+                iterators.append(iter(graph[next_id]))
+    return None
 
 
 class AutomationEngine:
-    """Обработчик правил автоматизации"""
+    """Обработчик правил автоматизации
+    
+    Правила могут зависеть от состояния актуаторов, поэтому действия одних
+    правил запускают другие. Каждое срабатывание несёт цепочку причин
+    (ID правил); цепочка ограничена MAX_CASCADE_DEPTH и не может содержать
+    одно правило дважды, а за одну синхронную обработку события выполняется
+    не больше MAX_ACTIONS_PER_TICK срабатываний.
+    """
+    
+    # Координаты по умолчанию для восхода/заката (Москва)
+    DEFAULT_LOCATION = {"lat": 55.75, "lon": 37.62}
+    # Ограничения каскадов правил
+    MAX_CASCADE_DEPTH = 5
+    MAX_ACTIONS_PER_TICK = 100
     
-    def __init__(self, event_bus: EventBus):
+    def __init__(self, event_bus: EventBus, scheduler: Optional[Scheduler] = None, clock=None):
         self.event_bus = event_bus
+        self.scheduler = scheduler
+        # Часы для временных окон и триггеров (виртуальные при воспроизведении)
+        self.clock = clock or SystemClock()
         self.rules: Dict[str, AutomationRule] = {}
         self.devices: Dict[str, Device] = {}
+        self.network = ConditionNetwork(now=self.clock.now)
+        self.location = dict(self.DEFAULT_LOCATION)
+        # Запланированные задачи правил: "trigger:<id>" / "window:<id>" -> ID задачи
+        self._timers: Dict[str, int] = {}
+        # Вложенность синхронной обработки и число срабатываний в ней
+        self._depth = 0
+        self._tick_actions = 0
         
-        # Подписка на события датчиков
+        # Подписка на события датчиков и актуаторов
         self.event_bus.subscribe("sensor_update", self._on_sensor_update)
+        self.event_bus.subscribe("actuator_update", self._on_actuator_update)
+        self.event_bus.subscribe("settings_changed", self._on_settings_changed)
     
     def set_rules(self, rules: Dict[str, AutomationRule]):
         """Установить правила"""
         self.rules = rules
+        enabled = {rule_id: rule for rule_id, rule in rules.items() if rule.enabled}
+        self.network.build(enabled)
+        self._schedule_all(enabled)
+    
+    def set_location(self, location: Dict[str, float]):
+        """Установить координаты для триггеров восхода/заката"""
+        self.location = {**self.DEFAULT_LOCATION, **(location or {})}
+        self._schedule_all({rule_id: rule for rule_id, rule in self.rules.items() if rule.enabled})
+    
+    def _on_settings_changed(self, event: Dict[str, Any]):
+        """Обработка сохранения настроек"""
+        location = event.get("data", {}).get("location")
+        if location:
+            self.set_location(location)
+    
+    def _schedule_all(self, rules: Dict[str, AutomationRule]):
+        """Перепланировать триггеры и временные окна всех правил"""
+        if self.scheduler is not None:
+            for handle in self._timers.values():
+                self.scheduler.cancel(handle)
+        self._timers.clear()
+        
+        for rule in rules.values():
+            if rule.trigger:
+                # Правила по времени не проверяются при обновлении датчиков
+                self.network.deactivate(rule.id)
+                if self.scheduler is not None:
+                    self._schedule_trigger(rule.id, self.clock.now())
+            elif rule.time_window and self.scheduler is not None:
+                self._update_window(rule.id)
+    
+    def _schedule_trigger(self, rule_id: str, after: datetime):
+        """Запланировать ближайшее срабатывание триггера правила"""
+        rule = self.rules[rule_id]
+        try:
+            when = next_trigger_time(rule.trigger, after, self.location)
+        except ValueError as e:
+            print(f"Invalid trigger in rule {rule_id}: {e}")
+            return
+        if when is not None:
+            self._timers[f"trigger:{rule_id}"] = self.scheduler.call_at(when, self._on_trigger, rule_id, when)
+    
+    def _on_trigger(self, rule_id: str, when: datetime):
+        """Срабатывание триггера по времени"""
+        rule = self.rules.get(rule_id)
+        if rule is None or not rule.enabled:
+            return
+        if self.clock.now() < when - timedelta(seconds=1):
+            # Таймер сработал раньше (сдвиг системных часов) - дождаться времени
+            self._timers[f"trigger:{rule_id}"] = self.scheduler.call_at(when, self._on_trigger, rule_id, when)
+            return
+        if self.network.is_true(rule_id) and self._check_time_window(rule):
+            self._enter()
+            try:
+                self._execute_action(rule)
+            finally:
+                self._depth -= 1
+        self._schedule_trigger(rule_id, max(when, self.clock.now()))
+    
+    def _update_window(self, rule_id: str):
+        """Убрать правило из индекса, пока его временное окно закрыто"""
+        rule = self.rules.get(rule_id)
+        if rule is None or not rule.enabled or not rule.time_window:
+            return
+        now = self.clock.now()
+        if self._check_time_window(rule):
+            self.network.activate(rule_id)
+        else:
+            self.network.deactivate(rule_id)
+        edge = next_window_edge(rule.time_window, now)
+        self._timers[f"window:{rule_id}"] = self.scheduler.call_at(edge, self._update_window, rule_id)
     
     def set_devices(self, devices: Dict[str, Device]):
         """Установить устройства"""
@@ -27,86 +168,117 @@ class AutomationEngine:
     def _on_sensor_update(self, event: Dict[str, Any]):
         """Обработка обновления датчика"""
         data = event.get("data", {})
-        device_id = data.get("device_id")
-        value = data.get("value")
-        
-        if not device_id or value is None:
-            return
-        
-        # Проверить все правила
-        for rule_id, rule in self.rules.items():
-            if not rule.enabled:
-                continue
-            
-            if rule.if_sensor_id != device_id:
-                continue
-            
-            # Проверить условие
-            if self._check_condition(rule, value):
-                # Проверить временное окно
-                if self._check_time_window(rule):
-                    # Выполнить действие
-                    self._execute_action(rule)
-    
-    def _check_condition(self, rule: AutomationRule, sensor_value: Any) -> bool:
-        """Проверить условие правила"""
-        condition = rule.condition
-        
-        if condition == "triggered":
-            return bool(sensor_value)
-        elif condition == "opened":
-            return bool(sensor_value)
-        elif condition == ">":
-            if rule.value is not None:
-                try:
-                    return float(sensor_value) > float(rule.value)
-                except (ValueError, TypeError):
-                    return False
-        elif condition == "<":
-            if rule.value is not None:
-                try:
-                    return float(sensor_value) < float(rule.value)
-                except (ValueError, TypeError):
-                    return False
-        elif condition == "==":
-            if rule.value is not None:
-                try:
-                    return float(sensor_value) == float(rule.value)
-                except (ValueError, TypeError):
-                    return str(sensor_value) == str(rule.value)
-        
-        return False
+        updates = [
+            (item["device_id"], item["value"])
+            for item in batch_items(data)
+            if item.get("device_id") and item.get("value") is not None
+        ]
+        if updates:
+            self._process(updates, [])
+    
+    def _on_actuator_update(self, event: Dict[str, Any]):
+        """Обработка изменения актуатора (условия проверяют, включён ли он)"""
+        data = event.get("data", {})
+        updates = [
+            (item["device_id"], bool(item.get("state", {}).get("powered")))
+            for item in batch_items(data) if item.get("device_id")
+        ]
+        self._process(updates, data.get("cause", []))
+    
+    def _enter(self):
+        """Начать синхронную обработку; верхний уровень открывает новый такт"""
+        if self._depth == 0:
+            self._tick_actions = 0
+        self._depth += 1
+    
+    def _process(self, updates: List[Tuple[str, Any]], cause: List[str]):
+        """Обновить значения устройств и выполнить сработавшие правила"""
+        self._enter()
+        try:
+            for device_id, value in updates:
+                # Сеть пересчитывает только условия, зависящие от этого устройства
+                for rule_id in self.network.update(device_id, value):
+                    rule = self.rules[rule_id]
+                    # Проверить временное окно
+                    if self._check_time_window(rule):
+                        # Выполнить действие
+                        self._execute_action(rule, cause)
+        finally:
+            self._depth -= 1
     
     def _check_time_window(self, rule: AutomationRule) -> bool:
         """Проверить временное окно"""
-        if not rule.time_window:
-            return True
-        
-        now = datetime.now()
-        current_time = now.strftime("%H:%M")
-        start = rule.time_window.get("start", "00:00")
-        end = rule.time_window.get("end", "23:59")
-        
-        # Простая проверка времени
-        if start <= end:
-            return start <= current_time <= end
-        else:  # Переход через полночь
-            return current_time >= start or current_time <= end
-    
-    def _execute_action(self, rule: AutomationRule):
-        """Выполнить действие правила"""
-        if not rule.then_device_id:
+        return in_time_window(rule.time_window, self.clock.now())
+    
+    def _execute_action(self, rule: AutomationRule, cause: List[str] = ()):
+        """Выполнить действия правила"""
+        if rule.id in cause:
+            self._block(rule, cause, "цикл правил")
+            return
+        if len(cause) >= self.MAX_CASCADE_DEPTH:
+            self._block(rule, cause, f"глубина каскада больше {self.MAX_CASCADE_DEPTH}")
+            return
+        if self._tick_actions >= self.MAX_ACTIONS_PER_TICK:
+            self._block(rule, cause, f"больше {self.MAX_ACTIONS_PER_TICK} срабатываний за такт")
             return
         
-        device = self.devices.get(rule.then_device_id)
-        if not device or device.category != "actuator":
+        actions = [
+            action for action in rule.action_list()
+            if action.get("device_id") in self.devices
+            and self.devices[action["device_id"]].category == "actuator"
+        ]
+        if not actions:
             return
+        self._tick_actions += 1
         
-        # Отправить событие для управления устройством
+        # Отправить событие для управления устройствами
+        first = actions[0]
         self.event_bus.emit("rule_triggered", {
             "rule_id": rule.id,
             "rule_name": rule.name,
-            "device_id": rule.then_device_id,
-            "action": rule.action,
-            "action_value": rule.action_value
+            "device_id": first["device_id"],
+            "action": first["action"],
+            "action_value": first.get("value"),
+            "actions": actions,
+            "cause": list(cause) + [rule.id]
         })
+    
+    def _block(self, rule: AutomationRule, cause: List[str], reason: str):
+        """Сообщить о подавленном срабатывании правила"""
+        self.event_bus.emit("rule_blocked", {
+            "rule_id": rule.id,
+            "rule_name": rule.name,
+            "reason": reason,
+            "cause": list(cause)
+        })
+
+
+class RuleActionExecutor:
+    """Исполнитель действий сработавших правил
+    
+    Действия без задержки выполняются одной пакетной командой, отложенные
+    группируются по задержке и ставятся в общий планировщик.
+    """
+    
+    def __init__(self, event_bus: EventBus, simulator_manager, scheduler: Scheduler):
+        self.event_bus = event_bus
+        self.simulator_manager = simulator_manager
+        self.scheduler = scheduler
+        self.event_bus.subscribe("rule_triggered", self._on_rule_triggered)
+    
+    def _on_rule_triggered(self, event: Dict[str, Any]):
+        """Обработка срабатывания правила"""
+        data = event.get("data", {})
+        by_delay: Dict[float, List[Tuple[str, str, Any]]] = {}
+        for action in data.get("actions", []):
+            command = (action["device_id"], action["action"], action.get("value"))
+            by_delay.setdefault(float(action.get("delay") or 0), []).append(command)
+        
+        source = data.get("rule_name") or data.get("rule_id", "")
+        # Цепочка причин передаётся в событие актуатора, в том числе для отложенных действий
+        cause = data.get("cause", [])
+        for delay, commands in sorted(by_delay.items()):
+            if delay <= 0:
+                self.simulator_manager.control_many(commands, source=source, cause=cause)
+            else:
+                self.scheduler.call_later(delay, self.simulator_manager.control_many, commands, source, cause)
@@ -0,0 +1,79 @@
+"""Источники времени: системные и виртуальные часы
+
+Компоненты, которым нужно текущее время (движок правил, сеть условий),
+получают часы снаружи. Для воспроизведения записанных событий и тестов
+используются виртуальные часы, которые двигаются по времени событий.
+"""
+import heapq
+import itertools
+from datetime import datetime, timedelta
+from typing import Any, Callable, List, Set, Tuple
+
+
+class SystemClock:
+    """Системное местное время"""
+    
+    def now(self) -> datetime:
+        """Текущее системное время"""
+        return datetime.now()
+
+
+class VirtualClock:
+    """Часы, время которых задаётся вручную"""
+    
+    def __init__(self, start: datetime = None):
+        self._now = start or datetime.now()
+    
+    def now(self) -> datetime:
+        """Текущее виртуальное время"""
+        return self._now
+    
+    def set(self, when: datetime):
+        """Перевести часы (назад не переводятся)"""
+        if when > self._now:
+            self._now = when
+    
+    def advance(self, seconds: float):
+        """Сдвинуть часы вперёд"""
+        self._now += timedelta(seconds=seconds)
+
+
+class VirtualScheduler:
+    """Планировщик по виртуальным часам с интерфейсом Scheduler"""
+    
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        self._heap: List[Tuple[datetime, int, Callable, tuple]] = []
+        self._counter = itertools.count()
+        # ID задач, которые ещё не выполнены и не отменены
+        self._live: Set[int] = set()
+    
+    def call_later(self, delay: float, callback: Callable, *args: Any) -> int:
+        """Выполнить callback через delay секунд виртуального времени"""
+        return self.call_at(self.clock.now() + timedelta(seconds=max(0.0, delay)), callback, *args)
+    
+    def call_at(self, when: datetime, callback: Callable, *args: Any) -> int:
+        """Выполнить callback в момент when виртуального времени"""
+        handle = next(self._counter)
+        self._live.add(handle)
+        heapq.heappush(self._heap, (when, handle, callback, args))
+        return handle
+    
+    def cancel(self, handle: int):
+        """Отменить задачу (запись удаляется из кучи при извлечении)"""
+        self._live.discard(handle)
+    
+    def __len__(self) -> int:
+        return len(self._live)
+    
+    def run_until(self, when: datetime):
+        """Выполнить задачи до момента when, переводя часы на время каждой"""
+        heap = self._heap
+        while heap and heap[0][0] <= when:
+            due, handle, callback, args = heapq.heappop(heap)
+            if handle not in self._live:
+                continue
+            self._live.discard(handle)
+            self.clock.set(due)
+            callback(*args)
+        self.clock.set(when)
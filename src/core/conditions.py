@@ -0,0 +1,261 @@
+"""Сеть условий правил автоматизации
+
+Условия всех правил собираются в общий граф: одинаковые подвыражения
+разных правил представлены одним узлом. Для каждого датчика заранее
+вычисляется список зависящих от него узлов в порядке вычисления, поэтому
+обновление датчика пересчитывает только эти узлы.
+
+Формат дерева условий:
+    {"sensor_id": "dev_1", "condition": ">", "value": 26.0}
+    {"sensor_id": "dev_1", "aggregate": "avg", "window": 300, "condition": ">", "value": 26.0}
+    {"time_window": {"start": "22:00", "end": "06:00"}}
+    {"op": "and" | "or", "items": [...]}
+    {"op": "not", "item": {...}}
+"""
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from .aggregates import WindowAggregate, aggregate_key, create_aggregate
+from .models import AutomationRule
+
+
+def compare(condition: str, sensor_value: Any, value: Optional[float]) -> bool:
+    """Проверить значение датчика по условию"""
+    if sensor_value is None:
+        return False
+    
+    if condition == "triggered":
+        return bool(sensor_value)
+    elif condition == "opened":
+        return bool(sensor_value)
+    elif condition == ">":
+        if value is not None:
+            try:
+                return float(sensor_value) > float(value)
+            except (ValueError, TypeError):
+                return False
+    elif condition == "<":
+        if value is not None:
+            try:
+                return float(sensor_value) < float(value)
+            except (ValueError, TypeError):
+                return False
+    elif condition == "==":
+        if value is not None:
+            try:
+                return float(sensor_value) == float(value)
+            except (ValueError, TypeError):
+                return str(sensor_value) == str(value)
+    
+    return False
+
+
+def in_time_window(time_window: Optional[Dict[str, str]], now: datetime) -> bool:
+    """Проверить, попадает ли время во временное окно"""
+    if not time_window:
+        return True
+    
+    current_time = now.strftime("%H:%M")
+    start = time_window.get("start", "00:00")
+    end = time_window.get("end", "23:59")
+    
+    # Простая проверка времени
+    if start <= end:
+        return start <= current_time <= end
+    else:  # Переход через полночь
+        return current_time >= start or current_time <= end
+
+
+def condition_sensors(tree: Dict[str, Any]) -> List[str]:
+    """ID датчиков, от которых зависит дерево условий"""
+    if "op" in tree:
+        items = tree["items"] if tree["op"] in ("and", "or") else [tree["item"]]
+        return [sensor_id for item in items for sensor_id in condition_sensors(item)]
+    if tree.get("sensor_id"):
+        return [tree["sensor_id"]]
+    return []
+
+
+class ConditionNode:
+    """Узел сети условий"""
+    
+    __slots__ = ("kind", "spec", "children", "parents", "value", "volatile", "height", "aggregate")
+    
+    def __init__(self, kind: str, spec: Dict[str, Any], children: List["ConditionNode"],
+                 aggregate: Optional[WindowAggregate] = None):
+        self.kind = kind  # sensor, time, and, or, not
+        self.spec = spec
+        self.children = children
+        self.parents: List["ConditionNode"] = []
+        self.value = False
+        # Общий агрегат по скользящему окну (для условий с "aggregate")
+        self.aggregate = aggregate
+        # Значение узлов времени и агрегатов меняется без событий датчиков
+        self.volatile = kind == "time" or aggregate is not None or any(c.volatile for c in children)
+        self.height = 1 + max((c.height for c in children), default=0)
+
+
+class ConditionNetwork:
+    """Сеть условий с кэшем последних значений датчиков"""
+    
+    def __init__(self, now: Callable[[], datetime] = datetime.now):
+        self.now = now
+        # Последние значения датчиков
+        self.sensor_values: Dict[str, Any] = {}
+        self._nodes: Dict[str, ConditionNode] = {}
+        self._rule_roots: Dict[str, ConditionNode] = {}
+        # Для каждого датчика: узлы для пересчёта (по возрастанию высоты) и
+        # активные правила. Отключённые правила убираются из индекса датчиков
+        self._sensor_plan: Dict[str, List[ConditionNode]] = {}
+        self._sensor_rules: Dict[str, Dict[str, None]] = {}
+        self._rule_sensors: Dict[str, List[str]] = {}
+        # Узлы каждого правила в порядке вычисления
+        self._rule_nodes: Dict[str, List[ConditionNode]] = {}
+        # Агрегаты по окну: общие для всех правил с тем же (датчик, вид, окно)
+        self._aggregates: Dict[tuple, WindowAggregate] = {}
+        self._sensor_aggregates: Dict[str, List[WindowAggregate]] = {}
+    
+    def build(self, rules: Dict[str, AutomationRule]):
+        """Построить сеть для набора правил"""
+        self._nodes = {}
+        self._rule_roots = {}
+        self._sensor_plan = {}
+        self._sensor_rules = {}
+        self._rule_sensors = {}
+        self._rule_nodes = {}
+        self._sensor_aggregates = {}
+        
+        for rule_id, rule in rules.items():
+            root = self._add(rule.condition_tree())
+            self._rule_roots[rule_id] = root
+            self._rule_sensors[rule_id] = list(dict.fromkeys(condition_sensors(rule.condition_tree())))
+            nodes: Dict[int, ConditionNode] = {}
+            self._collect_descendants(root, nodes)
+            self._rule_nodes[rule_id] = sorted(nodes.values(), key=lambda n: n.height)
+            self.activate(rule_id)
+        
+        # Предрассчитать порядок пересчёта для каждого датчика
+        affected: Dict[str, Dict[int, ConditionNode]] = {}
+        for node in self._nodes.values():
+            if node.kind == "sensor":
+                self._collect_ancestors(node, affected.setdefault(node.spec["sensor_id"], {}))
+        for sensor_id, nodes in affected.items():
+            self._sensor_plan[sensor_id] = sorted(nodes.values(), key=lambda n: n.height)
+        
+        # Накопленные окна сохраняются при перестроении, если ещё используются
+        used = {aggregate_key(node.spec) for node in self._nodes.values() if node.aggregate is not None}
+        self._aggregates = {key: agg for key, agg in self._aggregates.items() if key in used}
+        for (sensor_id, _, _), aggregate in self._aggregates.items():
+            self._sensor_aggregates.setdefault(sensor_id, []).append(aggregate)
+    
+    def _add(self, tree: Dict[str, Any]) -> ConditionNode:
+        """Добавить поддерево, переиспользуя одинаковые узлы"""
+        key = json.dumps(tree, sort_keys=True, ensure_ascii=False)
+        if key in self._nodes:
+            return self._nodes[key]
+        
+        op = tree.get("op")
+        if op in ("and", "or"):
+            node = ConditionNode(op, tree, [self._add(item) for item in tree["items"]])
+        elif op == "not":
+            node = ConditionNode(op, tree, [self._add(tree["item"])])
+        elif "time_window" in tree:
+            node = ConditionNode("time", tree, [])
+        else:
+            node = ConditionNode("sensor", tree, [], self._get_aggregate(tree))
+        
+        for child in node.children:
+            child.parents.append(node)
+        self._nodes[key] = node
+        return node
+    
+    def _get_aggregate(self, spec: Dict[str, Any]) -> Optional[WindowAggregate]:
+        """Общий агрегат условия (создаётся один раз на датчик, вид и окно)"""
+        key = aggregate_key(spec)
+        if key is None:
+            return None
+        aggregate = self._aggregates.get(key)
+        if aggregate is None:
+            aggregate = create_aggregate(key[1], key[2])
+            self._aggregates[key] = aggregate
+        return aggregate
+    
+    def _collect_descendants(self, node: ConditionNode, result: Dict[int, ConditionNode]):
+        """Собрать узел и все его дочерние узлы"""
+        if id(node) in result:
+            return
+        result[id(node)] = node
+        for child in node.children:
+            self._collect_descendants(child, result)
+    
+    def _collect_ancestors(self, node: ConditionNode, result: Dict[int, ConditionNode]):
+        """Собрать узел и всех его предков"""
+        if id(node) in result:
+            return
+        result[id(node)] = node
+        for parent in node.parents:
+            self._collect_ancestors(parent, result)
+    
+    def _current(self, node: ConditionNode) -> bool:
+        """Значение узла (зависящие от времени узлы вычисляются заново)"""
+        return self._evaluate(node) if node.volatile else node.value
+    
+    def _evaluate(self, node: ConditionNode) -> bool:
+        """Вычислить узел по значениям дочерних узлов"""
+        kind = node.kind
+        if kind == "sensor":
+            spec = node.spec
+            if node.aggregate is not None:
+                return compare(spec.get("condition", ""), node.aggregate.value(self.now().timestamp()), spec.get("value"))
+            return compare(spec.get("condition", ""), self.sensor_values.get(spec["sensor_id"]), spec.get("value"))
+        if kind == "time":
+            return in_time_window(node.spec["time_window"], self.now())
+        if kind == "and":
+            return all(self._current(c) for c in node.children)
+        if kind == "or":
+            return any(self._current(c) for c in node.children)
+        if kind == "not":
+            return not self._current(node.children[0])
+        return False
+    
+    def update(self, sensor_id: str, value: Any) -> List[str]:
+        """Обновить значение датчика, вернуть ID правил с выполненным условием"""
+        self.sensor_values[sensor_id] = value
+        # Окна копят отсчёты и для отключённых правил
+        aggregates = self._sensor_aggregates.get(sensor_id)
+        if aggregates:
+            t = self.now().timestamp()
+            for aggregate in aggregates:
+                aggregate.add(t, value)
+        rule_ids = self._sensor_rules.get(sensor_id)
+        if not rule_ids:
+            # Нет активных правил - узлы пересчитаются при активации
+            return []
+        for node in self._sensor_plan[sensor_id]:
+            node.value = self._evaluate(node)
+        return [rule_id for rule_id in rule_ids if self._current(self._rule_roots[rule_id])]
+    
+    def activate(self, rule_id: str):
+        """Вернуть правило в индекс датчиков"""
+        if rule_id not in self._rule_roots:
+            return
+        self._refresh_rule(rule_id)
+        for sensor_id in self._rule_sensors[rule_id]:
+            self._sensor_rules.setdefault(sensor_id, {})[rule_id] = None
+    
+    def deactivate(self, rule_id: str):
+        """Убрать правило из индекса датчиков (обновления его не проверяют)"""
+        for sensor_id in self._rule_sensors.get(rule_id, []):
+            self._sensor_rules.get(sensor_id, {}).pop(rule_id, None)
+    
+    def _refresh_rule(self, rule_id: str):
+        """Пересчитать все узлы правила по кэшу датчиков"""
+        for node in self._rule_nodes[rule_id]:
+            node.value = self._evaluate(node)
+    
+    def is_true(self, rule_id: str) -> bool:
+        """Выполнено ли сейчас условие правила"""
+        if rule_id not in self._rule_roots:
+            return False
+        self._refresh_rule(rule_id)
+        return self._rule_roots[rule_id].value
@@ -1,8 +1,46 @@
 """Event Bus для публикации и подписки на события"""
-from typing import Callable, Dict, List, Any
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Any, Optional, Tuple
 from PySide6.QtCore import QObject, Signal
 
 
+# Запись кольцевого буфера: (номер события, время в секундах эпохи, событие)
+RecentEvent = Tuple[int, float, Dict[str, Any]]
+
+
+class RecentEvents:
+    """Кольцевой буфер последних событий шины
+    
+    Хранит не больше capacity событий; старые вытесняются автоматически.
+    total - сколько событий добавлено всего, по нему читатель узнаёт,
+    появились ли новые.
+    """
+    
+    def __init__(self, capacity: int = 100):
+        self._events: deque = deque(maxlen=capacity)
+        self.total = 0
+    
+    def append(self, event: Dict[str, Any]):
+        """Добавить событие в буфер"""
+        self.total += 1
+        self._events.append((self.total, time.time(), event))
+    
+    def latest(self, count: int, types: Optional[Iterable[str]] = None) -> List[RecentEvent]:
+        """До count последних событий (новые первыми), только указанных типов"""
+        result = []
+        for item in reversed(self._events):
+            if types is None or item[2]["type"] in types:
+                result.append(item)
+                if len(result) == count:
+                    break
+        return result
+    
+    def clear(self):
+        """Очистить буфер (счётчик total не сбрасывается)"""
+        self._events.clear()
+
+
 class EventBus(QObject):
     """Централизованная система событий"""
     
@@ -15,6 +53,10 @@ class EventBus(QObject):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
             cls._instance._subscribers: Dict[str, List[Callable]] = {}
+            # Получатели всех событий независимо от типа (запись, отладка)
+            cls._instance._taps: List[Callable] = []
+            # Последние события для ленты на главном экране
+            cls._instance.recent = RecentEvents()
         return cls._instance
     
     def subscribe(self, event_type: str, callback: Callable):
@@ -29,6 +71,23 @@ class EventBus(QObject):
             if callback in self._subscribers[event_type]:
                 self._subscribers[event_type].remove(callback)
     
+    def emit_batch(self, event_type: str, items: List[Dict[str, Any]], **extra: Any):
+        """Опубликовать пакет однотипных событий одним событием
+        
+        Данные отдельных устройств передаются списком в поле "devices",
+        обработчики получают их через batch_items().
+        """
+        self.emit(event_type, {**extra, "devices": items})
+    
+    def add_tap(self, callback: Callable):
+        """Подписаться на все события"""
+        self._taps.append(callback)
+    
+    def remove_tap(self, callback: Callable):
+        """Отписаться от всех событий"""
+        if callback in self._taps:
+            self._taps.remove(callback)
+    
     def emit(self, event_type: str, data: Dict[str, Any]):
         """Опубликовать событие"""
         event = {
@@ -36,6 +95,14 @@ class EventBus(QObject):
             "data": data
         }
         
+        self.recent.append(event)
+        
+        for tap in self._taps:
+            try:
+                tap(event)
+            except Exception as e:
+                print(f"Error in event tap: {e}")
+        
         # Уведомить через сигнал Qt
         self.event_emitted.emit(event)
         
@@ -46,3 +113,12 @@ class EventBus(QObject):
                     callback(event)
                 except Exception as e:
                     print(f"Error in event callback: {e}")
+
+
+def batch_items(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Данные по отдельным устройствам из события
+    
+    Пакетное событие содержит список в поле "devices", обычное - данные
+    одного устройства.
+    """
+    return data.get("devices", [data])
@@ -0,0 +1,145 @@
+"""Контроль связи с устройствами
+
+Устройство считается на связи, пока его показания или состояние приходят
+не реже, чем раз в offline_after секунд (Device.config["offline_after"],
+по умолчанию - три периода heartbeat). Устройства без этих настроек
+сообщают только об изменениях и не контролируются.
+
+Сроки хранятся в мин-куче, по одной записи на устройство. Событие
+устройства только запоминает время (O(1)); когда наступает срок из
+вершины кучи, запись либо переносится на новый срок (O(log n)), либо
+устройство объявляется недоступным. Полного обхода устройств нет.
+"""
+import heapq
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .clock import SystemClock
+from .event_bus import EventBus, batch_items
+from .models import Device
+
+
+# Сколько пропущенных heartbeat означает потерю связи
+MISSED_HEARTBEATS = 3
+
+
+def offline_timeout(device: Device) -> Optional[float]:
+    """Через сколько секунд без сообщений устройство недоступно (None - не контролируется)"""
+    timeout = device.config.get("offline_after")
+    if timeout:
+        return float(timeout)
+    heartbeat = device.config.get("heartbeat")
+    if heartbeat:
+        return float(heartbeat) * MISSED_HEARTBEATS
+    return None
+
+
+class HealthMonitor:
+    """Отслеживание недоступных устройств по времени последнего сообщения
+    
+    Публикует device_offline и device_online.
+    """
+    
+    def __init__(self, storage, event_bus: EventBus, scheduler, clock=None):
+        self.storage = storage
+        self.event_bus = event_bus
+        self.scheduler = scheduler
+        self.clock = clock or SystemClock()
+        self.devices: Dict[str, Device] = {}
+        self._timeouts: Dict[str, float] = {}
+        self._last_report: Dict[str, float] = {}
+        # (срок, ID устройства); у каждого контролируемого устройства на связи одна запись
+        self._heap: List[Tuple[float, str]] = []
+        self.offline: Set[str] = set()
+        self._handle: Optional[int] = None
+        self._armed_at: Optional[float] = None
+        
+        self.reload_devices()
+        self.event_bus.subscribe("sensor_update", self._on_report)
+        self.event_bus.subscribe("actuator_update", self._on_report)
+        self.event_bus.subscribe("devices_changed", lambda event: self.reload_devices())
+    
+    def reload_devices(self):
+        """Перечитать устройства и их сроки; новые устройства получают полный срок"""
+        now = self._now()
+        self.devices = {d.id: d for d in self.storage.get_devices()}
+        self._timeouts = {}
+        for device in self.devices.values():
+            timeout = offline_timeout(device)
+            if timeout is not None:
+                self._timeouts[device.id] = timeout
+        self._last_report = {
+            device_id: self._last_report.get(device_id, now) for device_id in self._timeouts
+        }
+        self.offline &= set(self._timeouts)
+        self._heap = [
+            (self._last_report[device_id] + timeout, device_id)
+            for device_id, timeout in self._timeouts.items()
+            if device_id not in self.offline
+        ]
+        heapq.heapify(self._heap)
+        self._arm(force=True)
+    
+    def status(self, device_id: str) -> Optional[bool]:
+        """True - на связи, False - недоступно, None - не контролируется"""
+        if device_id not in self._timeouts:
+            return None
+        return device_id not in self.offline
+    
+    def _now(self) -> float:
+        """Текущее время по часам монитора (с эпохи)"""
+        return self.clock.now().timestamp()
+    
+    def _on_report(self, event: Dict[str, Any]):
+        """Запомнить время сообщения устройств; недоступные вернуть на связь"""
+        now = None
+        for data in batch_items(event["data"]):
+            device_id = data.get("device_id")
+            if device_id not in self._timeouts:
+                continue
+            if now is None:
+                now = self._now()
+            self._last_report[device_id] = now
+            if device_id in self.offline:
+                self.offline.discard(device_id)
+                heapq.heappush(self._heap, (now + self._timeouts[device_id], device_id))
+                self._arm()
+                self._emit("device_online", device_id)
+    
+    def _check(self):
+        """Обработать наступившие сроки из вершины кучи"""
+        self._handle = None
+        self._armed_at = None
+        now = self._now()
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, device_id = heapq.heappop(heap)
+            deadline = self._last_report[device_id] + self._timeouts[device_id]
+            if deadline > now:
+                # Устройство сообщало после постановки срока - перенести
+                heapq.heappush(heap, (deadline, device_id))
+            else:
+                self.offline.add(device_id)
+                self._emit("device_offline", device_id)
+        self._arm()
+    
+    def _arm(self, force: bool = False):
+        """Завести проверку на ближайший срок"""
+        if not self._heap:
+            return
+        deadline = self._heap[0][0]
+        if not force and self._armed_at is not None and self._armed_at <= deadline:
+            return
+        if self._handle is not None:
+            self.scheduler.cancel(self._handle)
+        self._armed_at = deadline
+        self._handle = self.scheduler.call_later(deadline - self._now(), self._check)
+    
+    def _emit(self, event_type: str, device_id: str):
+        """Опубликовать device_offline/device_online"""
+        device = self.devices[device_id]
+        self.event_bus.emit(event_type, {
+            "device_id": device_id,
+            "device_name": device.name,
+            "room_id": device.room_id,
+            "last_report": self._last_report[device_id]
+        })
@@ -1,6 +1,7 @@
 """Модели данных для умного дома"""
+from copy import deepcopy
 from dataclasses import dataclass, field, asdict
-from typing import Optional, Dict, Any, Literal
+from typing import Optional, Callable, Dict, Any, List, Literal
 from datetime import datetime
 import uuid
 
@@ -28,13 +29,17 @@ class Device:
     state: Dict[str, Any] = field(default_factory=dict)
     config: Dict[str, Any] = field(default_factory=dict)
     last_seen: Optional[str] = None
+    # Версия состояния, присланная устройством (MQTT); растёт при каждом изменении
+    version: int = 0
     
     def to_dict(self) -> Dict[str, Any]:
         return asdict(self)
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Device':
-        return cls(**data)
+        # Свои копии state и config: изменения устройства не должны попадать
+        # в данные хранилища в обход журнала
+        return cls(**{**data, "state": deepcopy(data.get("state", {})), "config": deepcopy(data.get("config", {}))})
 
 
 @dataclass
@@ -49,6 +54,29 @@ class AutomationRule:
     action: str = ""  # on, off, set_level
     action_value: Optional[float] = None
     name: str = ""
+    # Составное условие (AND/OR/NOT), заменяет if_sensor_id/condition/value
+    conditions: Optional[Dict[str, Any]] = None
+    # Список действий {"device_id", "action", "value", "delay"}, заменяет then_device_id/action/action_value
+    actions: List[Dict[str, Any]] = field(default_factory=list)
+    # Триггер по времени: {"type": "cron", "expr": "30 6 * * *"} или {"type": "sun", "event": "sunrise", "offset": 0}
+    trigger: Optional[Dict[str, Any]] = None
+    
+    def condition_tree(self) -> Dict[str, Any]:
+        """Дерево условий правила (простое условие - один лист)"""
+        if self.conditions:
+            return self.conditions
+        if not self.if_sensor_id:
+            # Правило без датчика (например, только по времени) - условие всегда истинно
+            return {"op": "and", "items": []}
+        return {"sensor_id": self.if_sensor_id, "condition": self.condition, "value": self.value}
+    
+    def action_list(self) -> List[Dict[str, Any]]:
+        """Действия правила (простое правило - одно действие без задержки)"""
+        if self.actions:
+            return self.actions
+        if not self.then_device_id:
+            return []
+        return [{"device_id": self.then_device_id, "action": self.action, "value": self.action_value, "delay": 0}]
     
     def to_dict(self) -> Dict[str, Any]:
         return asdict(self)
@@ -58,12 +86,64 @@ class AutomationRule:
         return cls(**data)
 
 
+@dataclass
+class Scene:
+    id: str
+    name: str
+    # Действия: {"device_id": "dev_5", "action": "off", "value": None}
+    # или селектор {"types": ["light"], "room_id": None, "action": "off"}
+    actions: List[Dict[str, Any]] = field(default_factory=list)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Scene':
+        return cls(**data)
+
+
+def _rule_actions_text(fields: Dict[str, Any]) -> str:
+    return "Правило сработало: " + ", ".join(
+        f"{a.get('action', 'unknown')} на устройстве {a.get('device_id', 'unknown')}"
+        + (f" через {a['delay']} с" if a.get("delay") else "")
+        for a in fields.get("actions", [])
+    )
+
+
+# Текст записи лога по её событию (строится только при показе)
+LOG_MESSAGES: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    "sensor": lambda f: f"Датчик {f.get('type', 'unknown')}: {f.get('value', 'N/A')}"
+                        + (" (heartbeat)" if f.get("heartbeat") else ""),
+    "sensor_batch": lambda f: f"Показаний: {f.get('count', 0)}",
+    "actuator": lambda f: f"Устройство {f.get('action', 'unknown')}: {f.get('state', {})}",
+    "actuator_batch": lambda f: f"Устройств: {len(f.get('devices', []))}: "
+                                + ", ".join(f"{name} {action}" for name, action in f.get("devices", [])),
+    "rule": _rule_actions_text,
+    "rule_blocked": lambda f: f"Срабатывание подавлено: {f.get('reason', '')}",
+    "device_offline": lambda f: "Нет связи с устройством",
+    "device_online": lambda f: "Связь с устройством восстановлена",
+    "sensor_summary": lambda f: f"Сводка за час ({f.get('type', 'unknown')}): показаний {f.get('count', 0)}"
+                                + (f", мин {f['min']}, макс {f['max']}, среднее {f['avg']}" if "avg" in f else "")
+                                + (f", срабатываний {f['true']}" if "true" in f else ""),
+}
+
+
 @dataclass
 class LogEntry:
     timestamp: str
     type: str  # sensor, actuator, rule, system
     source: str
-    message: str
+    message: str = ""  # готовый текст (системные сообщения и старые записи)
+    level: str = "info"  # debug, info, warning
+    event: str = ""  # ключ LOG_MESSAGES
+    fields: Dict[str, Any] = field(default_factory=dict)
+    
+    def render(self) -> str:
+        """Текст записи для показа"""
+        if self.message:
+            return self.message
+        renderer = LOG_MESSAGES.get(self.event)
+        return renderer(self.fields) if renderer else ""
     
     def to_dict(self) -> Dict[str, Any]:
         return asdict(self)
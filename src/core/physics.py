@@ -0,0 +1,127 @@
+"""Тепловая и влажностная модель комнат для симуляции
+
+Состояние всех комнат хранится столбцами (структура массивов): отдельные
+списки температуры, влажности и суммарных воздействий актуаторов. Шаг
+пересчитывает все комнаты одним проходом по этим спискам.
+
+Для каждой комнаты температура стремится к равновесной:
+    T* = T_улица + (базовый нагрев + нагрев актуаторов) / k,  k = потери + вентиляция
+и за время dt меняется точно по экспоненте T = T* + (T - T*) * exp(-k * dt),
+поэтому шаг устойчив при любом dt (в том числе в режиме перемотки).
+Влажность считается так же.
+"""
+import math
+from typing import Dict, List, Optional, Tuple
+
+
+# Влияние включённого на 100% актуатора: нагрев (°C/мин), влага (%/мин),
+# вентиляция (доля обмена воздуха с улицей в минуту). Сдвиг равновесия -
+# воздействие, делённое на потери: при потерях по умолчанию обогреватель
+# держит комнату на 6 °C теплее комфорта, вентилятор - примерно на 3 °C холоднее
+ACTUATOR_EFFECTS: Dict[str, Tuple[float, float, float]] = {
+    "heater": (0.06, -0.1, 0.0),
+    "fan": (0.0, 0.0, 0.002),
+    "light": (0.002, 0.0, 0.0),
+    "kettle": (0.02, 0.3, 0.0),
+}
+
+
+class RoomPhysics:
+    """Температура и влажность комнат под действием актуаторов"""
+    
+    def __init__(self, outdoor_temperature: float = 5.0, outdoor_humidity: float = 70.0,
+                 comfort_temperature: float = 21.0, comfort_humidity: float = 45.0,
+                 heat_loss: float = 0.01, moisture_loss: float = 0.02):
+        self.outdoor_temperature = outdoor_temperature
+        self.outdoor_humidity = outdoor_humidity
+        self.heat_loss = heat_loss  # доля разницы с улицей в минуту
+        self.moisture_loss = moisture_loss
+        # Базовые источники (отопление, жильцы) держат комфорт без актуаторов
+        self.base_heat = heat_loss * (comfort_temperature - outdoor_temperature)
+        self.base_moisture = moisture_loss * (comfort_humidity - outdoor_humidity)
+        
+        self.rooms: Dict[str, int] = {}
+        self.temperature: List[float] = []
+        self.humidity: List[float] = []
+        self.heat: List[float] = []
+        self.moisture: List[float] = []
+        self.ventilation: List[float] = []
+        # Текущий вклад каждого актуатора: (комната, нагрев, влага, вентиляция)
+        self._inputs: Dict[str, Tuple[int, float, float, float]] = {}
+    
+    def add_room(self, room_id: str, temperature: Optional[float] = None,
+                 humidity: Optional[float] = None) -> int:
+        """Добавить комнату (если её ещё нет), вернуть её индекс"""
+        index = self.rooms.get(room_id)
+        if index is not None:
+            return index
+        index = len(self.temperature)
+        self.rooms[room_id] = index
+        comfort_t = self.outdoor_temperature + self.base_heat / self.heat_loss
+        comfort_h = self.outdoor_humidity + self.base_moisture / self.moisture_loss
+        self.temperature.append(comfort_t if temperature is None else temperature)
+        self.humidity.append(comfort_h if humidity is None else humidity)
+        self.heat.append(0.0)
+        self.moisture.append(0.0)
+        self.ventilation.append(0.0)
+        return index
+    
+    def set_actuator(self, device_id: str, room_id: str, device_type: str, state: Dict):
+        """Обновить вклад актуатора по его состоянию"""
+        self.remove_actuator(device_id)
+        effects = ACTUATOR_EFFECTS.get(device_type)
+        if effects is None or not state.get("powered"):
+            return
+        factor = float(state.get("level", 100)) / 100
+        index = self.add_room(room_id)
+        heat, moisture, ventilation = (e * factor for e in effects)
+        self.heat[index] += heat
+        self.moisture[index] += moisture
+        self.ventilation[index] += ventilation
+        self._inputs[device_id] = (index, heat, moisture, ventilation)
+    
+    def remove_actuator(self, device_id: str):
+        """Убрать вклад актуатора"""
+        previous = self._inputs.pop(device_id, None)
+        if previous is None:
+            return
+        index, heat, moisture, ventilation = previous
+        self.heat[index] -= heat
+        self.moisture[index] -= moisture
+        self.ventilation[index] -= ventilation
+    
+    def step(self, seconds: float):
+        """Продвинуть модель всех комнат на seconds секунд"""
+        if seconds <= 0 or not self.temperature:
+            return
+        minutes = seconds / 60
+        exp = math.exp
+        out_t = self.outdoor_temperature
+        out_h = self.outdoor_humidity
+        base_heat = self.base_heat
+        base_moisture = self.base_moisture
+        heat_loss = self.heat_loss
+        moisture_loss = self.moisture_loss
+        
+        self.temperature = [
+            target + (t - target) * decay
+            for t, heat, vent in zip(self.temperature, self.heat, self.ventilation)
+            for k in (heat_loss + vent,)
+            for target, decay in ((out_t + (base_heat + heat) / k, exp(-k * minutes)),)
+        ]
+        self.humidity = [
+            min(100.0, max(0.0, target + (h - target) * decay))
+            for h, moisture, vent in zip(self.humidity, self.moisture, self.ventilation)
+            for k in (moisture_loss + vent,)
+            for target, decay in ((out_h + (base_moisture + moisture) / k, exp(-k * minutes)),)
+        ]
+    
+    def room_temperature(self, room_id: str) -> Optional[float]:
+        """Температура комнаты или None, если комнаты нет в модели"""
+        index = self.rooms.get(room_id)
+        return self.temperature[index] if index is not None else None
+    
+    def room_humidity(self, room_id: str) -> Optional[float]:
+        """Влажность комнаты или None, если комнаты нет в модели"""
+        index = self.rooms.get(room_id)
+        return self.humidity[index] if index is not None else None
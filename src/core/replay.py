@@ -0,0 +1,234 @@
+"""Воспроизведение записанных событий датчиков через движок правил
+
+Пробный прогон (dry-run): события подаются в AutomationEngine быстрее
+реального времени, виртуальные часы идут по времени событий, поэтому
+временные окна, триггеры и агрегаты по окну работают так же, как в
+реальной работе. Устройства не управляются - считается только, какие
+правила сработали бы и сколько раз.
+
+Формат входного файла - JSON Lines, по событию на строку:
+    {"timestamp": "2026-01-01T12:00:00", "device_id": "dev_1", "value": 23.5}
+    {"timestamp": 1767268800.0, "type": "sensor_update", "data": {"device_id": "dev_1", "value": 23.5}}
+
+Также читаются файлы захвата EventRecorder (.shcap) или каталог с ними.
+
+Запуск:
+    python -m src.core.replay events.jsonl --state data/state.json
+    python -m src.core.replay data/captures --state data/state.json
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .automation import AutomationEngine
+from .clock import VirtualClock, VirtualScheduler
+from .event_bus import batch_items
+from .models import AutomationRule, Device
+from ..storage.capture import CaptureReader, read_captures
+
+
+# Событие для воспроизведения: время, ID датчика, значение
+ReplayEvent = Tuple[datetime, str, Any]
+
+
+class ReplayBus:
+    """Минимальная шина событий без Qt
+    
+    EventBus - синглтон приложения с Qt-сигналом, поэтому для прогона
+    используется отдельная шина с тем же интерфейсом subscribe/emit.
+    """
+    
+    def __init__(self):
+        self._subscribers: Dict[str, List[Callable]] = {}
+    
+    def subscribe(self, event_type: str, callback: Callable):
+        """Подписаться на события типа event_type"""
+        self._subscribers.setdefault(event_type, []).append(callback)
+    
+    def unsubscribe(self, event_type: str, callback: Callable):
+        """Отписаться от событий типа event_type"""
+        callbacks = self._subscribers.get(event_type, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+    
+    def emit(self, event_type: str, data: Dict[str, Any]):
+        """Синхронно вызвать подписчиков события"""
+        callbacks = self._subscribers.get(event_type)
+        if callbacks:
+            event = {"type": event_type, "data": data}
+            for callback in callbacks:
+                callback(event)
+
+
+@dataclass
+class RuleStats:
+    """Статистика срабатываний одного правила"""
+    rule_id: str
+    name: str
+    fired: int = 0
+    blocked: int = 0
+    first: Optional[datetime] = None
+    last: Optional[datetime] = None
+
+
+@dataclass
+class ReplayResult:
+    """Результат прогона"""
+    events: int = 0
+    elapsed: float = 0.0
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    rules: Dict[str, RuleStats] = field(default_factory=dict)
+    
+    @property
+    def rate(self) -> float:
+        """Событий в секунду реального времени"""
+        return self.events / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class RuleReplay:
+    """Прогон событий через движок правил на виртуальных часах"""
+    
+    def __init__(self, rules: Iterable[AutomationRule], devices: Iterable[Device],
+                 location: Optional[Dict[str, float]] = None):
+        self.rules = {rule.id: rule for rule in rules}
+        self.devices = {device.id: device for device in devices}
+        self.location = location
+    
+    def run(self, events: Iterable[ReplayEvent]) -> ReplayResult:
+        """Прогнать события (в порядке времени) и собрать статистику"""
+        events = iter(events)
+        result = ReplayResult(rules={
+            rule.id: RuleStats(rule.id, rule.name or rule.id) for rule in self.rules.values()
+        })
+        first = next(events, None)
+        if first is None:
+            return result
+        
+        clock = VirtualClock(first[0])
+        scheduler = VirtualScheduler(clock)
+        bus = ReplayBus()
+        engine = AutomationEngine(bus, scheduler, clock)
+        if self.location:
+            engine.location = {**engine.location, **self.location}
+        engine.set_devices(self.devices)
+        engine.set_rules(self.rules)
+        
+        def on_triggered(event: Dict[str, Any]):
+            stats = result.rules[event["data"]["rule_id"]]
+            stats.fired += 1
+            now = clock.now()
+            if stats.first is None:
+                stats.first = now
+            stats.last = now
+        
+        def on_blocked(event: Dict[str, Any]):
+            result.rules[event["data"]["rule_id"]].blocked += 1
+        
+        bus.subscribe("rule_triggered", on_triggered)
+        bus.subscribe("rule_blocked", on_blocked)
+        
+        started = time.perf_counter()
+        result.start = first[0]
+        count = 0
+        emit = bus.emit
+        run_until = scheduler.run_until
+        timestamp = first[0]
+        for timestamp, device_id, value in itertools.chain([first], events):
+            run_until(timestamp)
+            emit("sensor_update", {"device_id": device_id, "value": value})
+            count += 1
+        result.end = timestamp
+        result.events = count
+        result.elapsed = time.perf_counter() - started
+        return result
+
+
+def _parse_time(value: Any) -> datetime:
+    """Время события: ISO-строка или секунды эпохи"""
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value)
+    return datetime.fromisoformat(value)
+
+
+def read_jsonl(path: str) -> Iterator[ReplayEvent]:
+    """Прочитать события sensor_update из файла JSON Lines"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "data" in record:
+                if record.get("type", "sensor_update") != "sensor_update":
+                    continue
+                data = record["data"]
+            else:
+                data = record
+            yield _parse_time(record["timestamp"]), data["device_id"], data.get("value")
+
+
+def read_capture(path: str) -> Iterator[ReplayEvent]:
+    """Прочитать события sensor_update из файла или каталога захвата"""
+    events = read_captures(path) if os.path.isdir(path) else CaptureReader(path).events()
+    for timestamp, event_type, data in events:
+        if event_type == "sensor_update":
+            for item in batch_items(data):
+                yield timestamp, item["device_id"], item.get("value")
+
+
+def load_state(path: str) -> Tuple[List[AutomationRule], List[Device], Dict[str, float]]:
+    """Правила, устройства и координаты из снимка хранилища (только чтение)"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    rules = [AutomationRule.from_dict(r) for r in data.get("rules", [])]
+    devices = [Device.from_dict(d) for d in data.get("devices", [])]
+    return rules, devices, data.get("settings", {}).get("location")
+
+
+def format_result(result: ReplayResult) -> str:
+    """Текстовый отчёт о прогоне"""
+    lines = [
+        f"Событий: {result.events} за {result.elapsed:.2f} с ({result.rate:,.0f} событий/с)",
+        f"Период: {result.start} - {result.end}",
+        "",
+        f"{'Правило':<32} {'Срабатываний':>12} {'Подавлено':>10}  Первое / последнее",
+    ]
+    for stats in sorted(result.rules.values(), key=lambda s: -s.fired):
+        period = f"{stats.first:%Y-%m-%d %H:%M:%S} / {stats.last:%Y-%m-%d %H:%M:%S}" if stats.first else "-"
+        lines.append(f"{stats.name[:32]:<32} {stats.fired:>12} {stats.blocked:>10}  {period}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа командной строки"""
+    parser = argparse.ArgumentParser(description="Пробный прогон правил по записанным событиям")
+    parser.add_argument("events", help="файл событий (JSON Lines), файл или каталог захвата")
+    parser.add_argument("--state", default="data/state.json", help="снимок хранилища с правилами и устройствами")
+    parser.add_argument("--rule", action="append", dest="rule_ids", help="прогнать только указанные правила")
+    parser.add_argument("--all", action="store_true", help="включить и выключенные правила")
+    args = parser.parse_args(argv)
+    
+    rules, devices, location = load_state(args.state)
+    if args.rule_ids:
+        rules = [rule for rule in rules if rule.id in args.rule_ids]
+    if args.all:
+        for rule in rules:
+            rule.enabled = True
+    
+    if os.path.isdir(args.events) or args.events.endswith(".shcap"):
+        events = read_capture(args.events)
+    else:
+        events = read_jsonl(args.events)
+    result = RuleReplay(rules, devices, location).run(events)
+    print(format_result(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Сцены: наборы команд для актуаторов"""
+from typing import Dict, Any, List, Optional, Tuple
+from .models import Scene, Device
+from .event_bus import EventBus
+
+
+# Команда: (device_id, action, value)
+Command = Tuple[str, str, Optional[Any]]
+
+
+class SceneManager:
+    """Менеджер сцен
+    
+    Каждая сцена компилируется в готовый список команд, который
+    пересчитывается только при изменении сцен или состава устройств.
+    При запуске пропускаются устройства, уже находящиеся в целевом состоянии.
+    """
+    
+    def __init__(self, storage, event_bus: EventBus, simulator_manager):
+        self.storage = storage
+        self.event_bus = event_bus
+        self.simulator_manager = simulator_manager
+        self.scenes: Dict[str, Scene] = {}
+        self.devices: Dict[str, Device] = {}
+        self._plans: Dict[str, List[Command]] = {}
+        
+        self.reload()
+        self.event_bus.subscribe("devices_changed", lambda event: self.reload_devices())
+    
+    def reload(self):
+        """Перечитать сцены и устройства из хранилища"""
+        self.scenes = {s.id: s for s in self.storage.get_scenes()}
+        self.reload_devices()
+    
+    def reload_devices(self):
+        """Перечитать устройства и сбросить скомпилированные планы"""
+        self.devices = {d.id: d for d in self.storage.get_devices()}
+        self._plans.clear()
+    
+    def save_scene(self, scene: Scene):
+        """Добавить или обновить сцену"""
+        if scene.id in self.scenes:
+            self.storage.update_scene(scene)
+        else:
+            self.storage.add_scene(scene)
+        self.scenes[scene.id] = scene
+        self._plans.pop(scene.id, None)
+    
+    def delete_scene(self, scene_id: str):
+        """Удалить сцену"""
+        self.storage.delete_scene(scene_id)
+        self.scenes.pop(scene_id, None)
+        self._plans.pop(scene_id, None)
+    
+    def get_plan(self, scene_id: str) -> List[Command]:
+        """Скомпилированный план сцены"""
+        if scene_id not in self._plans:
+            self._plans[scene_id] = self._compile(self.scenes[scene_id])
+        return self._plans[scene_id]
+    
+    def _compile(self, scene: Scene) -> List[Command]:
+        """Развернуть действия и селекторы сцены в список команд"""
+        commands: Dict[str, Command] = {}
+        actuators = [d for d in self.devices.values() if d.category == "actuator"]
+        for action in scene.actions:
+            if action.get("device_id"):
+                targets = [self.devices[action["device_id"]]] if action["device_id"] in self.devices else []
+            else:
+                types = action.get("types")
+                room_id = action.get("room_id")
+                targets = [
+                    d for d in actuators
+                    if (not types or d.type in types) and (not room_id or d.room_id == room_id)
+                ]
+            for device in targets:
+                # Более позднее действие для того же устройства перекрывает раннее
+                commands[device.id] = (device.id, action["action"], action.get("value"))
+        return list(commands.values())
+    
+    def activate(self, scene_id: str) -> int:
+        """Запустить сцену, возвращает количество изменённых устройств"""
+        scene = self.scenes.get(scene_id)
+        if scene is None:
+            return 0
+        commands = [c for c in self.get_plan(scene_id) if not self._in_target_state(*c)]
+        if commands:
+            self.simulator_manager.control_many(commands, source=scene.name)
+        return len(commands)
+    
+    def _in_target_state(self, device_id: str, action: str, value: Optional[Any]) -> bool:
+        """Устройство уже в состоянии, которое задаёт команда"""
+        state = self.simulator_manager.get_state(device_id)
+        if state is None:
+            return False
+        if action == "on":
+            return state.get("powered", False) is True
+        if action == "off":
+            return state.get("powered", False) is False
+        if action == "set_level":
+            return state.get("level") == value
+        return False
@@ -0,0 +1,75 @@
+"""Общий планировщик отложенных вызовов"""
+import heapq
+import itertools
+import time
+from datetime import datetime
+from typing import Any, Callable, List, Set, Tuple
+from PySide6.QtCore import QObject, QTimer
+
+
+class Scheduler(QObject):
+    """Планировщик на одном таймере
+    
+    Задачи хранятся в куче по времени выполнения, единственный QTimer
+    заводится до ближайшей задачи. Отдельные таймеры на задачу не нужны.
+    """
+    
+    # Максимальный сон таймера: QTimer ограничен int32 мс, а часы могут сдвинуться
+    MAX_SLEEP_MS = 3600 * 1000
+    
+    def __init__(self):
+        super().__init__()
+        self._heap: List[Tuple[float, int, Callable, tuple]] = []
+        self._counter = itertools.count()
+        # ID задач, которые ещё не выполнены и не отменены
+        self._live: Set[int] = set()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._run_due)
+    
+    def call_later(self, delay: float, callback: Callable, *args: Any) -> int:
+        """Выполнить callback через delay секунд, возвращает ID задачи"""
+        handle = next(self._counter)
+        self._live.add(handle)
+        heapq.heappush(self._heap, (time.monotonic() + max(0.0, delay), handle, callback, args))
+        if self._heap[0][1] == handle:
+            self._arm()
+        return handle
+    
+    def call_at(self, when: datetime, callback: Callable, *args: Any) -> int:
+        """Выполнить callback в указанное местное время"""
+        return self.call_later((when - datetime.now()).total_seconds(), callback, *args)
+    
+    def cancel(self, handle: int):
+        """Отменить задачу"""
+        self._live.discard(handle)
+        # Отменённые записи удаляются из кучи, когда их становится много
+        if len(self._heap) > 2 * len(self._live) + 64:
+            self._heap = [entry for entry in self._heap if entry[1] in self._live]
+            heapq.heapify(self._heap)
+            self._arm()
+    
+    def __len__(self) -> int:
+        return len(self._live)
+    
+    def _arm(self):
+        """Завести таймер до ближайшей задачи"""
+        if not self._heap:
+            self._timer.stop()
+            return
+        delay_ms = max(0, int((self._heap[0][0] - time.monotonic()) * 1000))
+        self._timer.start(min(delay_ms, self.MAX_SLEEP_MS))
+    
+    def _run_due(self):
+        """Выполнить все наступившие задачи"""
+        now = time.monotonic()
+        while self._heap and self._heap[0][0] <= now:
+            _, handle, callback, args = heapq.heappop(self._heap)
+            if handle not in self._live:
+                continue
+            self._live.discard(handle)
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Error in scheduled task: {e}")
+        self._arm()
@@ -0,0 +1,159 @@
+"""Генерация показаний датчиков (без Qt)
+
+SensorModel используется симулятором устройства в основном процессе и
+рабочими процессами шардов, где нет цикла событий Qt.
+"""
+import random
+from typing import Any, Dict, Optional
+from .clock import SystemClock
+from .models import Device
+from .physics import RoomPhysics
+
+
+class SensorModel:
+    """Модель показаний одного датчика"""
+    
+    def __init__(self, device: Device, rng: Optional[random.Random] = None,
+                 clock=None, physics: Optional[RoomPhysics] = None):
+        self.device = device
+        # Собственный поток случайных чисел и часы (для воспроизводимых прогонов)
+        self.rng = rng or random.Random()
+        self.clock = clock or SystemClock()
+        # Модель комнат для режима "physical"
+        self.physics = physics
+        
+        # Состояние для генерации данных
+        self._sensor_state = {
+            "temperature": 22.0,
+            "humidity": 50.0,
+            "light": 500.0,
+            "motion": False,
+            "door": False,
+        }
+        self._last_motion_time = 0
+        self._update_counter = 0
+    
+    def next_value(self) -> Optional[Any]:
+        """Следующее показание датчика или None, если показания нет"""
+        mode = self.device.config.get("mode", "random")
+        new_value = None
+        
+        if mode == "physical" and self.physics is None:
+            # Без модели комнат показания меняются плавно
+            mode = "smooth"
+        
+        if mode == "physical" and self.device.type in ("temperature", "humidity"):
+            new_value = self._physical_value()
+        
+        elif self.device.type == "temperature":
+            if mode == "smooth":
+                # Плавное изменение
+                change = self.rng.uniform(-0.5, 0.5)
+                self._sensor_state["temperature"] += change
+                self._sensor_state["temperature"] = max(18, min(28, self._sensor_state["temperature"]))
+                new_value = round(self._sensor_state["temperature"], 1)
+            else:
+                new_value = round(self.rng.uniform(18, 28), 1)
+        
+        elif self.device.type == "humidity":
+            if mode == "smooth":
+                change = self.rng.uniform(-2, 2)
+                self._sensor_state["humidity"] += change
+                self._sensor_state["humidity"] = max(30, min(80, self._sensor_state["humidity"]))
+                new_value = round(self._sensor_state["humidity"], 1)
+            else:
+                new_value = round(self.rng.uniform(30, 80), 1)
+        
+        elif self.device.type == "motion":
+            # Движение - случайные события
+            if self.rng.random() < 0.1:  # 10% шанс
+                self._sensor_state["motion"] = True
+                new_value = True
+            else:
+                self._sensor_state["motion"] = False
+                new_value = False
+        
+        elif self.device.type == "light":
+            # Освещенность - синусоида + шум
+            hour = self.clock.now().hour
+            base = 100 + 400 * (1 - abs(hour - 12) / 12)
+            noise = self.rng.uniform(-50, 50)
+            new_value = max(0, round(base + noise))
+        
+        elif self.device.type == "door":
+            # Дверь - редкие события
+            if self.rng.random() < 0.05:  # 5% шанс
+                self._sensor_state["door"] = not self._sensor_state["door"]
+                new_value = self._sensor_state["door"]
+        
+        return new_value
+    
+    def _physical_value(self) -> Optional[float]:
+        """Показание датчика по модели комнаты с шумом измерения"""
+        room_id = self.device.room_id
+        if self.device.type == "temperature":
+            value = self.physics.room_temperature(room_id)
+            noise = 0.05
+        else:
+            value = self.physics.room_humidity(room_id)
+            noise = 0.3
+        if value is None:
+            return None
+        return round(value + self.rng.gauss(0, noise), 1)
+
+
+class ReportFilter:
+    """Отбор показаний датчика для отправки (настройки в Device.config)
+    
+    deadband, deadband_mode - изменение меньше порога ("abs" - в единицах
+        датчика, "percent" - в процентах от последнего отправленного) не отправляется
+    min_interval - не отправлять чаще, чем раз в min_interval секунд
+    max_interval - отправить отфильтрованное изменение, если с последней
+        отправки прошло max_interval секунд
+    heartbeat - повторить последнее значение, если ничего не отправлялось
+        heartbeat секунд (признак, что датчик на связи)
+    """
+    
+    REPORT = "report"
+    HEARTBEAT = "heartbeat"
+    
+    def __init__(self, config: Dict[str, Any], last_value: Any = None):
+        self.deadband = float(config.get("deadband", 0) or 0)
+        self.percent = config.get("deadband_mode", "abs") == "percent"
+        self.min_interval = float(config.get("min_interval", 0) or 0)
+        self.max_interval = float(config.get("max_interval", 0) or 0)
+        self.heartbeat = float(config.get("heartbeat", 0) or 0)
+        self.last_value = last_value
+        self.last_time: Optional[float] = None
+    
+    def offer(self, value: Any, now: float) -> Optional[str]:
+        """Проверить новое показание: REPORT, HEARTBEAT или None (отбросить)"""
+        if self.last_time is None:
+            # Первое показание сравнивается с сохранённым состоянием устройства
+            self.last_time = now
+            return self._accept(value, now, self.REPORT) if value != self.last_value else None
+        elapsed = now - self.last_time
+        if elapsed < self.min_interval:
+            return None
+        if value != self.last_value:
+            if self._significant(value) or (self.max_interval and elapsed >= self.max_interval):
+                return self._accept(value, now, self.REPORT)
+        if self.heartbeat and elapsed >= self.heartbeat:
+            return self._accept(self.last_value, now, self.HEARTBEAT)
+        return None
+    
+    def _accept(self, value: Any, now: float, kind: str) -> str:
+        self.last_value = value
+        self.last_time = now
+        return kind
+    
+    def _significant(self, value: Any) -> bool:
+        """Изменение больше зоны нечувствительности"""
+        if not self.deadband or isinstance(value, bool) or isinstance(self.last_value, bool):
+            return True
+        try:
+            change = abs(float(value) - float(self.last_value))
+        except (TypeError, ValueError):
+            return True
+        threshold = abs(float(self.last_value)) * self.deadband / 100 if self.percent else self.deadband
+        return change >= threshold
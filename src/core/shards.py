@@ -0,0 +1,258 @@
+"""Симуляция датчиков в нескольких процессах
+
+Для больших парков устройств датчики делятся на шарды, каждый шард
+обслуживает отдельный процесс. Процесс сам ведёт расписание обновлений
+своих датчиков и раз в BATCH_INTERVAL отправляет прошедшие ReportFilter показания
+одним пакетом через pipe. Пакет кодируется компактно:
+    varint(время пакета, мс) varint(число показаний)
+    показания: varint(номер датчика в шарде) значение
+    значение: 0 - False, 1 - True, 2 - zigzag(десятые), 3 - float (8 байт),
+              4 - zigzag(целое)
+Основной процесс опрашивает pipe по таймеру Qt и публикует каждый пакет
+одним событием sensor_update (EventBus.emit_batch).
+
+Запуск нагрузочного прогона:
+    python -m src.core.shards --devices 20000 --workers 4 --seconds 10
+"""
+import argparse
+import heapq
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from PySide6.QtCore import QObject, QTimer
+
+from .event_bus import EventBus
+from .models import Device
+from .sensors import ReportFilter, SensorModel
+from ..storage.capture import read_varint, unzigzag, write_varint, zigzag
+
+
+# Интервал отправки пакетов из процесса шарда (с)
+BATCH_INTERVAL = 0.1
+
+VALUE_FALSE = 0
+VALUE_TRUE = 1
+VALUE_DECIMAL = 2
+VALUE_FLOAT = 3
+VALUE_INT = 4
+
+_DOUBLE = struct.Struct("<d")
+
+
+def encode_batch(ts_ms: int, items: List[Tuple[int, Any]]) -> bytes:
+    """Закодировать пакет показаний (номер датчика в шарде, значение)"""
+    buf = bytearray()
+    write_varint(buf, ts_ms)
+    write_varint(buf, len(items))
+    for index, value in items:
+        write_varint(buf, index)
+        if value is True or value is False:
+            buf.append(VALUE_TRUE if value else VALUE_FALSE)
+            continue
+        if isinstance(value, int):
+            buf.append(VALUE_INT)
+            write_varint(buf, zigzag(value))
+            continue
+        scaled = round(value * 10)
+        if scaled / 10 == value:
+            buf.append(VALUE_DECIMAL)
+            write_varint(buf, zigzag(scaled))
+        else:
+            buf.append(VALUE_FLOAT)
+            buf += _DOUBLE.pack(value)
+    return bytes(buf)
+
+
+def decode_batch(data: bytes) -> Tuple[int, List[Tuple[int, Any]]]:
+    """Разобрать пакет показаний"""
+    ts_ms, pos = read_varint(data, 0)
+    count, pos = read_varint(data, pos)
+    items = []
+    for _ in range(count):
+        index, pos = read_varint(data, pos)
+        tag = data[pos]
+        pos += 1
+        if tag == VALUE_DECIMAL:
+            n, pos = read_varint(data, pos)
+            value = unzigzag(n) / 10
+        elif tag == VALUE_INT:
+            n, pos = read_varint(data, pos)
+            value = unzigzag(n)
+        elif tag == VALUE_FLOAT:
+            value = _DOUBLE.unpack_from(data, pos)[0]
+            pos += 8
+        else:
+            value = tag == VALUE_TRUE
+        items.append((index, value))
+    return ts_ms, items
+
+
+def shard_worker(conn, devices: List[Dict[str, Any]], seed: Optional[int]):
+    """Процесс шарда: генерировать показания и отправлять пакеты до сигнала остановки"""
+    models = []
+    for data in devices:
+        device = Device.from_dict(data)
+        rng = random.Random(f"{seed}:{device.id}") if seed is not None else None
+        models.append(SensorModel(device, rng))
+    
+    now = time.monotonic()
+    # Расписание: (время обновления, номер датчика); старт разнесён по интервалу
+    heap = [
+        (now + random.random() * model.device.config.get("update_interval", 2000) / 1000, index)
+        for index, model in enumerate(models)
+    ]
+    heapq.heapify(heap)
+    filters = [ReportFilter(model.device.config, model.device.state.get("value")) for model in models]
+    next_flush = now + BATCH_INTERVAL
+    pending: List[Tuple[int, Any]] = []
+    
+    while True:
+        now = time.monotonic()
+        while heap and heap[0][0] <= now:
+            due, index = heap[0]
+            model = models[index]
+            value = model.next_value()
+            if value is not None and filters[index].offer(value, due) is not None:
+                pending.append((index, filters[index].last_value))
+            heapq.heapreplace(heap, (due + model.device.config.get("update_interval", 2000) / 1000, index))
+        
+        if now >= next_flush:
+            if pending:
+                try:
+                    conn.send_bytes(encode_batch(int(time.time() * 1000), pending))
+                except (BrokenPipeError, OSError):
+                    return
+                pending = []
+            next_flush = now + BATCH_INTERVAL
+        
+        wake = min(next_flush, heap[0][0]) if heap else next_flush
+        # Ожидание одновременно служит проверкой сигнала остановки
+        if conn.poll(max(0.0, wake - time.monotonic())):
+            return
+
+
+class ShardPool(QObject):
+    """Пул процессов, симулирующих датчики шардами"""
+    
+    # Период опроса pipe в основном процессе (мс)
+    POLL_INTERVAL = 50
+    
+    def __init__(self, event_bus: EventBus, devices: List[Device], workers: Optional[int] = None,
+                 seed: Optional[int] = None):
+        super().__init__()
+        self.event_bus = event_bus
+        self.workers = max(1, min(workers or os.cpu_count() or 1, len(devices) or 1))
+        self.seed = seed
+        # Датчики каждого шарда в порядке номеров из пакетов
+        self.shards: List[List[Device]] = [devices[i::self.workers] for i in range(self.workers)]
+        self._processes = []
+        self._connections = []
+        self.received = 0
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.poll)
+    
+    def start(self):
+        """Запустить процессы шардов"""
+        context = multiprocessing.get_context("spawn")
+        for shard in self.shards:
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=shard_worker,
+                args=(child_conn, [device.to_dict() for device in shard], self.seed),
+                daemon=True
+            )
+            process.start()
+            child_conn.close()
+            self._processes.append(process)
+            self._connections.append(parent_conn)
+        self._timer.start(self.POLL_INTERVAL)
+    
+    def poll(self):
+        """Забрать пакеты из всех шардов и опубликовать их"""
+        for shard, conn in zip(self.shards, self._connections):
+            items = []
+            try:
+                while conn.poll():
+                    ts_ms, values = decode_batch(conn.recv_bytes())
+                    last_seen = datetime.fromtimestamp(ts_ms / 1000).isoformat()
+                    for index, value in values:
+                        device = shard[index]
+                        device.state["value"] = value
+                        device.last_seen = last_seen
+                        items.append({
+                            "device_id": device.id,
+                            "device_name": device.name,
+                            "type": device.type,
+                            "value": value,
+                            "room_id": device.room_id,
+                            "last_seen": last_seen
+                        })
+            except (EOFError, OSError):
+                pass
+            if items:
+                self.received += len(items)
+                self.event_bus.emit_batch("sensor_update", items)
+    
+    def stop(self):
+        """Остановить процессы шардов"""
+        self._timer.stop()
+        for conn in self._connections:
+            try:
+                conn.send_bytes(b"")
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        for conn in self._connections:
+            conn.close()
+        self._processes = []
+        self._connections = []
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа командной строки"""
+    from PySide6.QtCore import QCoreApplication
+    
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон датчиков в нескольких процессах")
+    parser.add_argument("--devices", type=int, default=10000, help="число датчиков")
+    parser.add_argument("--workers", type=int, default=None, help="число процессов (по умолчанию - по числу ядер)")
+    parser.add_argument("--seconds", type=float, default=10, help="длительность прогона")
+    parser.add_argument("--interval", type=int, default=2000, help="интервал обновления датчика, мс")
+    args = parser.parse_args(argv)
+    
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    types = ["temperature", "humidity", "motion", "light", "door"]
+    devices = [
+        Device(
+            id=f"sim_{i}", name=f"Датчик {i}", room_id=f"room_{i // 20}", category="sensor",
+            type=types[i % len(types)], config={"update_interval": args.interval, "mode": "smooth"}
+        )
+        for i in range(args.devices)
+    ]
+    event_bus = EventBus()
+    batches = [0]
+    event_bus.subscribe("sensor_update", lambda event: batches.__setitem__(0, batches[0] + 1))
+    
+    pool = ShardPool(event_bus, devices, args.workers)
+    started = time.perf_counter()
+    pool.start()
+    QTimer.singleShot(int(args.seconds * 1000), app.quit)
+    app.exec()
+    elapsed = time.perf_counter() - started
+    pool.stop()
+    
+    print(f"Датчиков: {args.devices}, процессов: {pool.workers}")
+    print(f"Показаний: {pool.received} ({pool.received / elapsed:,.0f}/с), пакетов: {batches[0]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,13 @@
 """Симулятор устройств ESP32/ESP8266"""
+import heapq
 import random
-import math
-from datetime import datetime
-from typing import Dict, Any, Optional
+from datetime import timedelta
+from typing import Dict, Any, List, Optional, Tuple
 from PySide6.QtCore import QTimer, QObject, Signal
+from .clock import SystemClock, VirtualClock
 from .models import Device
+from .physics import RoomPhysics
+from .sensors import ReportFilter, SensorModel
 from .event_bus import EventBus
 
 
@@ -13,97 +16,73 @@ class DeviceSimulator(QObject):
     
     value_changed = Signal(str, dict)  # device_id, new_state
     
-    def __init__(self, device: Device, event_bus: EventBus):
+    def __init__(self, device: Device, event_bus: EventBus, rng: Optional[random.Random] = None,
+                 clock=None, realtime: bool = True, physics: Optional[RoomPhysics] = None,
+                 pending: Optional[Dict[str, Dict[str, Any]]] = None):
         super().__init__()
         self.device = device
         self.event_bus = event_bus
+        # Общий буфер несохранённых состояний (записывается менеджером пакетами)
+        self.pending = pending
+        self.clock = clock or SystemClock()
+        # Показания датчика (свой поток случайных чисел и модель комнат)
+        self.model = SensorModel(device, rng, self.clock, physics)
+        # Зона нечувствительности, интервалы отправки и heartbeat
+        self.report_filter = ReportFilter(device.config, device.state.get("value"))
         self.timer = QTimer()
         self.timer.timeout.connect(self._update)
         
-        # Состояние для генерации данных
-        self._sensor_state = {
-            "temperature": 22.0,
-            "humidity": 50.0,
-            "light": 500.0,
-            "motion": False,
-            "door": False,
-        }
-        self._last_motion_time = 0
-        self._update_counter = 0
-        
-        # Интервал обновления (мс)
-        interval = device.config.get("update_interval", 2000)
-        self.timer.start(interval)
+        # Интервал обновления (мс); в режиме перемотки таймер не запускается
+        self.interval = device.config.get("update_interval", 2000)
+        if realtime:
+            self.timer.start(self.interval)
     
     def _update(self):
         """Обновить значение датчика"""
         if self.device.category != "sensor":
             return
         
-        mode = self.device.config.get("mode", "random")
-        new_value = None
-        
-        if self.device.type == "temperature":
-            if mode == "smooth":
-                # Плавное изменение
-                change = random.uniform(-0.5, 0.5)
-                self._sensor_state["temperature"] += change
-                self._sensor_state["temperature"] = max(18, min(28, self._sensor_state["temperature"]))
-                new_value = round(self._sensor_state["temperature"], 1)
-            else:
-                new_value = round(random.uniform(18, 28), 1)
-        
-        elif self.device.type == "humidity":
-            if mode == "smooth":
-                change = random.uniform(-2, 2)
-                self._sensor_state["humidity"] += change
-                self._sensor_state["humidity"] = max(30, min(80, self._sensor_state["humidity"]))
-                new_value = round(self._sensor_state["humidity"], 1)
-            else:
-                new_value = round(random.uniform(30, 80), 1)
-        
-        elif self.device.type == "motion":
-            # Движение - случайные события
-            if random.random() < 0.1:  # 10% шанс
-                self._sensor_state["motion"] = True
-                new_value = True
-            else:
-                self._sensor_state["motion"] = False
-                new_value = False
-        
-        elif self.device.type == "light":
-            # Освещенность - синусоида + шум
-            hour = datetime.now().hour
-            base = 100 + 400 * (1 - abs(hour - 12) / 12)
-            noise = random.uniform(-50, 50)
-            new_value = max(0, round(base + noise))
+        new_value = self.model.next_value()
+        if new_value is None:
+            return
         
-        elif self.device.type == "door":
-            # Дверь - редкие события
-            if random.random() < 0.05:  # 5% шанс
-                self._sensor_state["door"] = not self._sensor_state["door"]
-                new_value = self._sensor_state["door"]
+        # Незначимые изменения отбрасываются здесь, до шины событий
+        kind = self.report_filter.offer(new_value, self.clock.now().timestamp())
+        if kind is None:
+            return
         
-        if new_value is not None:
-            old_value = self.device.state.get("value")
-            self.device.state["value"] = new_value
-            self.device.last_seen = datetime.now().isoformat()
-            
-            # Отправить событие только если значение изменилось
-            if old_value != new_value:
-                self.value_changed.emit(self.device.id, {"value": new_value})
-                self.event_bus.emit("sensor_update", {
-                    "device_id": self.device.id,
-                    "device_name": self.device.name,
-                    "type": self.device.type,
-                    "value": new_value,
-                    "room_id": self.device.room_id
-                })
+        value = self.report_filter.last_value
+        self.device.state["value"] = value
+        self.device.last_seen = self.clock.now().isoformat()
+        if self.pending is not None:
+            self.pending[self.device.id] = {"state": self.device.state.copy(), "last_seen": self.device.last_seen}
+        data = {
+            "device_id": self.device.id,
+            "device_name": self.device.name,
+            "type": self.device.type,
+            "value": value,
+            "room_id": self.device.room_id,
+            "last_seen": self.device.last_seen
+        }
+        if kind == ReportFilter.HEARTBEAT:
+            data["heartbeat"] = True
+        else:
+            self.value_changed.emit(self.device.id, {"value": value})
+        self.event_bus.emit("sensor_update", data)
     
     def control(self, action: str, value: Optional[Any] = None):
         """Управление актуатором"""
+        payload = self.apply_control(action, value)
+        if payload is not None:
+            self.event_bus.emit("actuator_update", payload)
+    
+    def apply_control(self, action: str, value: Optional[Any] = None) -> Optional[Dict[str, Any]]:
+        """Изменить состояние актуатора без отправки события
+        
+        Возвращает данные для события actuator_update.
+        """
         if self.device.category != "actuator":
-            return
+            return None
         
         if action == "on":
             self.device.state["powered"] = True
@@ -112,17 +91,18 @@ class DeviceSimulator(QObject):
         elif action == "set_level" and value is not None:
             self.device.state["level"] = value
         
-        self.device.last_seen = datetime.now().isoformat()
+        self.device.last_seen = self.clock.now().isoformat()
         
-        self.event_bus.emit("actuator_update", {
+        return {
             "device_id": self.device.id,
             "device_name": self.device.name,
             "type": self.device.type,
             "action": action,
             "value": value,
             "state": self.device.state.copy(),
-            "room_id": self.device.room_id
-        })
+            "room_id": self.device.room_id,
+            "last_seen": self.device.last_seen
+        }
     
     def stop(self):
         """Остановить симулятор"""
@@ -130,34 +110,196 @@ class DeviceSimulator(QObject):
 
 
 class SimulatorManager(QObject):
-    """Менеджер всех симуляторов"""
+    """Менеджер всех симуляторов
+    
+    С seed каждый симулятор получает свой поток случайных чисел, зависящий
+    только от seed и ID устройства, поэтому прогоны повторяемы. В режиме
+    перемотки (fast_forward=True) таймеры не запускаются: время идёт по
+    виртуальным часам, а fast_forward() выполняет обновления так быстро,
+    как позволяет процессор.
+    """
+    
+    # Шаг модели комнат (мс)
+    PHYSICS_INTERVAL = 1000
+    # Интервал записи показаний датчиков в хранилище (мс)
+    SAVE_INTERVAL = 5000
     
-    def __init__(self, event_bus: EventBus):
+    def __init__(self, event_bus: EventBus, storage=None, seed: Optional[int] = None,
+                 clock=None, fast_forward: bool = False):
         super().__init__()
         self.event_bus = event_bus
+        self.storage = storage
+        self.seed = seed
+        self.realtime = not fast_forward
+        if fast_forward and not isinstance(clock, VirtualClock):
+            clock = VirtualClock(clock.now() if clock else None)
+        self.clock = clock or SystemClock()
         self.simulators: Dict[str, DeviceSimulator] = {}
+        # Показания датчиков, ещё не записанные в хранилище (device_id -> состояние)
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._save_timer = QTimer(self)
+        self._save_timer.timeout.connect(self.save_pending)
+        # Пул процессов для датчиков (shard_sensors)
+        self.shard_pool = None
+        
+        # Модель комнат: актуаторы влияют на датчики в режиме "physical"
+        self.physics = RoomPhysics()
+        self._physics_time = self.clock.now()
+        self._physics_timer = QTimer(self)
+        self._physics_timer.timeout.connect(self._step_physics)
+        if self.realtime:
+            self._physics_timer.start(self.PHYSICS_INTERVAL)
+            if storage is not None:
+                self._save_timer.start(self.SAVE_INTERVAL)
     
     def add_device(self, device: Device):
         """Добавить устройство для симуляции"""
         if device.id in self.simulators:
             self.remove_device(device.id)
         
-        simulator = DeviceSimulator(device, self.event_bus)
+        rng = random.Random(f"{self.seed}:{device.id}") if self.seed is not None else None
+        pending = self._pending if self.storage is not None else None
+        simulator = DeviceSimulator(device, self.event_bus, rng, self.clock, self.realtime, self.physics, pending)
         self.simulators[device.id] = simulator
+        self.physics.add_room(device.room_id)
+        if device.category == "actuator":
+            self.physics.set_actuator(device.id, device.room_id, device.type, device.state)
     
     def remove_device(self, device_id: str):
         """Удалить устройство из симуляции"""
         if device_id in self.simulators:
             self.simulators[device_id].stop()
             del self.simulators[device_id]
+            self._pending.pop(device_id, None)
+            self.physics.remove_actuator(device_id)
     
     def control_device(self, device_id: str, action: str, value: Optional[Any] = None):
         """Управление устройством"""
         if device_id in self.simulators:
-            self.simulators[device_id].control(action, value)
+            payload = self.simulators[device_id].apply_control(action, value)
+            if payload is not None:
+                self._update_physics([payload])
+                self._save_states([payload])
+                self.event_bus.emit("actuator_update", payload)
+    
+    def get_state(self, device_id: str) -> Optional[Dict[str, Any]]:
+        """Текущее состояние устройства в симуляции"""
+        simulator = self.simulators.get(device_id)
+        return simulator.device.state if simulator else None
+    
+    def control_many(self, commands: List[Tuple[str, str, Optional[Any]]], source: str = "",
+                     cause: Optional[List[str]] = None):
+        """Управление несколькими устройствами за один раз
+        
+        Все команды применяются до отправки событий, затем отправляется одно
+        пакетное событие actuator_update и выполняется одна запись в хранилище.
+        cause - цепочка правил, вызвавших изменение.
+        """
+        targets = [
+            (self.simulators[device_id], action, value)
+            for device_id, action, value in commands
+            if device_id in self.simulators
+        ]
+        payloads = []
+        for simulator, action, value in targets:
+            payload = simulator.apply_control(action, value)
+            if payload is not None:
+                payloads.append(payload)
+        if not payloads:
+            return
+        
+        self._update_physics(payloads)
+        self._save_states(payloads)
+        self.event_bus.emit("actuator_update", {
+            "source": source,
+            "cause": cause or [],
+            "devices": payloads
+        })
+    
+    def _update_physics(self, payloads: List[Dict[str, Any]]):
+        """Передать новые состояния актуаторов в модель комнат"""
+        self._step_physics()
+        for p in payloads:
+            self.physics.set_actuator(p["device_id"], p["room_id"], p["type"], p["state"])
+    
+    def _step_physics(self):
+        """Продвинуть модель комнат до текущего времени"""
+        now = self.clock.now()
+        self.physics.step((now - self._physics_time).total_seconds())
+        self._physics_time = now
+    
+    def _save_states(self, payloads: List[Dict[str, Any]]):
+        """Сохранить состояние актуаторов в хранилище"""
+        if self.storage is None:
+            return
+        self.storage.update_device_states({
+            p["device_id"]: {"state": p["state"], "last_seen": p["last_seen"]}
+            for p in payloads
+        })
+    
+    def save_pending(self):
+        """Записать накопленные показания датчиков в хранилище одной операцией"""
+        if self.storage is None or not self._pending:
+            return
+        states = dict(self._pending)
+        self._pending.clear()
+        self.storage.update_device_states(states)
+    
+    def shard_sensors(self, devices: List[Device], workers: Optional[int] = None):
+        """Симулировать датчики в пуле процессов (для больших парков устройств)
+        
+        Показания приходят пакетами, актуаторы остаются в основном процессе.
+        """
+        from .shards import ShardPool
+        
+        if self.shard_pool is not None:
+            self.shard_pool.stop()
+        sensors = [device for device in devices if device.category == "sensor"]
+        self.shard_pool = ShardPool(self.event_bus, sensors, workers, self.seed)
+        self.shard_pool.start()
+    
+    def fast_forward(self, seconds: float, scheduler=None) -> int:
+        """Прогнать seconds секунд виртуального времени, вернуть число обновлений
+        
+        scheduler (VirtualScheduler) выполняет отложенные задачи вперемешку
+        с обновлениями датчиков в порядке времени.
+        """
+        if self.realtime:
+            raise RuntimeError("fast_forward() доступен только в режиме перемотки")
+        start = self.clock.now()
+        end = start + timedelta(seconds=seconds)
+        # Куча: (время обновления, порядковый номер, симулятор)
+        heap = [
+            (start + timedelta(milliseconds=sim.interval), i, sim)
+            for i, sim in enumerate(self.simulators.values())
+            if sim.device.category == "sensor"
+        ]
+        heapq.heapify(heap)
+        updates = 0
+        while heap and heap[0][0] <= end:
+            due, i, simulator = heap[0]
+            if scheduler is not None:
+                scheduler.run_until(due)
+            self.clock.set(due)
+            self._step_physics()
+            simulator._update()
+            updates += 1
+            heapq.heapreplace(heap, (due + timedelta(milliseconds=simulator.interval), i, simulator))
+        if scheduler is not None:
+            scheduler.run_until(end)
+        self.clock.set(end)
+        self._step_physics()
+        self.save_pending()
+        return updates
     
     def stop_all(self):
         """Остановить все симуляторы"""
+        self._physics_timer.stop()
+        self._save_timer.stop()
+        self.save_pending()
+        if self.shard_pool is not None:
+            self.shard_pool.stop()
+            self.shard_pool = None
         for simulator in self.simulators.values():
             simulator.stop()
         self.simulators.clear()
@@ -0,0 +1,142 @@
+"""Расчёт времени срабатывания триггеров по времени
+
+Форматы триггеров:
+    {"type": "cron", "expr": "30 6 * * 1-5"}  - минута, час, день месяца, месяц, день недели (0 = воскресенье)
+    {"type": "sun", "event": "sunrise" | "sunset", "offset": -15}  - смещение в минутах
+
+Поля cron: *, 5, 1-5, */15, 1-30/2, 5/15 (с 5 до конца диапазона с шагом 15)
+и списки через запятую. Как в стандартном cron, если ограничены и день
+месяца, и день недели, достаточно совпадения любого из них: "0 7 1 * 1" -
+первое число месяца и каждый понедельник. Имена месяцев и дней, "?", "L",
+"W" и "#" не поддерживаются.
+"""
+import math
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+
+
+# Диапазоны полей cron-выражения
+CRON_FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+
+def _parse_cron_field(field: str, low: int, high: int) -> Set[int]:
+    """Разобрать поле cron: *, 5, 1-5, */15, 5/15, 1,3,5"""
+    values: Set[int] = set()
+    for part in field.split(","):
+        step = None
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            # N/step - с N до конца диапазона
+            end = start if step is None else high
+        if step is None:
+            step = 1
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Недопустимое поле cron: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def parse_cron(expr: str) -> List[Set[int]]:
+    """Разобрать cron-выражение из пяти полей"""
+    fields = expr.split()
+    if len(fields) != 5:
+        raise ValueError(f"Cron-выражение должно содержать 5 полей: {expr}")
+    return [_parse_cron_field(f, low, high) for f, (low, high) in zip(fields, CRON_FIELDS)]
+
+
+def next_cron(expr: str, after: datetime) -> Optional[datetime]:
+    """Ближайшее время по cron строго после after"""
+    minutes, hours, days, months, weekdays = parse_cron(expr)
+    # День месяца и день недели, если ограничены оба, объединяются по ИЛИ
+    fields = expr.split()
+    any_day = fields[2].startswith("*") or fields[4].startswith("*")
+    sorted_hours = sorted(hours)
+    sorted_minutes = sorted(minutes)
+    start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    
+    # Перебор по дням, внутри дня - только подходящие часы и минуты
+    for day_offset in range(366 * 4):
+        day = start.date() + timedelta(days=day_offset)
+        if day.month not in months:
+            continue
+        day_match = day.day in days
+        weekday_match = (day.weekday() + 1) % 7 in weekdays
+        if not (day_match and weekday_match if any_day else day_match or weekday_match):
+            continue
+        for hour in sorted_hours:
+            for minute in sorted_minutes:
+                candidate = datetime.combine(day, time(hour, minute))
+                if candidate >= start:
+                    return candidate
+    return None
+
+
+def sun_time(day: date, lat: float, lon: float, event: str) -> Optional[datetime]:
+    """Местное время восхода или заката (алгоритм NOAA), None для полярного дня/ночи"""
+    sunrise = event == "sunrise"
+    lng_hour = lon / 15
+    t = day.timetuple().tm_yday + ((6 if sunrise else 18) - lng_hour) / 24
+    
+    # Средняя аномалия и истинная долгота Солнца
+    m = 0.9856 * t - 3.289
+    l = (m + 1.916 * math.sin(math.radians(m)) + 0.020 * math.sin(math.radians(2 * m)) + 282.634) % 360
+    
+    # Прямое восхождение в том же квадранте, что и долгота
+    ra = math.degrees(math.atan(0.91764 * math.tan(math.radians(l)))) % 360
+    ra = (ra + (math.floor(l / 90) - math.floor(ra / 90)) * 90) / 15
+    
+    # Склонение и часовой угол
+    sin_dec = 0.39782 * math.sin(math.radians(l))
+    cos_dec = math.cos(math.asin(sin_dec))
+    cos_h = (math.cos(math.radians(90.833)) - sin_dec * math.sin(math.radians(lat))) / (
+        cos_dec * math.cos(math.radians(lat))
+    )
+    if cos_h > 1 or cos_h < -1:
+        return None
+    h = math.degrees(math.acos(cos_h))
+    h = (360 - h if sunrise else h) / 15
+    
+    ut = (h + ra - 0.06571 * t - 6.622 - lng_hour) % 24
+    moment = datetime.combine(day, time(0), tzinfo=timezone.utc) + timedelta(hours=ut)
+    return moment.astimezone().replace(tzinfo=None)
+
+
+def next_sun(trigger: Dict[str, Any], after: datetime, location: Dict[str, float]) -> Optional[datetime]:
+    """Ближайший восход/закат со смещением строго после after"""
+    offset = timedelta(minutes=trigger.get("offset", 0))
+    for day_offset in range(-1, 367):
+        day = after.date() + timedelta(days=day_offset)
+        moment = sun_time(day, location["lat"], location["lon"], trigger.get("event", "sunrise"))
+        if moment is not None and moment + offset > after:
+            return moment + offset
+    return None
+
+
+def next_trigger_time(trigger: Dict[str, Any], after: datetime, location: Dict[str, float]) -> Optional[datetime]:
+    """Ближайшее время срабатывания триггера"""
+    if trigger.get("type") == "cron":
+        return next_cron(trigger["expr"], after)
+    if trigger.get("type") == "sun":
+        return next_sun(trigger, after, location)
+    return None
+
+
+def next_window_edge(time_window: Dict[str, str], now: datetime) -> datetime:
+    """Ближайший момент открытия или закрытия временного окна"""
+    start = datetime.strptime(time_window.get("start", "00:00"), "%H:%M").time()
+    end = datetime.strptime(time_window.get("end", "23:59"), "%H:%M").time()
+    candidates = []
+    for day_offset in (0, 1):
+        day = now.date() + timedelta(days=day_offset)
+        candidates.append(datetime.combine(day, start))
+        # Окно включает минуту конца, закрывается в начале следующей
+        candidates.append(datetime.combine(day, end) + timedelta(minutes=1))
+    return min(c for c in candidates if c > now)
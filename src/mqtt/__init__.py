@@ -0,0 +1 @@
+# MQTT module
@@ -0,0 +1,193 @@
+"""Пропускная способность приёма MQTT на локальном брокере
+
+Сравнивает форматы сообщений и размеры пакетов: устройства публикуют
+показания через MqttPublisher в LocalBroker, MqttBridge разбирает их и
+публикует на шине событий. Время включает кодирование, доставку,
+разбор и обработку пакетных событий.
+
+Режим --bootstrap измеряет запуск: загрузку состояния парка из retained
+сообщений в пустое хранилище (с регистрацией устройств), повторный запуск
+без изменений и запуск после изменения части устройств.
+    
+    python -m src.mqtt.bench --devices 1000 --rounds 20
+    python -m src.mqtt.bench --devices 1000 --bootstrap
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+from PySide6.QtCore import QCoreApplication
+
+from ..core.event_bus import EventBus, batch_items
+from ..core.models import Device, Room
+from .broker import LocalBroker
+from .codecs import CODECS
+from ..storage.storage import Storage
+from .transport import MqttBridge, MqttPublisher
+
+
+class _FleetStorage:
+    """Минимальное хранилище с комнатами и устройствами для прогона"""
+    
+    def __init__(self, rooms: List[Room], devices: List[Device]):
+        self.rooms = rooms
+        self.devices = devices
+    
+    def get_rooms(self) -> List[Room]:
+        """Комнаты парка"""
+        return self.rooms
+    
+    def get_devices(self) -> List[Device]:
+        """Устройства парка"""
+        return self.devices
+    
+    def update_device_states(self, states: dict):
+        # Состояния в прогоне пропускной способности не сохраняются
+        pass
+
+
+def run(event_bus: EventBus, codec_name: str, batch_size: int, devices: int, rooms: int, rounds: int,
+        seed: int = 42) -> dict:
+    """Один прогон: rounds показаний от каждого устройства"""
+    rng = random.Random(seed)
+    fleet = [
+        Device(id=f"sensor_{i}", name=f"Датчик {i}", room_id=f"room_{i % rooms}",
+               category="sensor", type="temperature")
+        for i in range(devices)
+    ]
+    storage = _FleetStorage([Room(id=f"room_{i}", name=f"Комната {i}") for i in range(rooms)], fleet)
+    received = [0, 0]
+    
+    def on_update(event):
+        received[0] += 1
+        received[1] += len(batch_items(event["data"]))
+    
+    event_bus.subscribe("sensor_update", on_update)
+    broker = LocalBroker()
+    bridge = MqttBridge(storage, event_bus, broker, "bench")
+    for room in storage.get_rooms():
+        bridge.subscribe_room(room.id)
+    publisher = MqttPublisher(broker, "bench", CODECS[codec_name], batch_size)
+    
+    ts = int(time.time() * 1000)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        ts += 1000
+        for device in fleet:
+            publisher.publish(device.room_id, {
+                "device_id": device.id, "ts": ts, "value": round(rng.uniform(18, 26), 1)
+            })
+        publisher.flush()
+        bridge.poll()
+    elapsed = time.perf_counter() - started
+    bridge.stop()
+    event_bus.unsubscribe("sensor_update", on_update)
+    
+    readings = devices * rounds
+    return {
+        "codec": codec_name,
+        "batch": batch_size,
+        "messages": broker.published,
+        "bytes_per_reading": broker.bytes / readings,
+        "readings_per_sec": received[1] / elapsed,
+        "events": received[0],
+        "lost": readings - received[1]
+    }
+
+
+def _publish_states(publisher: MqttPublisher, fleet: List[Device], version: int, rng: random.Random):
+    ts = int(time.time() * 1000)
+    for device in fleet:
+        publisher.publish(device.room_id, {
+            "device_id": device.id, "ts": ts, "value": round(rng.uniform(18, 26), 1),
+            "version": version, "name": device.name, "category": device.category, "type": device.type
+        })
+
+
+def _start_bridge(storage: Storage, event_bus: EventBus, broker: LocalBroker) -> dict:
+    """Запуск приёма до окончания загрузки, вернуть данные fleet_synced"""
+    synced = {}
+    
+    def on_synced(event):
+        synced.update(event["data"])
+    
+    event_bus.subscribe("fleet_synced", on_synced)
+    started = time.perf_counter()
+    bridge = MqttBridge(storage, event_bus, broker, "bench")
+    bridge.start()
+    while bridge.bootstrapping:
+        bridge.poll()
+        time.sleep(0.01)
+    synced["startup"] = time.perf_counter() - started - bridge.BOOTSTRAP_SETTLE
+    bridge.stop()
+    event_bus.unsubscribe("fleet_synced", on_synced)
+    return synced
+
+
+def bootstrap(event_bus: EventBus, codec_name: str, devices: int, rooms: int, changed: float = 0.1,
+              seed: int = 42):
+    """Три запуска: пустое хранилище, без изменений, после изменения части устройств"""
+    rng = random.Random(seed)
+    fleet = [
+        Device(id=f"sensor_{i}", name=f"Датчик {i}", room_id=f"room_{i % rooms}",
+               category="sensor", type="temperature")
+        for i in range(devices)
+    ]
+    broker = LocalBroker()
+    publisher = MqttPublisher(broker, "bench", CODECS[codec_name])
+    _publish_states(publisher, fleet, 1, rng)
+    with tempfile.TemporaryDirectory() as directory:
+        storage = Storage(os.path.join(directory, "state.json"))
+        results = [("пустое хранилище", _start_bridge(storage, event_bus, broker)),
+                   ("без изменений", _start_bridge(storage, event_bus, broker))]
+        _publish_states(publisher, rng.sample(fleet, int(devices * changed)), 2, rng)
+        results.append((f"изменено {changed:.0%}", _start_bridge(storage, event_bus, broker)))
+        registered = sum(1 for d in storage.get_devices() if d.id.startswith("sensor_"))
+        storage.close()
+    return results, registered
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа командной строки"""
+    parser = argparse.ArgumentParser(description="Пропускная способность приёма MQTT на локальном брокере")
+    parser.add_argument("--devices", type=int, default=1000, help="число датчиков")
+    parser.add_argument("--rooms", type=int, default=20, help="число комнат")
+    parser.add_argument("--rounds", type=int, default=20, help="показаний от каждого датчика")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 50, 500], help="размеры пакетов")
+    parser.add_argument("--bootstrap", action="store_true", help="измерить загрузку состояния при запуске")
+    parser.add_argument("--payload", choices=list(CODECS), default="json", help="формат для --bootstrap")
+    args = parser.parse_args(argv)
+    
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    event_bus = EventBus()
+    
+    if args.bootstrap:
+        results, registered = bootstrap(event_bus, args.payload, args.devices, args.rooms)
+        print(f"Устройств: {args.devices}, комнат: {args.rooms}, формат: {args.payload}")
+        for name, synced in results:
+            print(f"{name}: {synced['startup']:.2f} с, добавлено {synced['added']}, "
+                  f"обновлено {synced['updated']}")
+        if registered != args.devices:
+            print(f"Зарегистрировано устройств: {registered}")
+            return 1
+        return 0
+    
+    print(f"Датчиков: {args.devices}, комнат: {args.rooms}, показаний: {args.devices * args.rounds}")
+    print(f"{'формат':<8}{'пакет':>7}{'сообщений':>11}{'байт/показ.':>13}{'показ./с':>12}{'событий':>9}")
+    for codec_name in CODECS:
+        for batch_size in args.batch:
+            result = run(event_bus, codec_name, batch_size, args.devices, args.rooms, args.rounds)
+            if result["lost"]:
+                print(f"{codec_name}: потеряно показаний: {result['lost']}")
+                return 1
+            print(f"{codec_name:<8}{batch_size:>7}{result['messages']:>11}"
+                  f"{result['bytes_per_reading']:>13.1f}{result['readings_per_sec']:>12,.0f}{result['events']:>9}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""Локальный брокер MQTT для симуляции и тестов
+
+Работает в том же процессе без сети: publish сразу вызывает обработчики
+подписок в потоке отправителя. Поддерживает фильтры с + и #, retained
+сообщения (новая подписка сразу получает подходящие сохранённые).
+Интерфейс совпадает с PahoConnection: subscribe, publish, close.
+"""
+import threading
+from typing import Callable, Dict, Iterator, List, Tuple
+
+
+# Обработчик сообщения: (топик, данные)
+MessageCallback = Callable[[str, bytes], None]
+
+
+def topic_matches(pattern: str, topic: str) -> bool:
+    """Подходит ли топик под фильтр подписки"""
+    pattern_levels = pattern.split("/")
+    topic_levels = topic.split("/")
+    for i, level in enumerate(pattern_levels):
+        if level == "#":
+            return True
+        if i >= len(topic_levels) or (level != "+" and level != topic_levels[i]):
+            return False
+    return len(pattern_levels) == len(topic_levels)
+
+
+class _Node:
+    __slots__ = ("children", "callbacks", "wildcard")
+    
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.callbacks: List[MessageCallback] = []
+        # Подписки с # на этом уровне
+        self.wildcard: List[MessageCallback] = []
+
+
+class LocalBroker:
+    """Брокер в памяти: дерево подписок по уровням топика"""
+    
+    def __init__(self):
+        self._root = _Node()
+        self._retained: Dict[str, bytes] = {}
+        self._lock = threading.RLock()
+        self.published = 0
+        self.bytes = 0
+    
+    def subscribe(self, pattern: str, callback: MessageCallback):
+        """Подписаться на фильтр топиков (+ и #), сразу получить подходящие retained сообщения"""
+        with self._lock:
+            node = self._root
+            levels = pattern.split("/")
+            for level in levels:
+                if level == "#":
+                    node.wildcard.append(callback)
+                    break
+                node = node.children.setdefault(level, _Node())
+            else:
+                node.callbacks.append(callback)
+            retained = [(t, p) for t, p in self._retained.items() if topic_matches(pattern, t)]
+        for topic, payload in retained:
+            callback(topic, payload)
+    
+    def unsubscribe(self, pattern: str, callback: MessageCallback):
+        """Отписаться от фильтра топиков"""
+        with self._lock:
+            node = self._root
+            for level in pattern.split("/"):
+                if level == "#":
+                    if callback in node.wildcard:
+                        node.wildcard.remove(callback)
+                    return
+                node = node.children.get(level)
+                if node is None:
+                    return
+            if callback in node.callbacks:
+                node.callbacks.remove(callback)
+    
+    def publish(self, topic: str, payload: bytes, retain: bool = False):
+        """Опубликовать сообщение и синхронно доставить его подписчикам"""
+        with self._lock:
+            self.published += 1
+            self.bytes += len(payload)
+            if retain:
+                # Пустое retained сообщение удаляет сохранённое (как в MQTT)
+                if payload:
+                    self._retained[topic] = payload
+                else:
+                    self._retained.pop(topic, None)
+            callbacks = list(self._match(topic.split("/")))
+        for callback in callbacks:
+            callback(topic, payload)
+    
+    def _match(self, levels: List[str]) -> Iterator[MessageCallback]:
+        nodes = [self._root]
+        for level in levels:
+            next_nodes = []
+            for node in nodes:
+                yield from node.wildcard
+                for key in (level, "+"):
+                    child = node.children.get(key)
+                    if child is not None:
+                        next_nodes.append(child)
+            nodes = next_nodes
+            if not nodes:
+                return
+        for node in nodes:
+            yield from node.callbacks
+            # # совпадает и с родительским уровнем (a/# подходит для a)
+            yield from node.wildcard
+    
+    def retained(self) -> List[Tuple[str, bytes]]:
+        """Сохранённые сообщения (топик, данные)"""
+        with self._lock:
+            return list(self._retained.items())
+    
+    def close(self):
+        """Закрыть подключение (локальному брокеру закрывать нечего)"""
+        pass
@@ -0,0 +1,238 @@
+"""Кодирование сообщений MQTT с показаниями устройств
+
+Сообщение несёт одно или несколько показаний. Показание - словарь
+{"device_id": ..., "ts": время в мс эпохи, "value": ...} и, возможно,
+дополнительные поля устройства (тип, название, версия состояния).
+
+Форматы (определяются по первому байту при разборе):
+    json   - {"device_id": ..., "ts": ..., "value": ...} или {"readings": [...]}
+    cbor   - массив [device_id, ts, данные] (RFC 8949, минимальное подмножество)
+    binary - байт 0xB1 и блок формата захвата (src.storage.capture): ID
+             устройств интернируются, время - дельтами, числа - varint
+Данные в cbor/binary - само значение или словарь {"value": ..., доп. поля}
+(всегда словарь, если значение само является словарём).
+"""
+import json
+import struct
+from typing import Any, Dict, List, Tuple
+
+from ..storage.capture import decode_block, encode_block
+
+
+# Показание устройства
+Reading = Dict[str, Any]
+
+BINARY_MAGIC = 0xB1
+
+
+def _split(reading: Reading) -> Tuple[str, int, Any]:
+    """(ID устройства, время, данные) для компактных форматов"""
+    extras = {k: v for k, v in reading.items() if k not in ("device_id", "ts", "value")}
+    value = reading.get("value")
+    if extras or isinstance(value, dict):
+        return reading["device_id"], int(reading.get("ts", 0)), {"value": value, **extras}
+    return reading["device_id"], int(reading.get("ts", 0)), value
+
+
+def _join(device_id: str, ts: int, data: Any) -> Reading:
+    if isinstance(data, dict):
+        return {"device_id": device_id, "ts": ts, **data}
+    return {"device_id": device_id, "ts": ts, "value": data}
+
+
+# --- CBOR (RFC 8949): целые, float, строки, байты, массивы, словари, bool, null ---
+
+_FLOAT32 = struct.Struct(">f")
+_FLOAT64 = struct.Struct(">d")
+
+
+def _cbor_head(buf: bytearray, major: int, n: int):
+    major <<= 5
+    if n < 24:
+        buf.append(major | n)
+    elif n < 0x100:
+        buf += bytes((major | 24, n))
+    elif n < 0x10000:
+        buf.append(major | 25)
+        buf += n.to_bytes(2, "big")
+    elif n < 0x100000000:
+        buf.append(major | 26)
+        buf += n.to_bytes(4, "big")
+    else:
+        buf.append(major | 27)
+        buf += n.to_bytes(8, "big")
+
+
+def _cbor_write(buf: bytearray, value: Any):
+    if value is None:
+        buf.append(0xF6)
+    elif value is True:
+        buf.append(0xF5)
+    elif value is False:
+        buf.append(0xF4)
+    elif isinstance(value, int):
+        if value >= 0:
+            _cbor_head(buf, 0, value)
+        else:
+            _cbor_head(buf, 1, -1 - value)
+    elif isinstance(value, float):
+        single = _FLOAT32.pack(value)
+        if _FLOAT32.unpack(single)[0] == value:
+            buf.append(0xFA)
+            buf += single
+        else:
+            buf.append(0xFB)
+            buf += _FLOAT64.pack(value)
+    elif isinstance(value, str):
+        raw = value.encode("utf-8")
+        _cbor_head(buf, 3, len(raw))
+        buf += raw
+    elif isinstance(value, (bytes, bytearray)):
+        _cbor_head(buf, 2, len(value))
+        buf += value
+    elif isinstance(value, (list, tuple)):
+        _cbor_head(buf, 4, len(value))
+        for item in value:
+            _cbor_write(buf, item)
+    elif isinstance(value, dict):
+        _cbor_head(buf, 5, len(value))
+        for key, item in value.items():
+            _cbor_write(buf, key)
+            _cbor_write(buf, item)
+    else:
+        raise TypeError(f"Тип не поддерживается CBOR: {type(value).__name__}")
+
+
+def cbor_dumps(value: Any) -> bytes:
+    """Закодировать значение в CBOR"""
+    buf = bytearray()
+    _cbor_write(buf, value)
+    return bytes(buf)
+
+
+def _cbor_read(data: bytes, pos: int) -> Tuple[Any, int]:
+    initial = data[pos]
+    pos += 1
+    major, info = initial >> 5, initial & 0x1F
+    if major == 7:
+        if info == 20:
+            return False, pos
+        if info == 21:
+            return True, pos
+        if info == 22 or info == 23:
+            return None, pos
+        if info == 25:
+            return struct.unpack_from(">e", data, pos)[0], pos + 2
+        if info == 26:
+            return _FLOAT32.unpack_from(data, pos)[0], pos + 4
+        if info == 27:
+            return _FLOAT64.unpack_from(data, pos)[0], pos + 8
+        raise ValueError(f"Неподдерживаемое простое значение CBOR: {info}")
+    if info < 24:
+        n = info
+    elif info <= 27:
+        size = 1 << (info - 24)
+        n = int.from_bytes(data[pos:pos + size], "big")
+        pos += size
+    else:
+        raise ValueError("Значения CBOR неопределённой длины не поддерживаются")
+    if major == 0:
+        return n, pos
+    if major == 1:
+        return -1 - n, pos
+    if major == 2:
+        return bytes(data[pos:pos + n]), pos + n
+    if major == 3:
+        return data[pos:pos + n].decode("utf-8"), pos + n
+    if major == 4:
+        items = []
+        for _ in range(n):
+            item, pos = _cbor_read(data, pos)
+            items.append(item)
+        return items, pos
+    if major == 5:
+        result = {}
+        for _ in range(n):
+            key, pos = _cbor_read(data, pos)
+            result[key], pos = _cbor_read(data, pos)
+        return result, pos
+    raise ValueError(f"Теги CBOR не поддерживаются (тип {major})")
+
+
+def cbor_loads(data: bytes) -> Any:
+    """Разобрать значение из CBOR"""
+    value, _ = _cbor_read(data, 0)
+    return value
+
+
+# --- Кодеки ---
+
+class JsonCodec:
+    """Текстовый JSON, совместимый с любыми клиентами"""
+    
+    name = "json"
+    
+    def encode(self, readings: List[Reading]) -> bytes:
+        """Показания в JSON: одно показание - объект, несколько - {"readings": [...]}"""
+        body = readings[0] if len(readings) == 1 else {"readings": readings}
+        return json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    
+    def decode(self, payload: bytes) -> List[Reading]:
+        """Показания из JSON-сообщения"""
+        body = json.loads(payload)
+        return body["readings"] if "readings" in body else [body]
+
+
+class CborCodec:
+    """Компактный двоичный CBOR (RFC 8949)"""
+    
+    name = "cbor"
+    
+    def encode(self, readings: List[Reading]) -> bytes:
+        """Показания в CBOR: список [device_id, ts, данные]"""
+        return cbor_dumps([list(_split(r)) for r in readings])
+    
+    def decode(self, payload: bytes) -> List[Reading]:
+        """Показания из CBOR-сообщения"""
+        return [_join(*item) for item in cbor_loads(payload)]
+
+
+class BinaryCodec:
+    """Блоки формата файлов захвата: таблица строк и varint"""
+    
+    name = "binary"
+    
+    def encode(self, readings: List[Reading]) -> bytes:
+        """Показания в блок формата захвата с маркером BINARY_MAGIC"""
+        events = []
+        for reading in readings:
+            device_id, ts, data = _split(reading)
+            events.append((ts * 1000, device_id, data))
+        return bytes((BINARY_MAGIC,)) + encode_block(events)
+    
+    def decode(self, payload: bytes) -> List[Reading]:
+        """Показания из двоичного блока"""
+        return [_join(device_id, ts_us // 1000, data) for ts_us, device_id, data in decode_block(payload[1:])]
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec(), CborCodec(), BinaryCodec())}
+
+
+def get_codec(name: str):
+    """Кодек по имени из настроек"""
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Неизвестный формат сообщений MQTT: {name}") from None
+
+
+def decode_payload(payload: bytes) -> List[Reading]:
+    """Разобрать сообщение любого формата"""
+    if not payload:
+        return []
+    first = payload[0]
+    if first == BINARY_MAGIC:
+        return CODECS["binary"].decode(payload)
+    if 0x80 <= first <= 0x9F:
+        return CODECS["cbor"].decode(payload)
+    return CODECS["json"].decode(payload)
@@ -0,0 +1,380 @@
+"""Обмен показаниями с устройствами через MQTT
+
+Топики (base - settings["mqtt"]["base_topic"]):
+    {base}/{комната}/{устройство}/state - последнее состояние устройства (retained)
+    {base}/{комната}/batch              - пакет показаний устройств комнаты
+Приложение подписывается на {base}/{комната}/# для каждой комнаты.
+
+Сообщения разбираются в потоке получения, а в основной поток попадают
+через очередь: MqttBridge по таймеру Qt забирает накопленные показания и
+публикует их на шине одним пакетным событием (EventBus.emit_batch).
+
+Для подключения к настоящему брокеру нужен пакет paho-mqtt (необязательная
+зависимость); без него доступен только LocalBroker.
+"""
+import queue
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Set, Tuple
+
+from PySide6.QtCore import QObject, QTimer
+
+from ..core.event_bus import EventBus
+from ..core.models import Device, Room
+from .broker import MessageCallback
+from .codecs import JsonCodec, Reading, decode_payload
+
+try:
+    import paho.mqtt.client as paho
+except ImportError:
+    paho = None
+
+
+def state_topic(base: str, room_id: str, device_id: str) -> str:
+    """Retained топик состояния устройства"""
+    return f"{base}/{room_id}/{device_id}/state"
+
+
+def batch_topic(base: str, room_id: str) -> str:
+    """Топик пакетов показаний комнаты"""
+    return f"{base}/{room_id}/batch"
+
+
+def room_filter(base: str, room_id: str) -> str:
+    """Фильтр всех сообщений комнаты"""
+    return f"{base}/{room_id}/#"
+
+
+class PahoConnection:
+    """Подключение к брокеру MQTT через paho-mqtt (интерфейс LocalBroker)"""
+    
+    def __init__(self, host: str, port: int = 1883, client_id: str = ""):
+        if paho is None:
+            raise RuntimeError("Для режима MQTT нужен пакет paho-mqtt: pip install paho-mqtt")
+        api = getattr(paho, "CallbackAPIVersion", None)
+        self.client = paho.Client(api.VERSION2, client_id=client_id) if api else paho.Client(client_id=client_id)
+        self._subscriptions: List[str] = []
+        self.client.on_connect = self._on_connect
+        self.client.connect(host, port)
+        self.client.loop_start()
+    
+    def _on_connect(self, client, *args):
+        # После переподключения брокер не помнит подписки чистой сессии
+        for pattern in self._subscriptions:
+            client.subscribe(pattern)
+    
+    def subscribe(self, pattern: str, callback: MessageCallback):
+        """Подписаться на фильтр топиков"""
+        self.client.message_callback_add(pattern, lambda client, userdata, message: callback(message.topic, message.payload))
+        self._subscriptions.append(pattern)
+        self.client.subscribe(pattern)
+    
+    def unsubscribe(self, pattern: str, callback: MessageCallback):
+        """Отписаться от фильтра топиков"""
+        self.client.message_callback_remove(pattern)
+        if pattern in self._subscriptions:
+            self._subscriptions.remove(pattern)
+        self.client.unsubscribe(pattern)
+    
+    def publish(self, topic: str, payload: bytes, retain: bool = False):
+        """Опубликовать сообщение"""
+        self.client.publish(topic, payload, retain=retain)
+    
+    def close(self):
+        """Остановить поток клиента и отключиться"""
+        self.client.loop_stop()
+        self.client.disconnect()
+
+
+def create_connection(settings: Dict[str, Any]):
+    """Подключение по настройкам settings["mqtt"]"""
+    return PahoConnection(settings.get("host", "localhost"), settings.get("port", 1883))
+
+
+class MqttPublisher:
+    """Отправка показаний со стороны устройств
+    
+    При batch_size > 1 показания копятся по комнатам и уходят пакетом в
+    топик batch, иначе каждое показание - отдельное retained сообщение state.
+    """
+    
+    def __init__(self, connection, base_topic: str, codec=None, batch_size: int = 1):
+        self.connection = connection
+        self.base_topic = base_topic
+        self.codec = codec or JsonCodec()
+        self.batch_size = batch_size
+        self._pending: Dict[str, List[Reading]] = {}
+    
+    def publish(self, room_id: str, reading: Reading):
+        """Отправить показание (при пакетной отправке - добавить в пакет комнаты)"""
+        if self.batch_size <= 1:
+            self.connection.publish(state_topic(self.base_topic, room_id, reading["device_id"]),
+                                    self.codec.encode([reading]), retain=True)
+            return
+        pending = self._pending.setdefault(room_id, [])
+        pending.append(reading)
+        if len(pending) >= self.batch_size:
+            self._flush_room(room_id)
+    
+    def flush(self):
+        """Отправить все накопленные пакеты"""
+        for room_id in list(self._pending):
+            self._flush_room(room_id)
+    
+    def _flush_room(self, room_id: str):
+        readings = self._pending.pop(room_id, None)
+        if readings:
+            self.connection.publish(batch_topic(self.base_topic, room_id), self.codec.encode(readings))
+
+
+def reading_time(reading: Reading) -> int:
+    """Время показания в мс (0 - не указано)"""
+    return int(reading.get("ts") or 0)
+
+
+def device_stamp(device: Device) -> Tuple[int, int]:
+    """(версия, время в мс) последнего известного состояния устройства"""
+    ts = round(datetime.fromisoformat(device.last_seen).timestamp() * 1000) if device.last_seen else 0
+    return device.version, ts
+
+
+def device_from_reading(device_id: str, room_id: str, reading: Reading) -> Device:
+    """Новое устройство по первому показанию (поля name, category, type - если прислал)"""
+    value = reading.get("value")
+    category = reading.get("category") or ("actuator" if isinstance(value, dict) else "sensor")
+    return Device(
+        id=device_id,
+        name=reading.get("name") or device_id,
+        room_id=room_id,
+        category=category,
+        type=reading.get("type") or "unknown",
+        config=dict(reading.get("config") or {})
+    )
+
+
+class MqttBridge(QObject):
+    """Приём показаний из MQTT и публикация их на шине событий
+    
+    При запуске состояние парка загружается из retained сообщений state
+    одной подпиской {base}/+/+/state: показания, которые новее сохранённых
+    (по версии, затем по времени), применяются и публикуются, неизвестные
+    устройства и комнаты регистрируются в хранилище. Повторно присланные
+    брокером retained сообщения (после переподключения) отбрасываются тем же
+    сравнением, поэтому до шины доходят только изменения. Показания без
+    version и ts сравнить не с чем, они применяются всегда. Изменённые
+    состояния записываются в хранилище одной записью раз в SYNC_INTERVAL.
+    Публикует rooms_changed и devices_changed при регистрации и fleet_synced
+    по окончании загрузки.
+    """
+    
+    # Период опроса очереди сообщений (мс)
+    POLL_INTERVAL = 50
+    # Период записи изменённых состояний в хранилище (мс)
+    SYNC_INTERVAL = 5000
+    # Наибольшее число показаний в одном событии шины
+    MAX_BATCH = 5000
+    # Загрузка закончена, если сообщений нет столько секунд
+    BOOTSTRAP_SETTLE = 0.5
+    # Предельная длительность загрузки (с)
+    BOOTSTRAP_TIMEOUT = 10.0
+    
+    def __init__(self, storage, event_bus: EventBus, connection, base_topic: str):
+        super().__init__()
+        self.storage = storage
+        self.event_bus = event_bus
+        self.connection = connection
+        self.base_topic = base_topic
+        self.devices: Dict[str, Device] = {}
+        self.rooms: Set[str] = set()
+        # Последнее принятое (версия, время) по устройствам
+        self._stamps: Dict[str, Tuple[int, int]] = {}
+        # Состояния, ещё не записанные в хранилище
+        self._dirty: Dict[str, Dict[str, Any]] = {}
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._filters: List[str] = []
+        self.received = 0
+        self.skipped = 0
+        self.errors = 0
+        self.bootstrapping = False
+        self._bootstrap_filter = f"{base_topic}/+/+/state"
+        self._bootstrap_started = 0.0
+        self._last_message = 0.0
+        # Устройства, добавленные и обновлённые при загрузке
+        self._bootstrap_added: Set[str] = set()
+        self._bootstrap_updated: Set[str] = set()
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.poll)
+        self._sync_timer = QTimer(self)
+        self._sync_timer.timeout.connect(self.sync)
+        self.reload_devices()
+        self.event_bus.subscribe("devices_changed", self._on_devices_changed)
+    
+    def _on_devices_changed(self, event: Dict[str, Any]):
+        self.reload_devices()
+    
+    def reload_devices(self):
+        """Перечитать устройства; несохранённые состояния сначала записываются"""
+        self.sync()
+        self.devices = {d.id: d for d in self.storage.get_devices()}
+        self.rooms = {room.id for room in self.storage.get_rooms()}
+        self._stamps = {
+            device_id: self._stamps.get(device_id) or device_stamp(device)
+            for device_id, device in self.devices.items()
+        }
+        if self._filters:
+            for room_id in self.rooms:
+                self.subscribe_room(room_id)
+    
+    def start(self):
+        """Подписаться на комнаты, загрузить retained состояния и начать приём"""
+        for room_id in self.rooms:
+            self.subscribe_room(room_id)
+        self.bootstrapping = True
+        self._bootstrap_started = self._last_message = time.monotonic()
+        self._bootstrap_added = set()
+        self._bootstrap_updated = set()
+        self.connection.subscribe(self._bootstrap_filter, self._on_message)
+        self._timer.start(self.POLL_INTERVAL)
+        self._sync_timer.start(self.SYNC_INTERVAL)
+    
+    def subscribe_room(self, room_id: str):
+        """Принимать сообщения комнаты"""
+        pattern = room_filter(self.base_topic, room_id)
+        if pattern not in self._filters:
+            self._filters.append(pattern)
+            self.connection.subscribe(pattern, self._on_message)
+    
+    def stop(self):
+        """Остановить приём и записать несохранённые состояния"""
+        self._timer.stop()
+        self._sync_timer.stop()
+        if self.bootstrapping:
+            self.bootstrapping = False
+            self.connection.unsubscribe(self._bootstrap_filter, self._on_message)
+        for pattern in self._filters:
+            self.connection.unsubscribe(pattern, self._on_message)
+        self._filters = []
+        self.event_bus.unsubscribe("devices_changed", self._on_devices_changed)
+        self.sync()
+    
+    def _on_message(self, topic: str, payload: bytes):
+        """Разобрать сообщение (в потоке получения) и поставить в очередь"""
+        try:
+            readings = decode_payload(payload)
+        except Exception as e:
+            self.errors += 1
+            print(f"Error decoding MQTT message on {topic}: {e}")
+            return
+        if readings:
+            # {base}/{комната}/...
+            room_id = topic[len(self.base_topic) + 1:].split("/", 1)[0]
+            self._queue.put((room_id, readings))
+    
+    def poll(self):
+        """Опубликовать накопленные показания пакетами"""
+        while True:
+            batch: List[Tuple[str, Reading]] = []
+            try:
+                while len(batch) < self.MAX_BATCH:
+                    room_id, readings = self._queue.get_nowait()
+                    batch.extend((room_id, reading) for reading in readings)
+            except queue.Empty:
+                pass
+            if not batch:
+                break
+            self._last_message = time.monotonic()
+            self.received += len(batch)
+            self._publish(batch)
+        if self.bootstrapping:
+            now = time.monotonic()
+            if (now - self._last_message >= self.BOOTSTRAP_SETTLE
+                    or now - self._bootstrap_started >= self.BOOTSTRAP_TIMEOUT):
+                self._finish_bootstrap(now)
+    
+    def _finish_bootstrap(self, now: float):
+        self.bootstrapping = False
+        self.connection.unsubscribe(self._bootstrap_filter, self._on_message)
+        self.sync()
+        self.event_bus.emit("fleet_synced", {
+            "devices": len(self.devices),
+            "added": len(self._bootstrap_added),
+            "updated": len(self._bootstrap_updated - self._bootstrap_added),
+            # Без времени ожидания тишины после последнего сообщения
+            "seconds": round(self._last_message - self._bootstrap_started, 3)
+        })
+    
+    def sync(self):
+        """Записать изменённые состояния устройств в хранилище"""
+        if self._dirty:
+            dirty, self._dirty = self._dirty, {}
+            self.storage.update_device_states(dirty)
+    
+    def _register(self, batch: List[Tuple[str, Reading]]):
+        """Зарегистрировать неизвестные устройства (и их комнаты) одной записью"""
+        new_devices: Dict[str, Device] = {}
+        for room_id, reading in batch:
+            device_id = reading["device_id"]
+            if device_id not in self.devices and device_id not in new_devices:
+                new_devices[device_id] = device_from_reading(device_id, room_id, reading)
+        if not new_devices:
+            return
+        new_rooms = sorted({d.room_id for d in new_devices.values()} - self.rooms)
+        self.storage.register_devices([Room(id=room_id, name=room_id) for room_id in new_rooms],
+                                      list(new_devices.values()))
+        if self.bootstrapping:
+            self._bootstrap_added.update(new_devices)
+        if new_rooms:
+            self.event_bus.emit("rooms_changed", {"room_ids": new_rooms, "source": "MQTT"})
+        # Версия 0 и время 0: первое показание нового устройства всегда новее
+        self.event_bus.emit("devices_changed", {"device_ids": list(new_devices), "source": "MQTT"})
+    
+    def _publish(self, batch: List[Tuple[str, Reading]]):
+        self._register(batch)
+        sensors: List[Dict[str, Any]] = []
+        actuators: List[Dict[str, Any]] = []
+        devices = self.devices
+        stamps = self._stamps
+        for _, reading in batch:
+            device = devices.get(reading["device_id"])
+            if device is None:
+                continue
+            known = stamps.get(device.id, (0, 0))
+            if "version" in reading or "ts" in reading:
+                stamp = (int(reading.get("version", known[0])), reading_time(reading))
+                if stamp <= known:
+                    # Повтор retained сообщения или устаревшее показание
+                    self.skipped += 1
+                    continue
+                stamps[device.id] = stamp
+            else:
+                # Показание без версии и времени сравнить не с чем - применяется всегда
+                stamp = (known[0], 0)
+            ts = stamp[1]
+            last_seen = datetime.fromtimestamp(ts / 1000).isoformat() if ts else datetime.now().isoformat()
+            device.last_seen = last_seen
+            device.version = stamp[0]
+            item = {
+                "device_id": device.id,
+                "device_name": device.name,
+                "type": device.type,
+                "room_id": device.room_id,
+                "last_seen": last_seen
+            }
+            value = reading.get("value")
+            if device.category == "sensor":
+                device.state["value"] = value
+                item["value"] = value
+                sensors.append(item)
+            else:
+                state = value if isinstance(value, dict) else {"powered": bool(value)}
+                device.state.update(state)
+                item["action"] = "state"
+                item["state"] = device.state.copy()
+                actuators.append(item)
+            if self.bootstrapping:
+                self._bootstrap_updated.add(device.id)
+            self._dirty[device.id] = {"state": device.state.copy(), "last_seen": last_seen, "version": device.version}
+        if sensors:
+            self.event_bus.emit_batch("sensor_update", sensors, source="MQTT")
+        if actuators:
+            self.event_bus.emit_batch("actuator_update", actuators, source="MQTT")
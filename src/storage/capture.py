@@ -0,0 +1,421 @@
+"""Запись событий шины в компактные бинарные файлы и их чтение
+
+Формат файла захвата (.shcap):
+    MAGIC, затем блоки: varint(длина) + содержимое блока
+    блок: varint(время первого события, мкс) varint(число событий) события...
+    событие: строка(тип) zigzag(дельта времени, мкс) значение(data)
+
+Строки (типы событий, ID устройств, ключи) интернируются в пределах
+блока: первое вхождение записывается целиком, повторные - номером.
+Поэтому каждый блок декодируется независимо, а список блоков с временем
+первого события служит разреженным индексом для поиска по времени.
+
+Значения типизированы: None/bool, целые (zigzag varint), числа с одним
+знаком после запятой (как целые десятые), прочие float (8 байт),
+строки, списки и словари.
+"""
+import bisect
+import os
+import queue
+import struct
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+MAGIC = b"SHCAP\x00\x01\n"
+
+# Теги значений
+TAG_NONE = 0
+TAG_FALSE = 1
+TAG_TRUE = 2
+TAG_INT = 3
+TAG_DECIMAL = 4  # число с одним знаком после запятой, хранится в десятых
+TAG_FLOAT = 5
+TAG_STR = 6
+TAG_LIST = 7
+TAG_DICT = 8
+
+_DOUBLE = struct.Struct("<d")
+
+# Событие из файла захвата: время, тип, данные
+CapturedEvent = Tuple[datetime, str, Dict[str, Any]]
+
+
+def write_varint(buf: bytearray, n: int):
+    """Дописать целое без знака в формате varint"""
+    while n >= 0x80:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def zigzag(n: int) -> int:
+    """Целое со знаком в беззнаковое (zigzag)"""
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def unzigzag(n: int) -> int:
+    """Обратное преобразование zigzag"""
+    return n >> 1 if not n & 1 else -(n >> 1) - 1
+
+
+def read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """Прочитать varint с позиции pos, вернуть (число, новая позиция)"""
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+class _BlockEncoder:
+    """Кодировщик одного блока событий"""
+    
+    def __init__(self, base_us: int):
+        self.base_us = base_us
+        self.last_us = base_us
+        self.count = 0
+        self.buf = bytearray()
+        self.strings: Dict[str, int] = {}
+    
+    def add(self, ts_us: int, event_type: str, data: Any):
+        """Добавить событие с временем ts_us (мкс)"""
+        buf = self.buf
+        self._write_str(event_type)
+        write_varint(buf, zigzag(ts_us - self.last_us))
+        self.last_us = ts_us
+        self._write_value(data)
+        self.count += 1
+    
+    def _write_str(self, text: str):
+        ref = self.strings.get(text)
+        if ref is not None:
+            write_varint(self.buf, ref)
+            return
+        self.strings[text] = len(self.strings) + 1
+        raw = text.encode("utf-8")
+        self.buf.append(0)
+        write_varint(self.buf, len(raw))
+        self.buf += raw
+    
+    def _write_value(self, value: Any):
+        buf = self.buf
+        if value is None:
+            buf.append(TAG_NONE)
+        elif value is True:
+            buf.append(TAG_TRUE)
+        elif value is False:
+            buf.append(TAG_FALSE)
+        elif isinstance(value, int):
+            buf.append(TAG_INT)
+            write_varint(buf, zigzag(value))
+        elif isinstance(value, float):
+            scaled = round(value * 10) if abs(value) < 1e14 else None
+            if scaled is not None and scaled / 10 == value:
+                buf.append(TAG_DECIMAL)
+                write_varint(buf, zigzag(scaled))
+            else:
+                buf.append(TAG_FLOAT)
+                buf += _DOUBLE.pack(value)
+        elif isinstance(value, str):
+            buf.append(TAG_STR)
+            self._write_str(value)
+        elif isinstance(value, (list, tuple)):
+            buf.append(TAG_LIST)
+            write_varint(buf, len(value))
+            for item in value:
+                self._write_value(item)
+        elif isinstance(value, dict):
+            buf.append(TAG_DICT)
+            write_varint(buf, len(value))
+            for key, item in value.items():
+                self._write_str(str(key))
+                self._write_value(item)
+        else:
+            buf.append(TAG_STR)
+            self._write_str(str(value))
+    
+    def payload(self) -> bytes:
+        """Заголовок и события блока без длины"""
+        header = bytearray()
+        write_varint(header, self.base_us)
+        write_varint(header, self.count)
+        return bytes(header) + bytes(self.buf)
+    
+    def to_bytes(self) -> bytes:
+        """Блок с префиксом длины для записи в файл"""
+        payload = self.payload()
+        block = bytearray()
+        write_varint(block, len(payload))
+        return bytes(block) + payload
+
+
+class _BlockDecoder:
+    """Декодировщик одного блока событий"""
+    
+    def __init__(self, payload: bytes):
+        self.data = payload
+        self.strings: List[str] = []
+    
+    def events(self) -> Iterator[Tuple[int, str, Any]]:
+        """События блока: (время в мкс, тип, данные)"""
+        data = self.data
+        ts_us, pos = read_varint(data, 0)
+        count, pos = read_varint(data, pos)
+        for _ in range(count):
+            event_type, pos = self._read_str(pos)
+            delta, pos = read_varint(data, pos)
+            ts_us += unzigzag(delta)
+            value, pos = self._read_value(pos)
+            yield ts_us, event_type, value
+    
+    def _read_str(self, pos: int) -> Tuple[str, int]:
+        ref, pos = read_varint(self.data, pos)
+        if ref:
+            return self.strings[ref - 1], pos
+        length, pos = read_varint(self.data, pos)
+        text = self.data[pos:pos + length].decode("utf-8")
+        self.strings.append(text)
+        return text, pos + length
+    
+    def _read_value(self, pos: int) -> Tuple[Any, int]:
+        data = self.data
+        tag = data[pos]
+        pos += 1
+        if tag == TAG_DECIMAL:
+            n, pos = read_varint(data, pos)
+            return unzigzag(n) / 10, pos
+        if tag == TAG_STR:
+            return self._read_str(pos)
+        if tag == TAG_DICT:
+            n, pos = read_varint(data, pos)
+            result = {}
+            for _ in range(n):
+                key, pos = self._read_str(pos)
+                result[key], pos = self._read_value(pos)
+            return result, pos
+        if tag == TAG_INT:
+            n, pos = read_varint(data, pos)
+            return unzigzag(n), pos
+        if tag == TAG_NONE:
+            return None, pos
+        if tag == TAG_TRUE:
+            return True, pos
+        if tag == TAG_FALSE:
+            return False, pos
+        if tag == TAG_FLOAT:
+            return _DOUBLE.unpack_from(data, pos)[0], pos + 8
+        if tag == TAG_LIST:
+            n, pos = read_varint(data, pos)
+            result = []
+            for _ in range(n):
+                item, pos = self._read_value(pos)
+                result.append(item)
+            return result, pos
+        raise ValueError(f"Неизвестный тег значения: {tag}")
+
+
+def encode_block(events: List[Tuple[int, str, Any]]) -> bytes:
+    """Закодировать события (время, мкс; имя; значение) одним блоком без префикса длины"""
+    encoder = _BlockEncoder(events[0][0] if events else 0)
+    for ts_us, name, value in events:
+        encoder.add(ts_us, name, value)
+    return encoder.payload()
+
+
+def decode_block(payload: bytes) -> Iterator[Tuple[int, str, Any]]:
+    """Разобрать блок, закодированный encode_block"""
+    return _BlockDecoder(payload).events()
+
+
+class CaptureWriter:
+    """Запись событий в ротируемые файлы захвата (без потоков)"""
+    
+    def __init__(self, directory: str = "data/captures", max_file_bytes: int = 16 * 1024 * 1024,
+                 max_files: int = 20, block_events: int = 256):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.block_events = block_events
+        self._file = None
+        self._file_bytes = 0
+        self._block: Optional[_BlockEncoder] = None
+        self._file_seq = 0
+    
+    def write(self, ts_us: int, event_type: str, data: Any):
+        """Добавить событие (время в микросекундах эпохи)"""
+        if self._block is None:
+            self._block = _BlockEncoder(ts_us)
+        self._block.add(ts_us, event_type, data)
+        if self._block.count >= self.block_events:
+            self.flush()
+    
+    def flush(self):
+        """Записать текущий блок на диск"""
+        if self._block is None:
+            return
+        block = self._block.to_bytes()
+        self._block = None
+        if self._file is None or self._file_bytes + len(block) > self.max_file_bytes:
+            self._rotate()
+        self._file.write(block)
+        self._file.flush()
+        self._file_bytes += len(block)
+    
+    def _rotate(self):
+        """Начать новый файл и удалить самые старые"""
+        if self._file is not None:
+            self._file.close()
+        self._file_seq += 1
+        name = f"capture-{datetime.now():%Y%m%d-%H%M%S}-{self._file_seq:04d}.shcap"
+        self._file = open(self.directory / name, "wb")
+        self._file.write(MAGIC)
+        self._file_bytes = len(MAGIC)
+        
+        files = capture_files(self.directory)
+        for old in files[:max(0, len(files) - self.max_files)]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+    
+    def close(self):
+        """Записать остаток и закрыть файл"""
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class EventRecorder:
+    """Запись всех событий шины в файлы захвата
+    
+    Обработчик шины только ставит событие в очередь; кодирование и запись
+    выполняет фоновый поток. Неполный блок записывается, если событий нет
+    дольше flush_interval секунд.
+    """
+    
+    def __init__(self, event_bus, directory: str = "data/captures", flush_interval: float = 1.0, **writer_options):
+        self.event_bus = event_bus
+        self.flush_interval = flush_interval
+        self._writer = CaptureWriter(directory, **writer_options)
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="EventRecorder", daemon=True)
+        self._thread.start()
+        self.event_bus.add_tap(self._on_event)
+    
+    def _on_event(self, event: Dict[str, Any]):
+        self._queue.put((time.time_ns() // 1000, event["type"], event.get("data")))
+    
+    def _run(self):
+        writer = self._writer
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                writer.flush()
+                continue
+            if item is None:
+                break
+            try:
+                writer.write(*item)
+            except Exception as e:
+                print(f"Error writing capture: {e}")
+        writer.close()
+    
+    def close(self):
+        """Остановить запись и дописать очередь"""
+        self.event_bus.remove_tap(self._on_event)
+        self._queue.put(None)
+        self._thread.join()
+
+
+class CaptureReader:
+    """Чтение файла захвата с поиском по времени"""
+    
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._index: Optional[List[Tuple[int, int]]] = None
+    
+    def index(self) -> List[Tuple[int, int]]:
+        """Разреженный индекс: (время первого события блока, смещение блока)"""
+        if self._index is None:
+            index = []
+            with open(self.path, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f"Не файл захвата: {self.path}")
+                offset = len(MAGIC)
+                while True:
+                    head = f.read(20)
+                    if not head:
+                        break
+                    try:
+                        length, pos = read_varint(head, 0)
+                        base_us, _ = read_varint(head, pos)
+                    except IndexError:
+                        break
+                    index.append((base_us, offset))
+                    offset += pos + length
+                    f.seek(offset)
+            self._index = index
+        return self._index
+    
+    def events(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[CapturedEvent]:
+        """События файла в интервале [start, end)"""
+        start_us = int(start.timestamp() * 1_000_000) if start else None
+        end_us = int(end.timestamp() * 1_000_000) if end else None
+        index = self.index()
+        first = 0
+        if start_us is not None:
+            # Последний блок, начавшийся не позже start
+            first = max(0, bisect.bisect_right(index, (start_us, float("inf"))) - 1)
+        if first >= len(index):
+            return
+        fromtimestamp = datetime.fromtimestamp
+        with open(self.path, "rb") as f:
+            f.seek(index[first][1])
+            for base_us, _ in index[first:]:
+                if end_us is not None and base_us >= end_us:
+                    return
+                head = f.read(10)
+                length, pos = read_varint(head, 0)
+                f.seek(pos - len(head), os.SEEK_CUR)
+                payload = f.read(length)
+                if len(payload) < length:
+                    # Файл обрезан (запись прервана) - последний блок неполный
+                    return
+                for ts_us, event_type, data in _BlockDecoder(payload).events():
+                    if start_us is not None and ts_us < start_us:
+                        continue
+                    if end_us is not None and ts_us >= end_us:
+                        return
+                    yield fromtimestamp(ts_us / 1_000_000), event_type, data
+    
+    def __iter__(self) -> Iterator[CapturedEvent]:
+        return self.events()
+
+
+def capture_files(directory: str) -> List[Path]:
+    """Файлы захвата каталога в порядке записи"""
+    return sorted(Path(directory).glob("capture-*.shcap"))
+
+
+def read_captures(directory: str, start: Optional[datetime] = None,
+                  end: Optional[datetime] = None) -> Iterator[CapturedEvent]:
+    """События всех файлов захвата каталога в интервале [start, end)"""
+    readers = [CaptureReader(path) for path in capture_files(directory)]
+    readers = [reader for reader in readers if reader.index()]
+    start_us = int(start.timestamp() * 1_000_000) if start else None
+    for i, reader in enumerate(readers):
+        # Файл целиком раньше start, если следующий начинается не позже start
+        if start_us is not None and i + 1 < len(readers) and readers[i + 1].index()[0][0] <= start_us:
+            continue
+        yield from reader.events(start, end)
@@ -1,21 +1,45 @@
 """Хранилище данных в JSON"""
 import json
 import os
-from typing import Dict, List, Optional
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
-from ..core.models import Room, Device, AutomationRule, LogEntry
+from ..core.models import Room, Device, AutomationRule, Scene, LogEntry
 
 
 class Storage:
-    """JSON хранилище данных"""
+    """JSON хранилище данных
+    
+    Полный снимок пишется атомарно (временный файл + rename), а каждая
+    мутация дописывается в журнал state.journal и воспроизводится при
+    запуске. Снимок обновляется раз в CHECKPOINT_EVERY записей журнала.
+    
+    Мутации и чтение логов защищены блокировкой: логи пишутся пакетами
+    из фонового потока (LogSink).
+    """
+    
+    # Количество записей журнала между полными снимками
+    CHECKPOINT_EVERY = 500
+    # Операции, для которых не нужен fsync (потеря хвоста логов допустима)
+    NO_FSYNC_OPS = {"add_log", "add_logs"}
+    # Предел числа хранимых логов; сроки хранения задаёт LogCompactor
+    MAX_LOGS = 10000
     
     def __init__(self, data_file: str = "data/state.json"):
         self.data_file = Path(data_file)
         self.data_file.parent.mkdir(parents=True, exist_ok=True)
+        self.journal_file = self.data_file.with_suffix(".journal")
+        self._journal = None
+        self._journal_entries = 0
+        self._seq = 0
+        # Сколько логов добавлено с момента запуска (не уменьшается при обрезке)
+        self._logs_total = 0
+        self._lock = threading.RLock()
         self._data = {
             "rooms": [],
             "devices": [],
             "rules": [],
+            "scenes": [],
             "logs": [],
             "settings": {
                 "mode": "local",  # local или mqtt
@@ -23,31 +47,122 @@ class Storage:
                     "host": "localhost",
                     "port": 1883,
                     "base_topic": "smarthome"
-                }
+                },
+                "location": {"lat": 55.75, "lon": 37.62},
+                "capture": {"enabled": False, "directory": "data/captures"},
+                # Уровень и прореживание логов: sample - каждая N-я запись типа,
+                # devices - каждая N-я запись устройства (0 - не логировать)
+                "logging": {"level": "debug", "sample": {"sensor": 1}, "devices": {}},
+                # Сроки хранения логов по типам (часы); старые показания датчиков
+                # сворачиваются в почасовые сводки (summary)
+                "retention": {"sensor": 24, "actuator": 720, "rule": 2160, "system": 2160, "summary": 2160}
             }
         }
         self._load()
     
     def _load(self):
-        """Загрузить данные из файла"""
+        """Загрузить снимок и воспроизвести журнал"""
         if self.data_file.exists():
             try:
                 with open(self.data_file, "r", encoding="utf-8") as f:
                     self._data = json.load(f)
+                self._seq = self._data.pop("journal_seq", 0)
             except Exception as e:
                 print(f"Error loading data: {e}")
+                # Сохранить повреждённый файл для ручного восстановления вместе с журналом:
+                # записи журнала относятся к старым данным и не применяются к демо
+                self.data_file.replace(self.data_file.with_name(self.data_file.name + ".corrupt"))
+                if self.journal_file.exists():
+                    self.journal_file.replace(self.journal_file.with_name(self.journal_file.name + ".corrupt"))
                 self._data = self._get_default_data()
+                self._seq = 0
         else:
             self._data = self._get_default_data()
-            self._save()
+        
+        # Файлы старых версий без сцен получают сцены по умолчанию
+        self._data.setdefault("scenes", self._get_default_scenes())
+        self._logs_total = len(self._data["logs"])
+        self._replay_journal()
+        self._checkpoint()
+    
+    def _replay_journal(self):
+        """Применить записи журнала, которых ещё нет в снимке"""
+        if not self.journal_file.exists():
+            return
+        with open(self.journal_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Недописанная запись при сбое - дальше журнал не читаем
+                    break
+                if entry["seq"] <= self._seq:
+                    continue
+                try:
+                    self._apply(entry["op"], entry["data"])
+                except Exception as e:
+                    print(f"Error replaying journal entry {entry['seq']}: {e}")
+                self._seq = entry["seq"]
     
     def _save(self):
-        """Сохранить данные в файл"""
+        """Атомарно сохранить полный снимок в файл"""
+        tmp_file = self.data_file.with_name(self.data_file.name + ".tmp")
         try:
-            with open(self.data_file, "w", encoding="utf-8") as f:
-                json.dump(self._data, f, indent=2, ensure_ascii=False)
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({**self._data, "journal_seq": self._seq}, f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.data_file)
+            return True
         except Exception as e:
             print(f"Error saving data: {e}")
+            return False
+    
+    def _checkpoint(self):
+        """Сохранить снимок и очистить журнал"""
+        if not self._save():
+            # Снимок не записан - продолжаем дописывать существующий журнал
+            if self._journal is None:
+                self._journal = open(self.journal_file, "a", encoding="utf-8")
+            return
+        if self._journal:
+            self._journal.close()
+        # Записи до journal_seq уже в снимке, поэтому журнал можно обнулить
+        self._journal = open(self.journal_file, "w", encoding="utf-8")
+        self._journal_entries = 0
+    
+    def _commit(self, op: str, data):
+        """Применить мутацию и записать её в журнал"""
+        with self._lock:
+            self._apply(op, data)
+            self._seq += 1
+            try:
+                self._journal.write(json.dumps({"seq": self._seq, "op": op, "data": data}, ensure_ascii=False) + "\n")
+                self._journal.flush()
+                if op not in self.NO_FSYNC_OPS:
+                    os.fsync(self._journal.fileno())
+            except Exception as e:
+                print(f"Error writing journal: {e}")
+            self._journal_entries += 1
+            if self._journal_entries >= self.CHECKPOINT_EVERY:
+                self._checkpoint()
+    
+    def _apply(self, op: str, data):
+        """Применить мутацию к данным в памяти"""
+        getattr(self, f"_apply_{op}")(data)
+    
+    def flush(self):
+        """Принудительно сохранить снимок"""
+        with self._lock:
+            self._checkpoint()
+    
+    def close(self):
+        """Сохранить снимок и закрыть журнал"""
+        with self._lock:
+            self._checkpoint()
+            if self._journal:
+                self._journal.close()
+                self._journal = None
     
     def _get_default_data(self) -> dict:
         """Получить данные по умолчанию (демо)"""
@@ -65,7 +180,7 @@ class Storage:
                     "category": "sensor",
                     "type": "temperature",
                     "state": {"value": 22.0},
-                    "config": {"update_interval": 2000, "mode": "smooth"},
+                    "config": {"update_interval": 2000, "mode": "physical", "heartbeat": 60},
                     "last_seen": None
                 },
                 {
@@ -75,7 +190,7 @@ class Storage:
                     "category": "sensor",
                     "type": "humidity",
                     "state": {"value": 50.0},
-                    "config": {"update_interval": 2000, "mode": "smooth"},
+                    "config": {"update_interval": 2000, "mode": "physical"},
                     "last_seen": None
                 },
                 {
@@ -95,7 +210,8 @@ class Storage:
                     "category": "sensor",
                     "type": "light",
                     "state": {"value": 500.0},
-                    "config": {"update_interval": 2000, "mode": "smooth"},
+                    "config": {"update_interval": 2000, "mode": "smooth",
+                               "deadband": 20, "deadband_mode": "percent", "max_interval": 60},
                     "last_seen": None
                 },
                 {
@@ -175,6 +291,7 @@ class Storage:
                     "action_value": None
                 }
             ],
+            "scenes": self._get_default_scenes(),
             "logs": [],
             "settings": {
                 "mode": "local",
@@ -182,10 +299,34 @@ class Storage:
                     "host": "localhost",
                     "port": 1883,
                     "base_topic": "smarthome"
-                }
+                },
+                "location": {"lat": 55.75, "lon": 37.62},
+                "capture": {"enabled": False, "directory": "data/captures"},
+                "logging": {"level": "debug", "sample": {"sensor": 1}, "devices": {}},
+                "retention": {"sensor": 24, "actuator": 720, "rule": 2160, "system": 2160, "summary": 2160}
             }
         }
     
+    def _get_default_scenes(self) -> list:
+        """Сцены по умолчанию (бывшие быстрые действия)"""
+        return [
+            {
+                "id": "scene_lights_off",
+                "name": "🔌 Выключить весь свет",
+                "actions": [{"types": ["light"], "action": "off", "value": None}]
+            },
+            {
+                "id": "scene_night",
+                "name": "🌙 Режим Ночь",
+                "actions": [{"types": ["light", "fan", "heater"], "action": "off", "value": None}]
+            },
+            {
+                "id": "scene_away",
+                "name": "🚪 Я ушёл",
+                "actions": [{"types": None, "action": "off", "value": None}]
+            }
+        ]
+    
     # Rooms
     def get_rooms(self) -> List[Room]:
         """Получить все комнаты"""
@@ -193,21 +334,24 @@ class Storage:
     
     def add_room(self, room: Room):
         """Добавить комнату"""
-        self._data["rooms"].append(room.to_dict())
-        self._save()
+        self._commit("add_room", room.to_dict())
     
     def update_room(self, room: Room):
         """Обновить комнату"""
-        for i, r in enumerate(self._data["rooms"]):
-            if r["id"] == room.id:
-                self._data["rooms"][i] = room.to_dict()
-                self._save()
-                return
+        self._commit("update_room", room.to_dict())
     
     def delete_room(self, room_id: str):
         """Удалить комнату"""
+        self._commit("delete_room", room_id)
+    
+    def _apply_add_room(self, data: dict):
+        self._data["rooms"].append(data)
+    
+    def _apply_update_room(self, data: dict):
+        self._replace_item("rooms", data)
+    
+    def _apply_delete_room(self, room_id: str):
         self._data["rooms"] = [r for r in self._data["rooms"] if r["id"] != room_id]
-        self._save()
     
     # Devices
     def get_devices(self) -> List[Device]:
@@ -223,21 +367,47 @@ class Storage:
     
     def add_device(self, device: Device):
         """Добавить устройство"""
-        self._data["devices"].append(device.to_dict())
-        self._save()
+        self._commit("add_device", device.to_dict())
     
     def update_device(self, device: Device):
         """Обновить устройство"""
-        for i, d in enumerate(self._data["devices"]):
-            if d["id"] == device.id:
-                self._data["devices"][i] = device.to_dict()
-                self._save()
-                return
+        self._commit("update_device", device.to_dict())
     
     def delete_device(self, device_id: str):
         """Удалить устройство"""
+        self._commit("delete_device", device_id)
+    
+    def update_device_states(self, states: Dict[str, dict]):
+        """Обновить состояние нескольких устройств одной записью
+        
+        states: {device_id: {"state": {...}, "last_seen": "...", "version": ...}}
+        """
+        self._commit("update_device_states", states)
+    
+    def register_devices(self, rooms: List[Room], devices: List[Device]):
+        """Добавить новые комнаты и устройства одной записью"""
+        self._commit("register_devices", {
+            "rooms": [r.to_dict() for r in rooms],
+            "devices": [d.to_dict() for d in devices]
+        })
+    
+    def _apply_add_device(self, data: dict):
+        self._data["devices"].append(data)
+    
+    def _apply_update_device(self, data: dict):
+        self._replace_item("devices", data)
+    
+    def _apply_delete_device(self, device_id: str):
         self._data["devices"] = [d for d in self._data["devices"] if d["id"] != device_id]
-        self._save()
+    
+    def _apply_register_devices(self, data: dict):
+        self._data["rooms"].extend(data["rooms"])
+        self._data["devices"].extend(data["devices"])
+    
+    def _apply_update_device_states(self, states: Dict[str, dict]):
+        for d in self._data["devices"]:
+            if d["id"] in states:
+                d.update(states[d["id"]])
     
     # Rules
     def get_rules(self) -> List[AutomationRule]:
@@ -246,42 +416,151 @@ class Storage:
     
     def add_rule(self, rule: AutomationRule):
         """Добавить правило"""
-        self._data["rules"].append(rule.to_dict())
-        self._save()
+        self._commit("add_rule", rule.to_dict())
     
     def update_rule(self, rule: AutomationRule):
         """Обновить правило"""
-        for i, r in enumerate(self._data["rules"]):
-            if r["id"] == rule.id:
-                self._data["rules"][i] = rule.to_dict()
-                self._save()
-                return
+        self._commit("update_rule", rule.to_dict())
     
     def delete_rule(self, rule_id: str):
         """Удалить правило"""
+        self._commit("delete_rule", rule_id)
+    
+    def _apply_add_rule(self, data: dict):
+        self._data["rules"].append(data)
+    
+    def _apply_update_rule(self, data: dict):
+        self._replace_item("rules", data)
+    
+    def _apply_delete_rule(self, rule_id: str):
         self._data["rules"] = [r for r in self._data["rules"] if r["id"] != rule_id]
-        self._save()
+    
+    # Scenes
+    def get_scenes(self) -> List[Scene]:
+        """Получить все сцены"""
+        return [Scene.from_dict(s) for s in self._data["scenes"]]
+    
+    def add_scene(self, scene: Scene):
+        """Добавить сцену"""
+        self._commit("add_scene", scene.to_dict())
+    
+    def update_scene(self, scene: Scene):
+        """Обновить сцену"""
+        self._commit("update_scene", scene.to_dict())
+    
+    def delete_scene(self, scene_id: str):
+        """Удалить сцену"""
+        self._commit("delete_scene", scene_id)
+    
+    def _apply_add_scene(self, data: dict):
+        self._data["scenes"].append(data)
+    
+    def _apply_update_scene(self, data: dict):
+        self._replace_item("scenes", data)
+    
+    def _apply_delete_scene(self, scene_id: str):
+        self._data["scenes"] = [s for s in self._data["scenes"] if s["id"] != scene_id]
     
     # Logs
     def add_log(self, log: LogEntry):
         """Добавить лог"""
-        self._data["logs"].append(log.to_dict())
-        # Ограничить количество логов
-        if len(self._data["logs"]) > 1000:
-            self._data["logs"] = self._data["logs"][-1000:]
-        self._save()
+        self._commit("add_log", log.to_dict())
+    
+    def add_logs(self, logs: List[LogEntry]):
+        """Добавить пакет логов одной записью журнала"""
+        if logs:
+            self._commit("add_logs", [log.to_dict() for log in logs])
     
     def get_logs(self, limit: Optional[int] = None) -> List[LogEntry]:
         """Получить логи"""
-        logs = [LogEntry.from_dict(l) for l in self._data["logs"]]
-        if limit:
-            logs = logs[-limit:]
-        return logs
+        with self._lock:
+            logs = self._data["logs"][-limit:] if limit else list(self._data["logs"])
+        return [LogEntry.from_dict(l) for l in logs]
+    
+    def iter_logs(self, chunk_size: int = 500) -> Iterator[LogEntry]:
+        """Перебрать логи от старых к новым, копируя под блокировкой по chunk_size записей
+        
+        Память не зависит от числа логов. Если во время перебора логи
+        уплотняются, часть записей может быть пропущена или повторена.
+        """
+        position = 0
+        while True:
+            with self._lock:
+                chunk = self._data["logs"][position:position + chunk_size]
+            if not chunk:
+                return
+            position += len(chunk)
+            for data in chunk:
+                yield LogEntry.from_dict(data)
+    
+    def count_logs(self) -> int:
+        """Число хранимых логов"""
+        return len(self._data["logs"])
+    
+    def get_logs_after(self, seen_total: int) -> Tuple[List[LogEntry], int]:
+        """Получить логи, добавленные после seen_total, и новый счётчик"""
+        with self._lock:
+            total = self._logs_total
+            new_count = total - seen_total
+            if new_count <= 0:
+                return [], total
+            logs = self._data["logs"][-new_count:]
+        return [LogEntry.from_dict(l) for l in logs], total
+    
+    def compact_logs(self, start: int, count: int,
+                     transform: Callable[[List[dict]], List[dict]]) -> Tuple[int, int]:
+        """Заменить логи [start, start + count) результатом transform
+        
+        Окно читается и заменяется под блокировкой, поэтому логи, дописанные
+        фоновым потоком, не теряются. Возвращает (число записей в окне после
+        замены, общее число логов).
+        """
+        with self._lock:
+            window = self._data["logs"][start:start + count]
+            compacted = transform(window)
+            if compacted != window:
+                self._commit("replace_logs", {"start": start, "count": len(window), "logs": compacted})
+            return len(compacted), len(self._data["logs"])
     
     def clear_logs(self):
         """Очистить логи"""
+        self._commit("clear_logs", None)
+    
+    def _apply_add_log(self, data: dict):
+        self._data["logs"].append(data)
+        self._logs_total += 1
+        self._trim_logs()
+    
+    def _apply_add_logs(self, data: List[dict]):
+        self._data["logs"].extend(data)
+        self._logs_total += len(data)
+        self._trim_logs()
+    
+    def _apply_replace_logs(self, data: dict):
+        start = data["start"]
+        self._data["logs"][start:start + data["count"]] = data["logs"]
+    
+    def _trim_logs(self):
+        """Ограничить количество логов
+        
+        Сначала удаляются самые старые показания датчиков, чтобы частые
+        обновления не вытесняли историю правил и системы. Удаляется с запасом
+        (до 90% предела), чтобы обрезка выполнялась редко.
+        """
+        logs = self._data["logs"]
+        if len(logs) <= self.MAX_LOGS:
+            return
+        excess = len(logs) - self.MAX_LOGS * 9 // 10
+        kept = []
+        for log in logs:
+            if excess and log["type"] == "sensor" and log.get("event") != "sensor_summary":
+                excess -= 1
+            else:
+                kept.append(log)
+        self._data["logs"] = kept[excess:]
+    
+    def _apply_clear_logs(self, _):
         self._data["logs"] = []
-        self._save()
     
     # Settings
     def get_settings(self) -> dict:
@@ -290,10 +569,24 @@ class Storage:
     
     def update_settings(self, settings: dict):
         """Обновить настройки"""
+        self._commit("update_settings", settings)
+    
+    def _apply_update_settings(self, settings: dict):
         self._data["settings"].update(settings)
-        self._save()
     
     def reset_demo_data(self):
         """Сбросить данные к демо"""
-        self._data = self._get_default_data()
-        self._save()
+        with self._lock:
+            self._data = self._get_default_data()
+            self._seq = 0
+            self._logs_total = 0
+            # Снимок без старых записей, журнал обнуляется
+            self._checkpoint()
+    
+    def _replace_item(self, collection: str, data: dict):
+        """Заменить элемент коллекции с тем же ID"""
+        items = self._data[collection]
+        for i, item in enumerate(items):
+            if item["id"] == data["id"]:
+                items[i] = data
+                return
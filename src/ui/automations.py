@@ -2,16 +2,25 @@
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
     QTableWidget, QTableWidgetItem, QDialog, QFormLayout,
-    QComboBox, QLineEdit, QDoubleSpinBox, QTimeEdit, QCheckBox,
+    QComboBox, QLineEdit, QSpinBox, QDoubleSpinBox, QTimeEdit, QCheckBox,
     QDialogButtonBox, QMessageBox, QGroupBox
 )
-from PySide6.QtCore import Qt, QTime
+from PySide6.QtCore import Qt, QTime, Signal
 from PySide6.QtGui import QFont
+from typing import Any, Dict, List, Optional
+import dataclasses
 import uuid
+from ..core.automation import find_rule_cycle
 from ..core.models import AutomationRule
+from ..core.triggers import parse_cron
+from .base import ScreenWidget
 
 
-class AutomationsWidget(QWidget):
+# Подписи агрегатов по скользящему окну
+AGGREGATE_NAMES = {"avg": "среднее", "count": "кол-во", "min": "мин", "max": "макс"}
+
+
+class AutomationsWidget(ScreenWidget):
     """Виджет автоматизации"""
     
     def __init__(self, storage, event_bus, automation_engine):
@@ -89,9 +98,10 @@ class AutomationsWidget(QWidget):
     
     def _on_event(self, event: dict):
         """Обработка события"""
-        event_type = event.get("type")
-        if event_type == "rule_triggered":
-            self.refresh()
+        # Срабатывание правила не меняет таблицу, перерисовка нужна только
+        # при смене набора данных и устройств (названия в условиях и действиях)
+        if event.get("type") in ["devices_changed", "data_reset"]:
+            self.mark_dirty()
     
     def refresh(self):
         """Обновить таблицу"""
@@ -105,19 +115,13 @@ class AutomationsWidget(QWidget):
             self.table.setItem(row, 0, QTableWidgetItem(name))
             
             # Условие
-            sensor = devices.get(rule.if_sensor_id)
-            sensor_name = sensor.name if sensor else "N/A"
-            condition_text = f"IF {sensor_name} {rule.condition}"
-            if rule.value is not None:
-                condition_text += f" {rule.value}"
+            condition_text = f"IF {self._condition_text(rule.condition_tree(), devices)}"
+            if rule.trigger:
+                condition_text = f"WHEN {self._trigger_text(rule.trigger)} {condition_text}"
             self.table.setItem(row, 1, QTableWidgetItem(condition_text))
             
             # Действие
-            device = devices.get(rule.then_device_id)
-            device_name = device.name if device else "N/A"
-            action_text = f"THEN {device_name} {rule.action}"
-            if rule.action_value is not None:
-                action_text += f" ({rule.action_value})"
+            action_text = "THEN " + ", ".join(self._action_text(a, devices) for a in rule.action_list())
             self.table.setItem(row, 2, QTableWidgetItem(action_text))
             
             # Временное окно
@@ -179,6 +183,46 @@ class AutomationsWidget(QWidget):
             
             self.table.setCellWidget(row, 5, actions_widget)
     
+    def _condition_text(self, tree: Dict[str, Any], devices: dict) -> str:
+        """Текст дерева условий"""
+        op = tree.get("op")
+        if op in ("and", "or"):
+            joiner = " И " if op == "and" else " ИЛИ "
+            return "(" + joiner.join(self._condition_text(item, devices) for item in tree["items"]) + ")"
+        if op == "not":
+            return f"НЕ {self._condition_text(tree['item'], devices)}"
+        if "time_window" in tree:
+            tw = tree["time_window"]
+            return f"время {tw.get('start', '')}-{tw.get('end', '')}"
+        sensor = devices.get(tree.get("sensor_id"))
+        text = sensor.name if sensor else 'N/A'
+        if tree.get("aggregate"):
+            text = f"{AGGREGATE_NAMES.get(tree['aggregate'], tree['aggregate'])}({text}, {tree.get('window', 60):g} с)"
+        text += f" {tree.get('condition')}"
+        if tree.get("value") is not None:
+            text += f" {tree['value']}"
+        return text
+    
+    def _trigger_text(self, trigger: Dict[str, Any]) -> str:
+        """Текст триггера по времени"""
+        if trigger.get("type") == "cron":
+            return f"cron «{trigger.get('expr', '')}»"
+        text = "восход" if trigger.get("event") == "sunrise" else "закат"
+        offset = trigger.get("offset", 0)
+        if offset:
+            text += f" {offset:+d} мин"
+        return text
+    
+    def _action_text(self, action: Dict[str, Any], devices: dict) -> str:
+        """Текст одного действия"""
+        device = devices.get(action.get("device_id"))
+        text = f"{device.name if device else 'N/A'} {action.get('action')}"
+        if action.get("value") is not None:
+            text += f" ({action['value']})"
+        if action.get("delay"):
+            text += f" через {action['delay']:g} с"
+        return text
+    
     def _add_rule(self):
         """Добавить правило"""
         dialog = RuleDialog(self.storage, self)
@@ -192,10 +236,15 @@ class AutomationsWidget(QWidget):
                 condition=rule_data["condition"],
                 value=rule_data.get("value"),
                 time_window=rule_data.get("time_window"),
+                trigger=rule_data.get("trigger"),
                 then_device_id=rule_data["then_device_id"],
                 action=rule_data["action"],
-                action_value=rule_data.get("action_value")
+                action_value=rule_data.get("action_value"),
+                conditions=rule_data.get("conditions"),
+                actions=rule_data.get("actions", [])
             )
+            if self._creates_cycle(rule):
+                return
             
             self.storage.add_rule(rule)
             self._update_automation_engine()
@@ -206,15 +255,23 @@ class AutomationsWidget(QWidget):
         dialog = RuleDialog(self.storage, self, rule)
         if dialog.exec():
             rule_data = dialog.get_rule_data()
-            rule.name = rule_data["name"]
-            rule.enabled = rule_data.get("enabled", rule.enabled)
-            rule.if_sensor_id = rule_data["if_sensor_id"]
-            rule.condition = rule_data["condition"]
-            rule.value = rule_data.get("value")
-            rule.time_window = rule_data.get("time_window")
-            rule.then_device_id = rule_data["then_device_id"]
-            rule.action = rule_data["action"]
-            rule.action_value = rule_data.get("action_value")
+            rule = dataclasses.replace(
+                rule,
+                name=rule_data["name"],
+                enabled=rule_data.get("enabled", rule.enabled),
+                if_sensor_id=rule_data["if_sensor_id"],
+                condition=rule_data["condition"],
+                value=rule_data.get("value"),
+                time_window=rule_data.get("time_window"),
+                trigger=rule_data.get("trigger"),
+                then_device_id=rule_data["then_device_id"],
+                action=rule_data["action"],
+                action_value=rule_data.get("action_value"),
+                conditions=rule_data.get("conditions"),
+                actions=rule_data.get("actions", [])
+            )
+            if self._creates_cycle(rule):
+                return
             
             self.storage.update_rule(rule)
             self._update_automation_engine()
@@ -222,7 +279,9 @@ class AutomationsWidget(QWidget):
     
     def _toggle_rule(self, rule: AutomationRule):
         """Переключить правило"""
-        rule.enabled = not rule.enabled
+        rule = dataclasses.replace(rule, enabled=not rule.enabled)
+        if self._creates_cycle(rule):
+            return
         self.storage.update_rule(rule)
         self._update_automation_engine()
         self.refresh()
@@ -239,6 +298,20 @@ class AutomationsWidget(QWidget):
             self._update_automation_engine()
             self.refresh()
     
+    def _creates_cycle(self, rule: AutomationRule) -> bool:
+        """Проверить, что правило не замыкает цикл; предупредить и отказать"""
+        rules = {r.id: r for r in self.storage.get_rules()}
+        rules[rule.id] = rule
+        cycle = find_rule_cycle(rules.values())
+        if not cycle:
+            return False
+        names = " → ".join(rules[rule_id].name or rule_id for rule_id in cycle)
+        QMessageBox.warning(
+            self, "Цикл правил",
+            f"Правило не сохранено: действия правил запускают друг друга по кругу:\n{names}"
+        )
+        return True
+    
     def _update_automation_engine(self):
         """Обновить движок автоматизации"""
         rules = {r.id: r for r in self.storage.get_rules()}
@@ -274,6 +347,8 @@ class RuleDialog(QDialog):
         if_layout = QFormLayout(if_group)
         
         self.sensor_combo = QComboBox()
+        # Без датчика правило срабатывает только по триггеру времени
+        self.sensor_combo.addItem("— Без датчика —", "")
         sensors = [d for d in self.storage.get_devices() if d.category == "sensor"]
         for sensor in sensors:
             self.sensor_combo.addItem(sensor.name, sensor.id)
@@ -281,6 +356,8 @@ class RuleDialog(QDialog):
             index = self.sensor_combo.findData(self.rule.if_sensor_id)
             if index >= 0:
                 self.sensor_combo.setCurrentIndex(index)
+        elif sensors:
+            self.sensor_combo.setCurrentIndex(1)
         self.sensor_combo.currentIndexChanged.connect(self._on_sensor_changed)
         if_layout.addRow("Датчик:", self.sensor_combo)
         
@@ -303,6 +380,34 @@ class RuleDialog(QDialog):
         layout.addLayout(form)
         layout.addWidget(if_group)
         
+        # Дополнительные условия
+        extra_group = QGroupBox("Дополнительные условия (опционально)")
+        extra_layout = QVBoxLayout(extra_group)
+        
+        combine_layout = QHBoxLayout()
+        combine_layout.addWidget(QLabel("Объединить с основным условием через:"))
+        self.combine_combo = QComboBox()
+        self.combine_combo.addItem("И", "and")
+        self.combine_combo.addItem("ИЛИ", "or")
+        combine_layout.addWidget(self.combine_combo)
+        combine_layout.addStretch()
+        extra_layout.addLayout(combine_layout)
+        
+        self.condition_rows_layout = QVBoxLayout()
+        extra_layout.addLayout(self.condition_rows_layout)
+        self.condition_rows: List[ConditionRow] = []
+        
+        btn_add_condition = QPushButton("➕ Условие")
+        btn_add_condition.clicked.connect(lambda: self._add_condition_row())
+        extra_layout.addWidget(btn_add_condition)
+        
+        # Вложенные условия, которые нельзя показать строками, сохраняются как есть
+        self._preserved_conditions: List[Dict[str, Any]] = []
+        if self.rule and self.rule.conditions:
+            self._load_conditions(self.rule.conditions)
+        
+        layout.addWidget(extra_group)
+        
         # Временное окно
         time_group = QGroupBox("Временное окно (опционально)")
         time_layout = QFormLayout(time_group)
@@ -340,6 +445,35 @@ class RuleDialog(QDialog):
         
         layout.addWidget(time_group)
         
+        # Триггер по времени
+        trigger_group = QGroupBox("Триггер по времени (опционально)")
+        trigger_layout = QFormLayout(trigger_group)
+        trigger = self.rule.trigger if self.rule and self.rule.trigger else {}
+        
+        self.trigger_combo = QComboBox()
+        self.trigger_combo.addItem("Нет (по датчикам)", None)
+        self.trigger_combo.addItem("Расписание (cron)", "cron")
+        self.trigger_combo.addItem("Восход", "sunrise")
+        self.trigger_combo.addItem("Закат", "sunset")
+        kind = trigger.get("event") if trigger.get("type") == "sun" else trigger.get("type")
+        index = self.trigger_combo.findData(kind)
+        if index >= 0:
+            self.trigger_combo.setCurrentIndex(index)
+        self.trigger_combo.currentIndexChanged.connect(self._on_trigger_changed)
+        trigger_layout.addRow("Триггер:", self.trigger_combo)
+        
+        self.cron_edit = QLineEdit(trigger.get("expr", "0 7 * * 1-5"))
+        self.cron_edit.setPlaceholderText("мин час день месяц день_недели")
+        trigger_layout.addRow("Cron:", self.cron_edit)
+        
+        self.offset_spin = QSpinBox()
+        self.offset_spin.setRange(-720, 720)
+        self.offset_spin.setSuffix(" мин")
+        self.offset_spin.setValue(trigger.get("offset", 0))
+        trigger_layout.addRow("Смещение:", self.offset_spin)
+        
+        layout.addWidget(trigger_group)
+        
         # Действие THEN
         then_group = QGroupBox("Действие (THEN)")
         then_layout = QFormLayout(then_group)
@@ -372,25 +506,141 @@ class RuleDialog(QDialog):
         
         layout.addWidget(then_group)
         
+        # Дополнительные действия
+        more_group = QGroupBox("Дополнительные действия (опционально)")
+        more_layout = QVBoxLayout(more_group)
+        self.action_rows_layout = QVBoxLayout()
+        more_layout.addLayout(self.action_rows_layout)
+        self.action_rows: List[ActionRow] = []
+        
+        btn_add_action = QPushButton("➕ Действие")
+        btn_add_action.clicked.connect(lambda: self._add_action_row())
+        more_layout.addWidget(btn_add_action)
+        
+        # Первое действие - основное из полей выше
+        if self.rule and self.rule.actions:
+            for action in self.rule.actions[1:]:
+                self._add_action_row(action)
+        
+        layout.addWidget(more_group)
+        
         # Кнопки
         buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
-        buttons.accepted.connect(self.accept)
+        buttons.accepted.connect(self._validate_and_accept)
         buttons.rejected.connect(self.reject)
         layout.addWidget(buttons)
         
         self._on_sensor_changed()
         self._on_condition_changed()
         self._on_action_changed()
+        self._on_trigger_changed()
+    
+    def _validate_and_accept(self):
+        """Проверить триггер перед сохранением"""
+        kind = self.trigger_combo.currentData()
+        if kind is None and not self.sensor_combo.currentData() and not self.condition_rows:
+            QMessageBox.warning(self, "Ошибка", "Выберите датчик, дополнительное условие или триггер по времени")
+            return
+        if kind == "cron":
+            try:
+                parse_cron(self.cron_edit.text().strip())
+            except ValueError as e:
+                QMessageBox.warning(self, "Ошибка", f"Неверное cron-выражение: {e}")
+                return
+        self.accept()
+    
+    def _load_conditions(self, tree: Dict[str, Any]):
+        """Разобрать составное условие правила на строки"""
+        if tree.get("op") not in ("and", "or"):
+            self._preserved_conditions = [tree]
+            return
+        index = self.combine_combo.findData(tree["op"])
+        self.combine_combo.setCurrentIndex(index)
+        # Первый элемент - основное условие из полей выше (если выбран датчик)
+        items = tree["items"][1:] if self.rule.if_sensor_id else tree["items"]
+        for item in items:
+            negate = item.get("op") == "not"
+            leaf = item["item"] if negate else item
+            if "op" in leaf:
+                self._preserved_conditions.append(item)
+            else:
+                self._add_condition_row(leaf, negate)
+    
+    def _add_condition_row(self, leaf: Optional[Dict[str, Any]] = None, negate: bool = False):
+        """Добавить строку условия"""
+        row = ConditionRow(self.storage, leaf, negate)
+        row.remove_requested.connect(self._remove_condition_row)
+        self.condition_rows.append(row)
+        self.condition_rows_layout.addWidget(row)
+    
+    def _remove_condition_row(self, row: "ConditionRow"):
+        """Удалить строку условия"""
+        self.condition_rows.remove(row)
+        row.deleteLater()
+    
+    def _add_action_row(self, action: Optional[Dict[str, Any]] = None):
+        """Добавить строку действия"""
+        row = ActionRow(self.storage, action)
+        row.remove_requested.connect(self._remove_action_row)
+        self.action_rows.append(row)
+        self.action_rows_layout.addWidget(row)
+    
+    def _remove_action_row(self, row: "ActionRow"):
+        """Удалить строку действия"""
+        self.action_rows.remove(row)
+        row.deleteLater()
+    
+    def _get_actions(self) -> List[Dict[str, Any]]:
+        """Список действий или пустой список, если действие одно"""
+        if not self.action_rows:
+            return []
+        primary = {
+            "device_id": self.device_combo.currentData(),
+            "action": self.action_combo.currentText(),
+            "value": self.action_value_spin.value() if self.action_value_spin.isEnabled() else None,
+            "delay": 0
+        }
+        return [primary] + [row.get_action() for row in self.action_rows]
+    
+    def _get_conditions(self) -> Optional[Dict[str, Any]]:
+        """Составное условие или None, если дополнительных условий нет"""
+        extra = [row.get_condition() for row in self.condition_rows] + self._preserved_conditions
+        if not extra:
+            return None
+        if not self.sensor_combo.currentData():
+            return {"op": self.combine_combo.currentData(), "items": extra}
+        primary = {
+            "sensor_id": self.sensor_combo.currentData(),
+            "condition": self.condition_combo.currentText(),
+            "value": self.value_spin.value() if self.value_spin.isEnabled() else None
+        }
+        return {"op": self.combine_combo.currentData(), "items": [primary] + extra}
+    
+    def _get_trigger(self) -> Optional[Dict[str, Any]]:
+        """Триггер по времени или None"""
+        kind = self.trigger_combo.currentData()
+        if kind == "cron":
+            return {"type": "cron", "expr": self.cron_edit.text().strip()}
+        if kind in ("sunrise", "sunset"):
+            return {"type": "sun", "event": kind, "offset": self.offset_spin.value()}
+        return None
     
     def _on_sensor_changed(self):
         """Обработка изменения датчика"""
-        # Можно добавить логику для определения типа датчика
-        pass
+        has_sensor = bool(self.sensor_combo.currentData())
+        self.condition_combo.setEnabled(has_sensor)
+        self._on_condition_changed()
     
     def _on_condition_changed(self):
         """Обработка изменения условия"""
         condition = self.condition_combo.currentText()
-        self.value_spin.setEnabled(condition in [">", "<", "=="])
+        self.value_spin.setEnabled(bool(self.sensor_combo.currentData()) and condition in [">", "<", "=="])
+    
+    def _on_trigger_changed(self):
+        """Обработка изменения триггера"""
+        kind = self.trigger_combo.currentData()
+        self.cron_edit.setEnabled(kind == "cron")
+        self.offset_spin.setEnabled(kind in ("sunrise", "sunset"))
     
     def _on_action_changed(self):
         """Обработка изменения действия"""
@@ -412,7 +662,189 @@ class RuleDialog(QDialog):
             "condition": self.condition_combo.currentText(),
             "value": self.value_spin.value() if self.value_spin.isEnabled() else None,
             "time_window": time_window,
+            "trigger": self._get_trigger(),
             "then_device_id": self.device_combo.currentData(),
             "action": self.action_combo.currentText(),
-            "action_value": self.action_value_spin.value() if self.action_value_spin.isEnabled() else None
+            "action_value": self.action_value_spin.value() if self.action_value_spin.isEnabled() else None,
+            "conditions": self._get_conditions(),
+            "actions": self._get_actions()
+        }
+
+
+class ConditionRow(QWidget):
+    """Строка дополнительного условия: датчик или временное окно"""
+    
+    remove_requested = Signal(object)  # ConditionRow
+    
+    def __init__(self, storage, leaf: Optional[Dict[str, Any]] = None, negate: bool = False):
+        super().__init__()
+        leaf = leaf or {}
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        
+        self.not_check = QCheckBox("НЕ")
+        self.not_check.setChecked(negate)
+        layout.addWidget(self.not_check)
+        
+        self.kind_combo = QComboBox()
+        self.kind_combo.addItem("Датчик", "sensor")
+        self.kind_combo.addItem("Время", "time")
+        self.kind_combo.setCurrentIndex(1 if "time_window" in leaf else 0)
+        self.kind_combo.currentIndexChanged.connect(self._on_kind_changed)
+        layout.addWidget(self.kind_combo)
+        
+        # Датчик или актуатор (условие проверяет, включён ли он)
+        self.sensor_combo = QComboBox()
+        for device in storage.get_devices():
+            if device.category == "sensor":
+                self.sensor_combo.addItem(device.name, device.id)
+        for device in storage.get_devices():
+            if device.category == "actuator":
+                self.sensor_combo.addItem(f"{device.name} (актуатор)", device.id)
+        index = self.sensor_combo.findData(leaf.get("sensor_id"))
+        if index >= 0:
+            self.sensor_combo.setCurrentIndex(index)
+        layout.addWidget(self.sensor_combo)
+        
+        self.condition_combo = QComboBox()
+        self.condition_combo.addItems([">", "<", "==", "triggered", "opened"])
+        index = self.condition_combo.findText(leaf.get("condition", ">"))
+        if index >= 0:
+            self.condition_combo.setCurrentIndex(index)
+        self.condition_combo.currentTextChanged.connect(self._on_condition_changed)
+        layout.addWidget(self.condition_combo)
+        
+        self.value_spin = QDoubleSpinBox()
+        self.value_spin.setRange(-100, 100)
+        self.value_spin.setDecimals(1)
+        if leaf.get("value") is not None:
+            self.value_spin.setValue(leaf["value"])
+        layout.addWidget(self.value_spin)
+        
+        # Агрегат по скользящему окну
+        self.aggregate_combo = QComboBox()
+        self.aggregate_combo.addItem("значение", None)
+        for kind, name in AGGREGATE_NAMES.items():
+            self.aggregate_combo.addItem(f"{name} за окно", kind)
+        index = self.aggregate_combo.findData(leaf.get("aggregate"))
+        if index >= 0:
+            self.aggregate_combo.setCurrentIndex(index)
+        self.aggregate_combo.currentIndexChanged.connect(self._on_condition_changed)
+        layout.addWidget(self.aggregate_combo)
+        
+        self.window_spin = QSpinBox()
+        self.window_spin.setRange(1, 24 * 3600)
+        self.window_spin.setSuffix(" с")
+        self.window_spin.setValue(int(leaf.get("window", 60)))
+        layout.addWidget(self.window_spin)
+        
+        # Временное окно
+        time_window = leaf.get("time_window") or {"start": "22:00", "end": "06:00"}
+        self.time_start = QTimeEdit(QTime.fromString(time_window["start"], "HH:mm"))
+        self.time_start.setDisplayFormat("HH:mm")
+        layout.addWidget(self.time_start)
+        self.time_end = QTimeEdit(QTime.fromString(time_window["end"], "HH:mm"))
+        self.time_end.setDisplayFormat("HH:mm")
+        layout.addWidget(self.time_end)
+        
+        btn_remove = QPushButton("🗑️")
+        btn_remove.clicked.connect(lambda: self.remove_requested.emit(self))
+        layout.addWidget(btn_remove)
+        
+        self._on_kind_changed()
+    
+    def _on_kind_changed(self):
+        """Показать поля выбранного вида условия"""
+        is_sensor = self.kind_combo.currentData() == "sensor"
+        for widget in (self.sensor_combo, self.condition_combo, self.value_spin,
+                       self.aggregate_combo, self.window_spin):
+            widget.setVisible(is_sensor)
+        for widget in (self.time_start, self.time_end):
+            widget.setVisible(not is_sensor)
+        self._on_condition_changed()
+    
+    def _on_condition_changed(self):
+        """Обработка изменения условия"""
+        self.value_spin.setEnabled(self.condition_combo.currentText() in [">", "<", "=="])
+        self.window_spin.setEnabled(self.aggregate_combo.currentData() is not None)
+    
+    def get_condition(self) -> Dict[str, Any]:
+        """Получить условие строки"""
+        if self.kind_combo.currentData() == "time":
+            leaf = {"time_window": {
+                "start": self.time_start.time().toString("HH:mm"),
+                "end": self.time_end.time().toString("HH:mm")
+            }}
+        else:
+            leaf = {
+                "sensor_id": self.sensor_combo.currentData(),
+                "condition": self.condition_combo.currentText(),
+                "value": self.value_spin.value() if self.value_spin.isEnabled() else None
+            }
+            if self.aggregate_combo.currentData():
+                leaf["aggregate"] = self.aggregate_combo.currentData()
+                leaf["window"] = self.window_spin.value()
+        return {"op": "not", "item": leaf} if self.not_check.isChecked() else leaf
+
+
+class ActionRow(QWidget):
+    """Строка дополнительного действия с задержкой"""
+    
+    remove_requested = Signal(object)  # ActionRow
+    
+    def __init__(self, storage, action: Optional[Dict[str, Any]] = None):
+        super().__init__()
+        action = action or {}
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        
+        self.device_combo = QComboBox()
+        for device in storage.get_devices():
+            if device.category == "actuator":
+                self.device_combo.addItem(device.name, device.id)
+        index = self.device_combo.findData(action.get("device_id"))
+        if index >= 0:
+            self.device_combo.setCurrentIndex(index)
+        layout.addWidget(self.device_combo)
+        
+        self.action_combo = QComboBox()
+        self.action_combo.addItems(["on", "off", "set_level"])
+        index = self.action_combo.findText(action.get("action", "on"))
+        if index >= 0:
+            self.action_combo.setCurrentIndex(index)
+        self.action_combo.currentTextChanged.connect(self._on_action_changed)
+        layout.addWidget(self.action_combo)
+        
+        self.value_spin = QDoubleSpinBox()
+        self.value_spin.setRange(0, 100)
+        self.value_spin.setDecimals(1)
+        if action.get("value") is not None:
+            self.value_spin.setValue(action["value"])
+        layout.addWidget(self.value_spin)
+        
+        layout.addWidget(QLabel("через"))
+        self.delay_spin = QDoubleSpinBox()
+        self.delay_spin.setRange(0, 86400)
+        self.delay_spin.setDecimals(0)
+        self.delay_spin.setSuffix(" с")
+        self.delay_spin.setValue(action.get("delay") or 0)
+        layout.addWidget(self.delay_spin)
+        
+        btn_remove = QPushButton("🗑️")
+        btn_remove.clicked.connect(lambda: self.remove_requested.emit(self))
+        layout.addWidget(btn_remove)
+        
+        self._on_action_changed()
+    
+    def _on_action_changed(self):
+        """Обработка изменения действия"""
+        self.value_spin.setEnabled(self.action_combo.currentText() == "set_level")
+    
+    def get_action(self) -> Dict[str, Any]:
+        """Получить действие строки"""
+        return {
+            "device_id": self.device_combo.currentData(),
+            "action": self.action_combo.currentText(),
+            "value": self.value_spin.value() if self.value_spin.isEnabled() else None,
+            "delay": self.delay_spin.value()
         }
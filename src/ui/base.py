@@ -0,0 +1,75 @@
+"""Базовый класс экранов"""
+from typing import Dict, Set
+from PySide6.QtWidgets import QWidget
+from PySide6.QtCore import QTimer
+
+
+class ScreenWidget(QWidget):
+    """Экран с отложенным обновлением
+    
+    Пока экран скрыт, события только помечают, что изменилось. Изменения
+    применяются одним вызовом apply_changes() при показе экрана, а для
+    видимого экрана - один раз за итерацию цикла событий.
+    """
+    
+    # Ключ изменения, требующего полного обновления
+    FULL_REFRESH = "*"
+    
+    def __init__(self):
+        super().__init__()
+        self._pending: Set[str] = set()
+        self._flush_scheduled = False
+        # Последние данные событий по устройствам, ещё не применённые
+        self._device_updates: Dict[str, dict] = {}
+    
+    def mark_dirty(self, key: str = FULL_REFRESH):
+        """Отметить изменение"""
+        self._pending.add(key)
+        if self.isVisible() and not self._flush_scheduled:
+            self._flush_scheduled = True
+            QTimer.singleShot(0, self._flush)
+    
+    def mark_device_dirty(self, data: dict):
+        """Отметить изменение устройства по данным события"""
+        device_id = data.get("device_id")
+        self._device_updates[device_id] = data
+        self.mark_dirty(f"device:{device_id}")
+    
+    def take_device_updates(self, changes: Set[str]) -> Dict[str, dict]:
+        """Забрать данные изменившихся устройств"""
+        updates = {}
+        for key in changes:
+            if key.startswith("device:"):
+                device_id = key[len("device:"):]
+                if device_id in self._device_updates:
+                    updates[device_id] = self._device_updates.pop(device_id)
+        return updates
+    
+    def showEvent(self, event):
+        """Применить накопленные изменения при показе"""
+        super().showEvent(event)
+        self._flush()
+    
+    def _flush(self):
+        """Применить накопленные изменения"""
+        self._flush_scheduled = False
+        if not self._pending or not self.isVisible():
+            return
+        changes = self._pending
+        self._pending = set()
+        if self.FULL_REFRESH in changes:
+            self._device_updates.clear()
+            self.refresh()
+        else:
+            self.apply_changes(changes)
+    
+    def apply_changes(self, changes: Set[str]):
+        """Применить изменения (по умолчанию - полное обновление)"""
+        self.refresh()
+    
+    def refresh(self):
+        """Полностью обновить экран (по умолчанию - перерисовать виджет)
+        
+        Экраны, строящие содержимое из хранилища, переопределяют этот метод.
+        """
+        self.update()
@@ -1,24 +1,55 @@
 """Dashboard экран"""
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
-    QScrollArea, QFrame, QGridLayout
+    QScrollArea, QFrame, QGridLayout, QDialog, QFormLayout,
+    QLineEdit, QComboBox, QDialogButtonBox, QMenu, QMessageBox, QCheckBox
 )
 from PySide6.QtCore import Qt, Signal
 from PySide6.QtGui import QFont
-from typing import Dict, List
-from ..core.models import Room, Device, LogEntry
+from datetime import datetime
+from typing import Any, Dict, List
+import uuid
+from ..core.event_bus import batch_items
+from ..core.models import Room, Device, Scene, LOG_MESSAGES
+from .base import ScreenWidget
 
 
-class DashboardWidget(QWidget):
+# Число строк ленты последних событий
+FEED_SIZE = 10
+# События, которые показываются в ленте
+FEED_EVENTS = ("sensor_update", "actuator_update", "rule_triggered", "rule_blocked",
+               "device_offline", "device_online")
+
+
+def _event_text(event: Dict[str, Any]) -> str:
+    """Строка ленты для события шины"""
+    event_type = event["type"]
+    data = event["data"]
+    if event_type in ("sensor_update", "actuator_update") and "devices" in data:
+        items = batch_items(data)
+        if event_type == "sensor_update":
+            return f"{data.get('source') or 'Пакет датчиков'}: " + LOG_MESSAGES["sensor_batch"]({"count": len(items)})
+        devices = [[item.get("device_name", "Unknown"), item.get("action", "unknown")] for item in items]
+        return f"{data.get('source') or 'Пакетное управление'}: " + LOG_MESSAGES["actuator_batch"]({"devices": devices})
+    if event_type == "sensor_update":
+        return f"{data.get('device_name', 'Unknown')}: " + LOG_MESSAGES["sensor"](data)
+    if event_type in ("actuator_update", "device_offline", "device_online"):
+        return f"{data.get('device_name', 'Unknown')}: " + LOG_MESSAGES[event_type.replace("_update", "")](data)
+    fields = data if event_type == "rule_blocked" else {"actions": data.get("actions", [data])}
+    return f"{data.get('rule_name', 'Unknown Rule')}: " + LOG_MESSAGES[event_type.replace("_triggered", "")](fields)
+
+
+class DashboardWidget(ScreenWidget):
     """Виджет дашборда"""
     
-    refresh_needed = Signal()
-    
-    def __init__(self, storage, event_bus, simulator_manager):
+    def __init__(self, storage, event_bus, simulator_manager, scene_manager):
         super().__init__()
         self.storage = storage
         self.event_bus = event_bus
         self.simulator_manager = simulator_manager
+        self.scene_manager = scene_manager
+        # Строки показаний датчиков в карточках комнат по ID устройства
+        self._sensor_labels: Dict[str, QLabel] = {}
         self._init_ui()
         self._connect_events()
     
@@ -34,39 +65,11 @@ class DashboardWidget(QWidget):
         title.setStyleSheet("color: white;")
         layout.addWidget(title)
         
-        # Быстрые кнопки
-        quick_actions = QHBoxLayout()
-        quick_actions.setSpacing(10)
-        
-        btn_all_off = QPushButton("🔌 Выключить весь свет")
-        btn_night = QPushButton("🌙 Режим Ночь")
-        btn_away = QPushButton("🚪 Я ушёл")
-        
-        for btn in [btn_all_off, btn_night, btn_away]:
-            btn.setStyleSheet("""
-                QPushButton {
-                    background-color: #0078d4;
-                    color: white;
-                    border: none;
-                    padding: 12px 20px;
-                    border-radius: 6px;
-                    font-size: 14px;
-                }
-                QPushButton:hover {
-                    background-color: #106ebe;
-                }
-            """)
-        
-        btn_all_off.clicked.connect(self._all_lights_off)
-        btn_night.clicked.connect(self._night_mode)
-        btn_away.clicked.connect(self._away_mode)
-        
-        quick_actions.addWidget(btn_all_off)
-        quick_actions.addWidget(btn_night)
-        quick_actions.addWidget(btn_away)
-        quick_actions.addStretch()
-        
-        layout.addLayout(quick_actions)
+        # Быстрые кнопки (сцены)
+        self.quick_actions = QHBoxLayout()
+        self.quick_actions.setSpacing(10)
+        layout.addLayout(self.quick_actions)
+        self._update_scene_buttons()
         
         # Карточки комнат
         self.rooms_scroll = QScrollArea()
@@ -101,6 +104,16 @@ class DashboardWidget(QWidget):
         """)
         self.logs_layout = QVBoxLayout(self.logs_area)
         self.logs_layout.setSpacing(5)
+        # Строки ленты создаются один раз, новые события сдвигают текст
+        self.feed_labels = []
+        for _ in range(FEED_SIZE):
+            label = QLabel()
+            label.setStyleSheet("color: #aaaaaa; font-size: 11px;")
+            self.logs_layout.addWidget(label)
+            self.feed_labels.append(label)
+        self.logs_layout.addStretch()
+        self._feed_texts: List[str] = []
+        self._feed_last = 0  # номер последнего показанного события
         
         layout.addWidget(self.logs_area)
         
@@ -113,48 +126,99 @@ class DashboardWidget(QWidget):
     def _on_event(self, event: dict):
         """Обработка события"""
         event_type = event.get("type")
-        if event_type in ["sensor_update", "actuator_update", "rule_triggered"]:
-            self.refresh()
+        if event_type == "sensor_update":
+            for data in batch_items(event["data"]):
+                self.mark_device_dirty(data)
+        if event_type in FEED_EVENTS:
+            self.mark_dirty(event_type)
+        elif event_type in ["devices_changed", "rooms_changed", "data_reset"]:
+            self.mark_dirty()
     
-    def _all_lights_off(self):
-        """Выключить весь свет"""
-        devices = self.storage.get_devices()
-        for device in devices:
-            if device.category == "actuator" and device.type == "light":
-                self.simulator_manager.control_device(device.id, "off")
-        self.refresh_needed.emit()
+    def _update_scene_buttons(self):
+        """Пересоздать кнопки сцен (только при изменении списка сцен)"""
+        while self.quick_actions.count():
+            item = self.quick_actions.takeAt(0)
+            if item.widget():
+                item.widget().deleteLater()
+        
+        for scene in self.scene_manager.scenes.values():
+            btn = QPushButton(scene.name)
+            btn.setObjectName("sceneButton")
+            btn.clicked.connect(lambda checked, s=scene.id: self.scene_manager.activate(s))
+            btn.setContextMenuPolicy(Qt.CustomContextMenu)
+            btn.customContextMenuRequested.connect(
+                lambda pos, b=btn, s=scene.id: self._show_scene_menu(b, s)
+            )
+            self.quick_actions.addWidget(btn)
+        
+        btn_add = QPushButton("➕ Сцена")
+        btn_add.setObjectName("sceneButton")
+        btn_add.clicked.connect(self._add_scene)
+        self.quick_actions.addWidget(btn_add)
+        self.quick_actions.addStretch()
     
-    def _night_mode(self):
-        """Режим ночь"""
-        devices = self.storage.get_devices()
-        for device in devices:
-            if device.category == "actuator":
-                if device.type == "light":
-                    self.simulator_manager.control_device(device.id, "off")
-                elif device.type in ["fan", "heater"]:
-                    self.simulator_manager.control_device(device.id, "off")
-        self.refresh_needed.emit()
-    
-    def _away_mode(self):
-        """Режим 'Я ушёл'"""
-        devices = self.storage.get_devices()
-        for device in devices:
-            if device.category == "actuator":
-                self.simulator_manager.control_device(device.id, "off")
-        self.refresh_needed.emit()
+    def _show_scene_menu(self, button: QPushButton, scene_id: str):
+        """Контекстное меню кнопки сцены"""
+        menu = QMenu(self)
+        menu.addAction("✏️ Редактировать", lambda: self._edit_scene(scene_id))
+        menu.addAction("🗑️ Удалить", lambda: self._delete_scene(scene_id))
+        menu.exec(button.mapToGlobal(button.rect().bottomLeft()))
+    
+    def _add_scene(self):
+        """Добавить сцену"""
+        dialog = SceneDialog(self.storage, self)
+        if dialog.exec():
+            scene = Scene(
+                id=f"scene_{uuid.uuid4().hex[:8]}",
+                name=dialog.get_name(),
+                actions=dialog.get_actions()
+            )
+            self.scene_manager.save_scene(scene)
+            self._update_scene_buttons()
+    
+    def _edit_scene(self, scene_id: str):
+        """Редактировать сцену"""
+        scene = self.scene_manager.scenes[scene_id]
+        dialog = SceneDialog(self.storage, self, scene)
+        if dialog.exec():
+            scene.name = dialog.get_name()
+            scene.actions = dialog.get_actions()
+            self.scene_manager.save_scene(scene)
+            self._update_scene_buttons()
+    
+    def _delete_scene(self, scene_id: str):
+        """Удалить сцену"""
+        scene = self.scene_manager.scenes[scene_id]
+        reply = QMessageBox.question(
+            self, "Подтверждение",
+            f"Удалить сцену '{scene.name}'?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply == QMessageBox.Yes:
+            self.scene_manager.delete_scene(scene_id)
+            self._update_scene_buttons()
     
     def refresh(self):
         """Обновить данные"""
         self._update_rooms()
-        self._update_logs()
+        self._update_feed()
+    
+    def apply_changes(self, changes):
+        """Обновить на месте показания изменившихся датчиков и ленту"""
+        for device_id, data in self.take_device_updates(changes).items():
+            label = self._sensor_labels.get(device_id)
+            if label is not None:
+                label.setText(self._sensor_text(data.get("type"), data.get("value", "N/A")))
+        self._update_feed()
     
     def _update_rooms(self):
-        """Обновить карточки комнат"""
+        """Перестроить карточки комнат (при изменении состава комнат и устройств)"""
         # Очистить старые карточки
         while self.rooms_layout.count():
             item = self.rooms_layout.takeAt(0)
             if item.widget():
                 item.widget().deleteLater()
+        self._sensor_labels.clear()
         
         rooms = self.storage.get_rooms()
         devices = self.storage.get_devices()
@@ -201,16 +265,19 @@ class DashboardWidget(QWidget):
         # Показатели
         sensors = [d for d in devices if d.category == "sensor"]
         for sensor in sensors:
-            value = sensor.state.get("value", "N/A")
-            unit = self._get_unit(sensor.type)
-            label = QLabel(f"{self._get_sensor_name(sensor.type)}: {value} {unit}")
+            label = QLabel(self._sensor_text(sensor.type, sensor.state.get("value", "N/A")))
             label.setStyleSheet("color: #cccccc; font-size: 12px;")
             layout.addWidget(label)
+            self._sensor_labels[sensor.id] = label
         
         layout.addStretch()
         
         return card
     
+    def _sensor_text(self, sensor_type: str, value: Any) -> str:
+        """Строка показания датчика в карточке комнаты"""
+        return f"{self._get_sensor_name(sensor_type)}: {value} {self._get_unit(sensor_type)}"
+    
     def _get_sensor_name(self, sensor_type: str) -> str:
         """Получить название датчика"""
         names = {
@@ -233,18 +300,112 @@ class DashboardWidget(QWidget):
         }
         return units.get(sensor_type, "")
     
-    def _update_logs(self):
-        """Обновить логи"""
-        # Очистить старые логи
-        while self.logs_layout.count():
-            item = self.logs_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
+    def _update_feed(self):
+        """Дописать в ленту новые события из буфера шины (старые строки сдвигаются вниз)"""
+        events = self.event_bus.recent.latest(FEED_SIZE, FEED_EVENTS)
+        new = [item for item in events if item[0] > self._feed_last]
+        if not new:
+            return
+        self._feed_last = new[0][0]
+        texts = [
+            f"[{datetime.fromtimestamp(timestamp):%H:%M:%S}] {_event_text(event)}"
+            for _, timestamp, event in new
+        ]
+        self._feed_texts = (texts + self._feed_texts)[:FEED_SIZE]
+        for label, text in zip(self.feed_labels, self._feed_texts):
+            label.setText(text)
+            label.show()
+        for label in self.feed_labels[len(self._feed_texts):]:
+            label.hide()
+
+
+class SceneDialog(QDialog):
+    """Диалог добавления/редактирования сцены"""
+    
+    # Варианты действия для устройства в сцене
+    ACTIONS = [("—", None), ("Включить", "on"), ("Выключить", "off")]
+    
+    def __init__(self, storage, parent=None, scene=None):
+        super().__init__(parent)
+        self.storage = storage
+        self.scene = scene
+        actions = scene.actions if scene else []
+        # Действия-селекторы (по типам и комнате) не разворачиваются в список
+        # устройств: сцена должна подхватывать устройства, добавленные позже
+        self.selectors = [a for a in actions if not a.get("device_id")]
+        self.device_actions = {a["device_id"]: a for a in actions if a.get("device_id")}
+        self.setWindowTitle("Добавить сцену" if not scene else "Редактировать сцену")
+        self.setMinimumWidth(400)
+        self._init_ui()
+    
+    def _init_ui(self):
+        """Инициализация UI"""
+        layout = QFormLayout(self)
         
-        logs = self.storage.get_logs(limit=10)
-        for log in reversed(logs):  # Последние сверху
-            label = QLabel(f"[{log.timestamp}] {log.source}: {log.message}")
-            label.setStyleSheet("color: #aaaaaa; font-size: 11px;")
-            self.logs_layout.addWidget(label)
+        # Название
+        self.name_edit = QLineEdit()
+        if self.scene:
+            self.name_edit.setText(self.scene.name)
+        layout.addRow("Название:", self.name_edit)
         
-        self.logs_layout.addStretch()
+        # Селекторы сцены: снятая галочка удаляет селектор
+        rooms = {room.id: room.name for room in self.storage.get_rooms()}
+        self.selector_checks: List[QCheckBox] = []
+        for selector in self.selectors:
+            check = QCheckBox(self._selector_text(selector, rooms))
+            check.setChecked(True)
+            self.selector_checks.append(check)
+            layout.addRow("Группа:", check)
+        
+        # Отдельное действие для актуатора (перекрывает селекторы)
+        current = {device_id: action["action"] for device_id, action in self.device_actions.items()}
+        self.action_combos: Dict[str, QComboBox] = {}
+        for device in self.storage.get_devices():
+            if device.category != "actuator":
+                continue
+            combo = QComboBox()
+            for text, action in self.ACTIONS:
+                combo.addItem(text, action)
+            index = combo.findData(current.get(device.id))
+            if index >= 0:
+                combo.setCurrentIndex(index)
+            self.action_combos[device.id] = combo
+            layout.addRow(f"{device.name}:", combo)
+        
+        # Кнопки
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+    
+    def _selector_text(self, selector: dict, rooms: Dict[str, str]) -> str:
+        """Описание селектора: действие, типы устройств и комната"""
+        names = {action: text for text, action in self.ACTIONS}
+        action = names.get(selector.get("action"), selector.get("action"))
+        types = selector.get("types")
+        text = f"{action}: " + (", ".join(types) if types else "все устройства")
+        if selector.get("room_id"):
+            text += f" ({rooms.get(selector['room_id'], selector['room_id'])})"
+        return text
+    
+    def get_name(self) -> str:
+        """Получить название сцены"""
+        return self.name_edit.text() or "Сцена"
+    
+    def get_actions(self) -> List[dict]:
+        """Получить действия сцены: оставленные селекторы, затем выбранные устройства"""
+        actions = [
+            selector for selector, check in zip(self.selectors, self.selector_checks)
+            if check.isChecked()
+        ]
+        for device_id, combo in self.action_combos.items():
+            action = combo.currentData()
+            if not action:
+                continue
+            previous = self.device_actions.get(device_id)
+            if previous is not None and previous["action"] == action:
+                # Неизменённое действие сохраняется как было (со значением)
+                actions.append(previous)
+            else:
+                actions.append({"device_id": device_id, "action": action, "value": None})
+        return actions
@@ -1,23 +1,91 @@
 """Экран устройств"""
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
-    QTableWidget, QTableWidgetItem, QDialog, QFormLayout,
-    QComboBox, QLineEdit, QSpinBox, QDialogButtonBox, QMessageBox
+    QTableView, QStyledItemDelegate, QDialog, QFormLayout,
+    QComboBox, QLineEdit, QSpinBox, QDoubleSpinBox, QDialogButtonBox, QMessageBox
 )
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QFont
+from PySide6.QtCore import Qt, Signal, QEvent, QRect, QRegularExpression, QSortFilterProxyModel
+from PySide6.QtGui import QFont, QColor, QPainter, QStandardItem, QStandardItemModel
+from datetime import datetime
+from typing import Dict, Set
 import uuid
 from ..core.models import Device
+from ..core.event_bus import batch_items
+from .base import ScreenWidget
 
 
-class DevicesWidget(QWidget):
+# Роли данных в модели таблицы
+DEVICE_ID_ROLE = Qt.UserRole + 1
+ROOM_ID_ROLE = Qt.UserRole + 2
+
+# Колонки таблицы
+COL_NAME, COL_ROOM, COL_CATEGORY, COL_TYPE, COL_STATE, COL_LAST_SEEN, COL_STATUS, COL_ACTIONS = range(8)
+
+# Значок связи: True - на связи, False - недоступно, None - не контролируется
+STATUS_BADGES = {True: ("● В сети", "#4caf50"), False: ("● Нет связи", "#f44336"), None: ("—", "#888888")}
+
+
+class DeviceActionsDelegate(QStyledItemDelegate):
+    """Кнопки действий, нарисованные делегатом вместо виджетов в ячейках"""
+    
+    edit_requested = Signal(str)  # device_id
+    delete_requested = Signal(str)  # device_id
+    
+    BUTTONS = [
+        ("✏️", "#0078d4"),
+        ("🗑️", "#d32f2f"),
+    ]
+    
+    def _button_rects(self, rect: QRect):
+        """Области кнопок внутри ячейки"""
+        margin = 5
+        width = min(40, (rect.width() - margin * 3) // 2)
+        height = rect.height() - margin * 2
+        return [
+            QRect(rect.left() + margin + i * (width + margin), rect.top() + margin, width, height)
+            for i in range(len(self.BUTTONS))
+        ]
+    
+    def paint(self, painter: QPainter, option, index):
+        """Нарисовать кнопки"""
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        for (text, color), rect in zip(self.BUTTONS, self._button_rects(option.rect)):
+            painter.setBrush(QColor(color))
+            painter.drawRoundedRect(rect, 3, 3)
+            painter.setPen(Qt.white)
+            painter.drawText(rect, Qt.AlignCenter, text)
+            painter.setPen(Qt.NoPen)
+        painter.restore()
+    
+    def editorEvent(self, event, model, option, index):
+        """Обработать нажатие на кнопку"""
+        if event.type() != QEvent.MouseButtonRelease:
+            return False
+        device_id = index.data(DEVICE_ID_ROLE)
+        rects = self._button_rects(option.rect)
+        if rects[0].contains(event.position().toPoint()):
+            self.edit_requested.emit(device_id)
+            return True
+        if rects[1].contains(event.position().toPoint()):
+            self.delete_requested.emit(device_id)
+            return True
+        return False
+
+
+class DevicesWidget(ScreenWidget):
     """Виджет устройств"""
     
-    def __init__(self, storage, event_bus, simulator_manager):
+    def __init__(self, storage, event_bus, simulator_manager, health_monitor=None):
         super().__init__()
         self.storage = storage
         self.event_bus = event_bus
         self.simulator_manager = simulator_manager
+        self.health_monitor = health_monitor
+        # Устройства и номера строк модели по ID
+        self._devices: Dict[str, Device] = {}
+        self._rows: Dict[str, int] = {}
         self._init_ui()
         self._connect_events()
     
@@ -58,7 +126,7 @@ class DevicesWidget(QWidget):
         filters = QHBoxLayout()
         filters.addWidget(QLabel("Фильтр по комнате:"))
         self.filter_room = QComboBox()
-        self.filter_room.addItem("Все комнаты")
+        self.filter_room.addItem("Все комнаты", None)
         self.filter_room.setStyleSheet("""
             QComboBox {
                 background-color: #2b2b2b;
@@ -68,25 +136,38 @@ class DevicesWidget(QWidget):
                 border-radius: 4px;
             }
         """)
-        self.filter_room.currentTextChanged.connect(self.refresh)
+        self.filter_room.currentIndexChanged.connect(self._apply_filter)
         filters.addWidget(self.filter_room)
         filters.addStretch()
         layout.addLayout(filters)
         
-        # Таблица устройств
-        self.table = QTableWidget()
-        self.table.setColumnCount(7)
-        self.table.setHorizontalHeaderLabels([
-            "Название", "Комната", "Категория", "Тип", "Состояние", "Последнее обновление", "Действия"
+        # Модель устройств и фильтр по комнате
+        self.model = QStandardItemModel(0, 8, self)
+        self.model.setHorizontalHeaderLabels([
+            "Название", "Комната", "Категория", "Тип", "Состояние", "Последнее обновление", "Связь", "Действия"
         ])
+        self.proxy = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.proxy.setFilterKeyColumn(COL_ROOM)
+        self.proxy.setFilterRole(ROOM_ID_ROLE)
+        
+        # Таблица устройств
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
+        self.table.setEditTriggers(QTableView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.actions_delegate = DeviceActionsDelegate(self.table)
+        self.actions_delegate.edit_requested.connect(self._on_edit_requested)
+        self.actions_delegate.delete_requested.connect(self._on_delete_requested)
+        self.table.setItemDelegateForColumn(COL_ACTIONS, self.actions_delegate)
         self.table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 background-color: #2b2b2b;
                 color: white;
                 border: none;
                 gridline-color: #3a3a3a;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 8px;
             }
             QHeaderView::section {
@@ -109,92 +190,118 @@ class DevicesWidget(QWidget):
         """Обработка события"""
         event_type = event.get("type")
         if event_type in ["sensor_update", "actuator_update"]:
-            self.refresh()
+            for data in batch_items(event["data"]):
+                self.mark_device_dirty(data)
+        elif event_type in ["device_offline", "device_online"]:
+            self.mark_dirty(f"health:{event['data']['device_id']}")
+        elif event_type in ["devices_changed", "rooms_changed", "data_reset"]:
+            self.mark_dirty()
     
     def refresh(self):
-        """Обновить таблицу"""
-        # Обновить фильтр комнат
-        current_filter = self.filter_room.currentText()
+        """Полностью перестроить таблицу (при изменении состава устройств)"""
+        rooms = self.storage.get_rooms()
+        room_names = {r.id: r.name for r in rooms}
+        
+        # Обновить фильтр комнат без повторной фильтрации на каждый элемент
+        current_room_id = self.filter_room.currentData()
+        self.filter_room.blockSignals(True)
         self.filter_room.clear()
-        self.filter_room.addItem("Все комнаты")
-        for room in self.storage.get_rooms():
-            self.filter_room.addItem(room.name)
-        if current_filter and current_filter != "Все комнаты":
-            index = self.filter_room.findText(current_filter)
-            if index >= 0:
-                self.filter_room.setCurrentIndex(index)
+        self.filter_room.addItem("Все комнаты", None)
+        for room in rooms:
+            self.filter_room.addItem(room.name, room.id)
+        index = self.filter_room.findData(current_room_id)
+        self.filter_room.setCurrentIndex(max(index, 0))
+        self.filter_room.blockSignals(False)
         
-        # Получить устройства
+        # Заполнить модель
         devices = self.storage.get_devices()
-        rooms = {r.id: r.name for r in self.storage.get_rooms()}
+        self._devices = {d.id: d for d in devices}
+        self._rows = {}
+        self.model.setRowCount(0)
+        for row, device in enumerate(devices):
+            items = [
+                QStandardItem(device.name),
+                QStandardItem(room_names.get(device.room_id, "N/A")),
+                QStandardItem("Датчик" if device.category == "sensor" else "Актуатор"),
+                QStandardItem(device.type),
+                QStandardItem(self._state_text(device)),
+                QStandardItem(self._last_seen_text(device.last_seen)),
+                QStandardItem(),
+                QStandardItem(),
+            ]
+            self._set_status(items[COL_STATUS], device.id)
+            items[COL_ROOM].setData(device.room_id, ROOM_ID_ROLE)
+            items[COL_ACTIONS].setData(device.id, DEVICE_ID_ROLE)
+            self.model.appendRow(items)
+            self._rows[device.id] = row
         
-        # Применить фильтр
-        filter_room_name = self.filter_room.currentText()
-        if filter_room_name != "Все комнаты":
-            room_id = next((r.id for r in self.storage.get_rooms() if r.name == filter_room_name), None)
-            if room_id:
-                devices = [d for d in devices if d.room_id == room_id]
+        self._apply_filter()
+    
+    def apply_changes(self, changes: Set[str]):
+        """Обновить только ячейки состояния изменившихся устройств"""
+        for device_id, data in self.take_device_updates(changes).items():
+            row = self._rows.get(device_id)
+            if row is None:
+                # Устройство, которого ещё нет в таблице
+                self.refresh()
+                return
+            device = self._devices[device_id]
+            if "state" in data:
+                device.state = data["state"]
+            elif "value" in data:
+                device.state["value"] = data["value"]
+            device.last_seen = data.get("last_seen", device.last_seen)
+            self.model.item(row, COL_STATE).setText(self._state_text(device))
+            self.model.item(row, COL_LAST_SEEN).setText(self._last_seen_text(device.last_seen))
         
-        # Заполнить таблицу
-        self.table.setRowCount(len(devices))
-        for row, device in enumerate(devices):
-            self.table.setItem(row, 0, QTableWidgetItem(device.name))
-            self.table.setItem(row, 1, QTableWidgetItem(rooms.get(device.room_id, "N/A")))
-            self.table.setItem(row, 2, QTableWidgetItem("Датчик" if device.category == "sensor" else "Актуатор"))
-            self.table.setItem(row, 3, QTableWidgetItem(device.type))
-            
-            # Состояние
-            if device.category == "sensor":
-                value = device.state.get("value", "N/A")
-                state_text = str(value)
-            else:
-                powered = device.state.get("powered", False)
-                state_text = "ВКЛ" if powered else "ВЫКЛ"
-            self.table.setItem(row, 4, QTableWidgetItem(state_text))
-            
-            # Последнее обновление
-            last_seen = device.last_seen or "Никогда"
-            if device.last_seen:
-                try:
-                    from datetime import datetime
-                    dt = datetime.fromisoformat(device.last_seen)
-                    last_seen = dt.strftime("%H:%M:%S")
-                except:
-                    pass
-            self.table.setItem(row, 5, QTableWidgetItem(last_seen))
-            
-            # Действия
-            actions_widget = QWidget()
-            actions_layout = QHBoxLayout(actions_widget)
-            actions_layout.setContentsMargins(5, 5, 5, 5)
-            
-            btn_edit = QPushButton("✏️")
-            btn_edit.setStyleSheet("""
-                QPushButton {
-                    background-color: #0078d4;
-                    color: white;
-                    border: none;
-                    padding: 5px;
-                    border-radius: 3px;
-                }
-            """)
-            btn_edit.clicked.connect(lambda checked, d=device: self._edit_device(d))
-            actions_layout.addWidget(btn_edit)
-            
-            btn_delete = QPushButton("🗑️")
-            btn_delete.setStyleSheet("""
-                QPushButton {
-                    background-color: #d32f2f;
-                    color: white;
-                    border: none;
-                    padding: 5px;
-                    border-radius: 3px;
-                }
-            """)
-            btn_delete.clicked.connect(lambda checked, d=device: self._delete_device(d))
-            actions_layout.addWidget(btn_delete)
-            
-            self.table.setCellWidget(row, 6, actions_widget)
+        for key in changes:
+            if key.startswith("health:"):
+                row = self._rows.get(key[len("health:"):])
+                if row is not None:
+                    self._set_status(self.model.item(row, COL_STATUS), key[len("health:"):])
+    
+    def _set_status(self, item: QStandardItem, device_id: str):
+        """Значок связи с устройством"""
+        status = self.health_monitor.status(device_id) if self.health_monitor else None
+        text, color = STATUS_BADGES[status]
+        item.setText(text)
+        item.setForeground(QColor(color))
+    
+    def _apply_filter(self):
+        """Применить фильтр по комнате"""
+        room_id = self.filter_room.currentData()
+        if room_id:
+            pattern = f"^{QRegularExpression.escape(room_id)}$"
+            self.proxy.setFilterRegularExpression(QRegularExpression(pattern))
+        else:
+            self.proxy.setFilterRegularExpression(QRegularExpression())
+    
+    def _state_text(self, device: Device) -> str:
+        """Текст состояния устройства"""
+        if device.category == "sensor":
+            return str(device.state.get("value", "N/A"))
+        return "ВКЛ" if device.state.get("powered", False) else "ВЫКЛ"
+    
+    def _last_seen_text(self, last_seen) -> str:
+        """Текст времени последнего обновления"""
+        if not last_seen:
+            return "Никогда"
+        try:
+            return datetime.fromisoformat(last_seen).strftime("%H:%M:%S")
+        except ValueError:
+            return last_seen
+    
+    def _on_edit_requested(self, device_id: str):
+        """Нажата кнопка редактирования"""
+        device = self._devices.get(device_id)
+        if device:
+            self._edit_device(device)
+    
+    def _on_delete_requested(self, device_id: str):
+        """Нажата кнопка удаления"""
+        device = self._devices.get(device_id)
+        if device:
+            self._delete_device(device)
     
     def _add_device(self):
         """Добавить устройство"""
@@ -219,7 +326,7 @@ class DevicesWidget(QWidget):
             
             self.storage.add_device(device)
             self.simulator_manager.add_device(device)
-            self.refresh()
+            self.event_bus.emit("devices_changed", {"device_id": device.id})
     
     def _edit_device(self, device: Device):
         """Редактировать устройство"""
@@ -236,7 +343,7 @@ class DevicesWidget(QWidget):
             # Пересоздать симулятор
             self.simulator_manager.remove_device(device.id)
             self.simulator_manager.add_device(device)
-            self.refresh()
+            self.event_bus.emit("devices_changed", {"device_id": device.id})
     
     def _delete_device(self, device: Device):
         """Удалить устройство"""
@@ -248,7 +355,7 @@ class DevicesWidget(QWidget):
         if reply == QMessageBox.Yes:
             self.simulator_manager.remove_device(device.id)
             self.storage.delete_device(device.id)
-            self.refresh()
+            self.event_bus.emit("devices_changed", {"device_id": device.id})
 
 
 class DeviceDialog(QDialog):
@@ -311,7 +418,7 @@ class DeviceDialog(QDialog):
         layout.addRow("Интервал обновления:", self.interval_spin)
         
         self.mode_combo = QComboBox()
-        self.mode_combo.addItems(["random", "smooth", "manual"])
+        self.mode_combo.addItems(["random", "smooth", "physical", "manual"])
         if self.device and self.device.category == "sensor":
             mode = self.device.config.get("mode", "random")
             index = self.mode_combo.findText(mode)
@@ -319,6 +426,36 @@ class DeviceDialog(QDialog):
                 self.mode_combo.setCurrentIndex(index)
         layout.addRow("Режим генерации:", self.mode_combo)
         
+        # Фильтрация показаний: изменения внутри зоны нечувствительности не отправляются
+        config = self.device.config if self.device and self.device.category == "sensor" else {}
+        deadband_layout = QHBoxLayout()
+        self.deadband_spin = QDoubleSpinBox()
+        self.deadband_spin.setRange(0, 10000)
+        self.deadband_spin.setDecimals(1)
+        self.deadband_spin.setSpecialValueText("Выкл")
+        self.deadband_spin.setValue(config.get("deadband", 0))
+        deadband_layout.addWidget(self.deadband_spin)
+        self.deadband_mode_combo = QComboBox()
+        self.deadband_mode_combo.addItem("абс.", "abs")
+        self.deadband_mode_combo.addItem("%", "percent")
+        index = self.deadband_mode_combo.findData(config.get("deadband_mode", "abs"))
+        if index >= 0:
+            self.deadband_mode_combo.setCurrentIndex(index)
+        deadband_layout.addWidget(self.deadband_mode_combo)
+        layout.addRow("Зона нечувствительности:", deadband_layout)
+        
+        self.min_interval_spin = self._seconds_spin(config.get("min_interval", 0))
+        layout.addRow("Не чаще, чем раз в:", self.min_interval_spin)
+        self.max_interval_spin = self._seconds_spin(config.get("max_interval", 0))
+        layout.addRow("Отправлять изменения не реже:", self.max_interval_spin)
+        self.heartbeat_spin = self._seconds_spin(config.get("heartbeat", 0))
+        layout.addRow("Heartbeat:", self.heartbeat_spin)
+        
+        # Контроль связи (по умолчанию - три пропущенных heartbeat)
+        self.offline_spin = self._seconds_spin(self.device.config.get("offline_after", 0) if self.device else 0)
+        self.offline_spin.setSpecialValueText("Авто")
+        layout.addRow("Нет связи после:", self.offline_spin)
+        
         # Кнопки
         buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         buttons.accepted.connect(self.accept)
@@ -333,6 +470,18 @@ class DeviceDialog(QDialog):
         category = self.category_combo.currentText()
         self.interval_spin.setEnabled(category == "sensor")
         self.mode_combo.setEnabled(category == "sensor")
+        for widget in (self.deadband_spin, self.deadband_mode_combo, self.min_interval_spin,
+                       self.max_interval_spin, self.heartbeat_spin):
+            widget.setEnabled(category == "sensor")
+    
+    def _seconds_spin(self, value: int) -> QSpinBox:
+        """Поле интервала в секундах (0 - выключено)"""
+        spin = QSpinBox()
+        spin.setRange(0, 86400)
+        spin.setSuffix(" с")
+        spin.setSpecialValueText("Выкл")
+        spin.setValue(int(value))
+        return spin
     
     def _update_type_combo(self):
         """Обновить список типов"""
@@ -345,13 +494,21 @@ class DeviceDialog(QDialog):
     
     def get_device_data(self):
         """Получить данные устройства"""
-        return {
+        data = {
             "name": self.name_edit.text(),
             "room_id": self.room_combo.currentData(),
             "category": self.category_combo.currentText(),
             "type": self.type_combo.currentText(),
             "config": {
                 "update_interval": self.interval_spin.value(),
-                "mode": self.mode_combo.currentText()
-            } if self.category_combo.currentText() == "sensor" else {}
+                "mode": self.mode_combo.currentText(),
+                "deadband": self.deadband_spin.value(),
+                "deadband_mode": self.deadband_mode_combo.currentData(),
+                "min_interval": self.min_interval_spin.value(),
+                "max_interval": self.max_interval_spin.value(),
+                "heartbeat": self.heartbeat_spin.value()
+            } if self.category_combo.currentText() == "sensor" else {},
         }
+        # 0 ("Авто") пишется явно, иначе update() в _edit_device оставит прежний срок
+        data["config"]["offline_after"] = self.offline_spin.value()
+        return data
@@ -1,20 +1,80 @@
 """Экран логов"""
 from PySide6.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
-    QTableWidget, QTableWidgetItem, QLineEdit, QFileDialog
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox,
+    QTableWidget, QTableWidgetItem, QLineEdit, QFileDialog, QMessageBox, QProgressDialog
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QThread, QTimer, Signal
 from PySide6.QtGui import QFont
+from datetime import datetime, timedelta
+from itertools import islice
+import threading
+from typing import List, Set
 from ..core.models import LogEntry
+from ..utils.export import ExportCancelled, LogQuery, export_logs
+from ..utils.logger import LogSink
+from .base import ScreenWidget
 
 
-class LogsWidget(QWidget):
-    """Виджет логов"""
+# Фильтр по типу: (подпись, тип)
+LOG_TYPES = [("Все типы", None), ("Датчики", "sensor"), ("Устройства", "actuator"),
+             ("Правила", "rule"), ("Система", "system")]
+# Фильтр по периоду: (подпись, длительность)
+LOG_PERIODS = [("Всё время", None), ("Последний час", timedelta(hours=1)),
+               ("Последние сутки", timedelta(days=1)), ("Последние 7 дней", timedelta(days=7))]
+
+
+class LogExportWorker(QThread):
+    """Экспорт логов в фоновом потоке"""
+    
+    progress = Signal(int)  # просмотрено записей
+    done = Signal(int)  # записано
+    failed = Signal(str)
+    
+    def __init__(self, storage, path: str, query: LogQuery, parent=None):
+        super().__init__(parent)
+        self.storage = storage
+        self.path = path
+        self.query = query
+        self._cancel = threading.Event()
+    
+    def cancel(self):
+        """Запросить отмену экспорта"""
+        self._cancel.set()
+    
+    def run(self):
+        """Выгрузить логи в файл (выполняется в потоке)"""
+        try:
+            count = export_logs(self.storage.iter_logs(), self.path, self.query,
+                                self.progress.emit, self._cancel.is_set)
+        except ExportCancelled:
+            return
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.done.emit(count)
+
+
+class LogsWidget(ScreenWidget):
+    """Виджет логов
+    
+    Таблица показывает не больше MAX_ROWS последних записей, прошедших
+    фильтры; полная история доступна через экспорт.
+    """
+    
+    MAX_ROWS = 1000
     
     def __init__(self, storage, event_bus):
         super().__init__()
         self.storage = storage
         self.event_bus = event_bus
+        # Счётчик логов хранилища, уже показанных в таблице
+        self._logs_seen = 0
+        # Логи доходят до хранилища из LogSink с задержкой - после затишья
+        # событий таблица проверяется ещё раз, когда пакет уже записан
+        self._recheck_timer = QTimer(self)
+        self._recheck_timer.setSingleShot(True)
+        self._recheck_timer.setInterval(int(LogSink.FLUSH_INTERVAL * 1000) + 200)
+        self._recheck_timer.timeout.connect(lambda: self.mark_dirty("logs"))
         self._init_ui()
         self._connect_events()
     
@@ -52,8 +112,32 @@ class LogsWidget(QWidget):
         self.search_edit.textChanged.connect(self.refresh)
         header.addWidget(self.search_edit)
         
+        # Тип и период
+        combo_style = """
+            QComboBox {
+                background-color: #2b2b2b;
+                color: white;
+                border: 1px solid #3a3a3a;
+                padding: 5px;
+                border-radius: 4px;
+            }
+        """
+        self.type_combo = QComboBox()
+        for label, log_type in LOG_TYPES:
+            self.type_combo.addItem(label, log_type)
+        self.type_combo.setStyleSheet(combo_style)
+        self.type_combo.currentIndexChanged.connect(self.refresh)
+        header.addWidget(self.type_combo)
+        
+        self.period_combo = QComboBox()
+        for label, period in LOG_PERIODS:
+            self.period_combo.addItem(label, period)
+        self.period_combo.setStyleSheet(combo_style)
+        self.period_combo.currentIndexChanged.connect(self.refresh)
+        header.addWidget(self.period_combo)
+        
         # Кнопка экспорта
-        btn_export = QPushButton("💾 Экспорт в TXT")
+        btn_export = QPushButton("💾 Экспорт")
         btn_export.setStyleSheet("""
             QPushButton {
                 background-color: #0078d4;
@@ -106,72 +190,100 @@ class LogsWidget(QWidget):
     
     def _on_event(self, event: dict):
         """Обработка события"""
-        # Обновить логи при новом событии
-        self.refresh()
+        # Уплотнение и сброс данных удаляют старые записи - таблицу нужно перестроить целиком
+        if event.get("type") in ("logs_compacted", "data_reset"):
+            self.mark_dirty()
+            return
+        # Новые логи будут дописаны в таблицу при следующем применении изменений
+        self.mark_dirty("logs")
+        self._recheck_timer.start()
     
     def refresh(self):
         """Обновить таблицу"""
-        logs = self.storage.get_logs()
-        search_text = self.search_edit.text().lower()
-        
-        # Фильтрация по поиску
-        if search_text:
-            logs = [
-                log for log in logs
-                if search_text in log.message.lower() or
-                   search_text in log.source.lower() or
-                   search_text in log.type.lower()
-            ]
-        
-        # Обратный порядок (новые сверху)
-        logs = list(reversed(logs))
+        logs, self._logs_seen = self.storage.get_logs_after(0)
+        # Новые сверху; фильтр проходит логи с конца до MAX_ROWS совпадений
+        logs = list(islice(self._query().filter(reversed(logs)), self.MAX_ROWS))
         
         self.table.setRowCount(len(logs))
         for row, log in enumerate(logs):
-            # Время
-            time_str = log.timestamp
-            try:
-                from datetime import datetime
-                dt = datetime.fromisoformat(log.timestamp)
-                time_str = dt.strftime("%Y-%m-%d %H:%M:%S")
-            except:
-                pass
-            self.table.setItem(row, 0, QTableWidgetItem(time_str))
-            
-            # Тип
-            type_item = QTableWidgetItem(log.type)
-            colors = {
-                "sensor": Qt.cyan,
-                "actuator": Qt.yellow,
-                "rule": Qt.green,
-                "system": Qt.white
-            }
-            type_item.setForeground(colors.get(log.type, Qt.white))
-            self.table.setItem(row, 1, type_item)
-            
-            # Источник
-            self.table.setItem(row, 2, QTableWidgetItem(log.source))
-            
-            # Сообщение
-            self.table.setItem(row, 3, QTableWidgetItem(log.message))
+            self._set_row(row, log)
+    
+    def apply_changes(self, changes: Set[str]):
+        """Добавить сверху только новые логи"""
+        logs, self._logs_seen = self.storage.get_logs_after(self._logs_seen)
+        logs = self._filter(logs)[-self.MAX_ROWS:]
+        for log in logs:
+            self.table.insertRow(0)
+            self._set_row(0, log)
+        # Старые строки за пределом MAX_ROWS убрать
+        if self.table.rowCount() > self.MAX_ROWS:
+            self.table.setRowCount(self.MAX_ROWS)
+    
+    def _query(self) -> LogQuery:
+        """Текущие фильтры экрана"""
+        period = LOG_PERIODS[self.period_combo.currentIndex()][1]
+        return LogQuery(
+            search=self.search_edit.text(),
+            log_type=self.type_combo.currentData(),
+            start=datetime.now() - period if period else None
+        )
+    
+    def _filter(self, logs: List[LogEntry]) -> List[LogEntry]:
+        """Фильтрация по поиску, типу и периоду"""
+        return list(self._query().filter(logs))
+    
+    def _set_row(self, row: int, log: LogEntry):
+        """Заполнить строку таблицы"""
+        # Время
+        time_str = log.timestamp
+        try:
+            from datetime import datetime
+            dt = datetime.fromisoformat(log.timestamp)
+            time_str = dt.strftime("%Y-%m-%d %H:%M:%S")
+        except:
+            pass
+        self.table.setItem(row, 0, QTableWidgetItem(time_str))
+        
+        # Тип
+        type_item = QTableWidgetItem(log.type)
+        colors = {
+            "sensor": Qt.cyan,
+            "actuator": Qt.yellow,
+            "rule": Qt.green,
+            "system": Qt.white
+        }
+        type_item.setForeground(colors.get(log.type, Qt.white))
+        self.table.setItem(row, 1, type_item)
+        
+        # Источник
+        self.table.setItem(row, 2, QTableWidgetItem(log.source))
+        
+        # Сообщение
+        self.table.setItem(row, 3, QTableWidgetItem(log.render()))
     
     def _export_logs(self):
-        """Экспортировать логи в файл"""
+        """Экспортировать логи с текущими фильтрами в файл"""
         file_path, _ = QFileDialog.getSaveFileName(
-            self, "Экспорт логов", "logs.txt", "Text Files (*.txt)"
+            self, "Экспорт логов", "logs.csv",
+            "CSV (*.csv);;CSV, gzip (*.csv.gz);;JSON Lines (*.jsonl);;JSON Lines, gzip (*.jsonl.gz);;Text Files (*.txt)"
         )
-        if file_path:
-            try:
-                logs = self.storage.get_logs()
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write("Логи событий SmartHome Dashboard\n")
-                    f.write("=" * 50 + "\n\n")
-                    for log in logs:
-                        f.write(f"[{log.timestamp}] {log.type} | {log.source}\n")
-                        f.write(f"  {log.message}\n\n")
-                
-                from PySide6.QtWidgets import QMessageBox
-                QMessageBox.information(self, "Успех", f"Логи экспортированы в {file_path}")
-            except Exception as e:
-                from PySide6.QtWidgets import QMessageBox
-                QMessageBox.critical(self, "Ошибка", f"Не удалось экспортировать логи: {e}")
+        if not file_path:
+            return
+        
+        total = self.storage.count_logs()
+        dialog = QProgressDialog("Экспорт логов...", "Отмена", 0, max(total, 1), self)
+        dialog.setWindowTitle("Экспорт")
+        dialog.setWindowModality(Qt.WindowModal)
+        dialog.setMinimumDuration(300)
+        
+        worker = LogExportWorker(self.storage, file_path, self._query(), self)
+        worker.progress.connect(lambda scanned: dialog.setValue(min(scanned, total)))
+        dialog.canceled.connect(worker.cancel)
+        worker.done.connect(lambda count: QMessageBox.information(
+            self, "Успех", f"Экспортировано записей: {count}\n{file_path}"))
+        worker.failed.connect(lambda error: QMessageBox.critical(
+            self, "Ошибка", f"Не удалось экспортировать логи: {error}"))
+        worker.finished.connect(dialog.reset)
+        worker.finished.connect(dialog.deleteLater)
+        worker.finished.connect(worker.deleteLater)
+        worker.start()
@@ -5,12 +5,8 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt, Signal
 from PySide6.QtGui import QIcon, QFont
-from .dashboard import DashboardWidget
-from .rooms import RoomsWidget
-from .devices import DevicesWidget
-from .automations import AutomationsWidget
-from .logs import LogsWidget
-from .settings import SettingsWidget
+import time
+from typing import Callable, Dict, Optional
 
 
 class MainWindow(QMainWindow):
@@ -55,6 +51,12 @@ class MainWindow(QMainWindow):
         # Стек виджетов
         self.stacked_widget = QStackedWidget()
         
+        # Виджеты экранов и фабрики ещё не созданных экранов (добавляются извне)
+        self.widgets: Dict[str, QWidget] = {}
+        self._factories: Dict[str, Callable[[], QWidget]] = {}
+        # Время создания экранов (мс)
+        self.build_times: Dict[str, float] = {}
+        
         # Добавить пункты меню
         menu_items = [
             ("📊 Dashboard", "dashboard"),
@@ -76,22 +78,47 @@ class MainWindow(QMainWindow):
         # Добавить в layout
         main_layout.addWidget(self.sidebar)
         main_layout.addWidget(self.stacked_widget, 1)
-        
-        # Виджеты экранов (будут добавлены извне)
-        self.widgets = {}
     
     def add_widget(self, key: str, widget: QWidget):
         """Добавить виджет экрана"""
         self.widgets[key] = widget
         self.stacked_widget.addWidget(widget)
     
+    def add_screen(self, key: str, factory: Callable[[], QWidget]):
+        """Зарегистрировать экран, который будет создан при первом открытии"""
+        self._factories[key] = factory
+        if key == self._current_key():
+            self._show_screen(key)
+    
+    def get_widget(self, key: str) -> Optional[QWidget]:
+        """Получить виджет экрана, если он уже создан"""
+        return self.widgets.get(key)
+    
+    def _current_key(self) -> Optional[str]:
+        """Ключ выбранного пункта меню"""
+        item = self.sidebar.currentItem()
+        return item.data(Qt.UserRole) if item else None
+    
+    def _build_screen(self, key: str) -> Optional[QWidget]:
+        """Создать экран по зарегистрированной фабрике"""
+        factory = self._factories.pop(key, None)
+        if factory is None:
+            return None
+        start = time.perf_counter()
+        widget = factory()
+        self.build_times[key] = (time.perf_counter() - start) * 1000
+        self.add_widget(key, widget)
+        return widget
+    
+    def _show_screen(self, key: str):
+        """Показать экран, создав его при необходимости"""
+        # Экран сам применяет накопленные изменения при показе
+        widget = self.widgets.get(key) or self._build_screen(key)
+        if widget is not None:
+            self.stacked_widget.setCurrentWidget(widget)
+    
     def _on_menu_changed(self, index: int):
         """Обработка изменения пункта меню"""
         item = self.sidebar.item(index)
         if item:
-            key = item.data(Qt.UserRole)
-            if key in self.widgets:
-                self.stacked_widget.setCurrentWidget(self.widgets[key])
-                # Обновить виджет при переключении
-                if hasattr(self.widgets[key], "refresh"):
-                    self.widgets[key].refresh()
+            self._show_screen(item.data(Qt.UserRole))
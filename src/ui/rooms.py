@@ -3,13 +3,15 @@ from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
     QScrollArea, QFrame, QGridLayout
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, Signal
 from PySide6.QtGui import QFont
-from typing import List
+from typing import Dict, List, Set
 from ..core.models import Room, Device
+from ..core.event_bus import batch_items
+from .base import ScreenWidget
 
 
-class RoomsWidget(QWidget):
+class RoomsWidget(ScreenWidget):
     """Виджет комнат"""
     
     def __init__(self, storage, event_bus, simulator_manager):
@@ -17,7 +19,10 @@ class RoomsWidget(QWidget):
         self.storage = storage
         self.event_bus = event_bus
         self.simulator_manager = simulator_manager
+        # Карточки устройств по ID
+        self._device_cards: Dict[str, "RoomDeviceCard"] = {}
         self._init_ui()
+        self._connect_events()
     
     def _init_ui(self):
         """Инициализация UI"""
@@ -50,13 +55,28 @@ class RoomsWidget(QWidget):
         
         self.refresh()
     
+    def _connect_events(self):
+        """Подключить события"""
+        self.event_bus.event_emitted.connect(self._on_event)
+    
+    def _on_event(self, event: dict):
+        """Обработка события"""
+        event_type = event.get("type")
+        if event_type in ["sensor_update", "actuator_update"]:
+            for data in batch_items(event["data"]):
+                self.mark_device_dirty(data)
+        elif event_type in ["devices_changed", "rooms_changed", "data_reset"]:
+            # Состав комнат и устройств изменился - перестроить карточки
+            self.mark_dirty()
+    
     def refresh(self):
-        """Обновить данные"""
+        """Перестроить карточки (при изменении состава комнат и устройств)"""
         # Очистить старые карточки
         while self.container_layout.count():
             item = self.container_layout.takeAt(0)
             if item.widget():
                 item.widget().deleteLater()
+        self._device_cards.clear()
         
         rooms = self.storage.get_rooms()
         devices = self.storage.get_devices()
@@ -75,30 +95,34 @@ class RoomsWidget(QWidget):
         
         self.container_layout.addStretch()
     
+    def apply_changes(self, changes: Set[str]):
+        """Обновить на месте только изменившиеся устройства"""
+        for device_id, data in self.take_device_updates(changes).items():
+            card = self._device_cards.get(device_id)
+            if card is None:
+                # Новое устройство - нужна перестройка карточек
+                self.refresh()
+                return
+            card.apply_update(data)
+    
     def _create_room_detail_card(self, room: Room, devices: List[Device]) -> QFrame:
         """Создать детальную карточку комнаты"""
         card = QFrame()
-        card.setStyleSheet("""
-            QFrame {
-                background-color: #2b2b2b;
-                border-radius: 10px;
-                padding: 20px;
-            }
-        """)
+        card.setObjectName("roomDetailCard")
         
         layout = QVBoxLayout(card)
         layout.setSpacing(15)
         
         # Название комнаты
         title = QLabel(room.name)
+        title.setObjectName("roomDetailTitle")
         title.setFont(QFont("Arial", 18, QFont.Bold))
-        title.setStyleSheet("color: white;")
         layout.addWidget(title)
         
         # Устройства
         if devices:
             devices_label = QLabel("Устройства:")
-            devices_label.setStyleSheet("color: #cccccc; font-size: 14px;")
+            devices_label.setObjectName("roomDevicesLabel")
             layout.addWidget(devices_label)
             
             devices_layout = QGridLayout()
@@ -106,77 +130,77 @@ class RoomsWidget(QWidget):
             
             row = 0
             for device in devices:
-                device_widget = self._create_device_widget(device)
-                devices_layout.addWidget(device_widget, row // 2, row % 2)
+                device_card = RoomDeviceCard(device)
+                device_card.toggle_requested.connect(self._toggle_device)
+                self._device_cards[device.id] = device_card
+                devices_layout.addWidget(device_card, row // 2, row % 2)
                 row += 1
             
             layout.addLayout(devices_layout)
         else:
             no_devices = QLabel("Нет устройств")
-            no_devices.setStyleSheet("color: #888888; font-style: italic;")
+            no_devices.setObjectName("roomNoDevices")
             layout.addWidget(no_devices)
         
         return card
     
-    def _create_device_widget(self, device: Device) -> QFrame:
-        """Создать виджет устройства"""
-        widget = QFrame()
-        widget.setStyleSheet("""
-            QFrame {
-                background-color: #1e1e1e;
-                border-radius: 6px;
-                padding: 10px;
-            }
-        """)
+    def _toggle_device(self, device: Device):
+        """Переключить устройство"""
+        current_state = device.state.get("powered", False)
+        action = "off" if current_state else "on"
+        # Карточка обновится по событию actuator_update
+        self.simulator_manager.control_device(device.id, action)
+
+
+class RoomDeviceCard(QFrame):
+    """Карточка устройства в комнате, обновляемая на месте"""
+    
+    toggle_requested = Signal(object)  # Device
+    
+    def __init__(self, device: Device):
+        super().__init__()
+        self.device = device
+        self.setObjectName("roomDeviceCard")
         
-        layout = QVBoxLayout(widget)
+        layout = QVBoxLayout(self)
         layout.setSpacing(5)
         
         # Название
         name = QLabel(device.name)
-        name.setStyleSheet("color: white; font-weight: bold;")
+        name.setObjectName("roomDeviceName")
         layout.addWidget(name)
         
         # Тип
         type_label = QLabel(f"Тип: {device.type}")
-        type_label.setStyleSheet("color: #aaaaaa; font-size: 11px;")
+        type_label.setObjectName("roomDeviceType")
         layout.addWidget(type_label)
         
         # Состояние
-        if device.category == "sensor":
-            value = device.state.get("value", "N/A")
-            state_label = QLabel(f"Значение: {value}")
-        else:
-            powered = device.state.get("powered", False)
-            state_label = QLabel(f"Состояние: {'ВКЛ' if powered else 'ВЫКЛ'}")
-        
-        state_label.setStyleSheet("color: #888888; font-size: 11px;")
-        layout.addWidget(state_label)
+        self.state_label = QLabel()
+        self.state_label.setObjectName("roomDeviceState")
+        layout.addWidget(self.state_label)
+        self._update_state_label()
         
         # Кнопка управления (для актуаторов)
         if device.category == "actuator":
             btn = QPushButton("Переключить")
-            btn.setStyleSheet("""
-                QPushButton {
-                    background-color: #0078d4;
-                    color: white;
-                    border: none;
-                    padding: 6px;
-                    border-radius: 4px;
-                    font-size: 11px;
-                }
-                QPushButton:hover {
-                    background-color: #106ebe;
-                }
-            """)
-            btn.clicked.connect(lambda checked, d=device: self._toggle_device(d))
+            btn.setObjectName("roomDeviceToggle")
+            btn.clicked.connect(lambda: self.toggle_requested.emit(self.device))
             layout.addWidget(btn)
-        
-        return widget
     
-    def _toggle_device(self, device: Device):
-        """Переключить устройство"""
-        current_state = device.state.get("powered", False)
-        action = "off" if current_state else "on"
-        self.simulator_manager.control_device(device.id, action)
-        self.refresh()
+    def apply_update(self, data: dict):
+        """Применить данные события устройства"""
+        if "state" in data:
+            self.device.state = data["state"]
+        elif "value" in data:
+            self.device.state["value"] = data["value"]
+        self._update_state_label()
+    
+    def _update_state_label(self):
+        """Обновить текст состояния"""
+        if self.device.category == "sensor":
+            value = self.device.state.get("value", "N/A")
+            self.state_label.setText(f"Значение: {value}")
+        else:
+            powered = self.device.state.get("powered", False)
+            self.state_label.setText(f"Состояние: {'ВКЛ' if powered else 'ВЫКЛ'}")
@@ -1,14 +1,16 @@
 """Экран настроек"""
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
-    QComboBox, QLineEdit, QSpinBox, QGroupBox, QFormLayout,
+    QComboBox, QLineEdit, QSpinBox, QDoubleSpinBox, QGroupBox, QFormLayout,
     QMessageBox
 )
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QFont
+from .base import ScreenWidget
+from ..mqtt.transport import create_connection
 
 
-class SettingsWidget(QWidget):
+class SettingsWidget(ScreenWidget):
     """Виджет настроек"""
     
     def __init__(self, storage, event_bus):
@@ -16,6 +18,7 @@ class SettingsWidget(QWidget):
         self.storage = storage
         self.event_bus = event_bus
         self._init_ui()
+        self._connect_events()
     
     def _init_ui(self):
         """Инициализация UI"""
@@ -138,6 +141,73 @@ class SettingsWidget(QWidget):
         
         layout.addWidget(mqtt_group)
         
+        # Местоположение для триггеров восхода/заката
+        location_group = QGroupBox("Местоположение")
+        location_group.setStyleSheet("""
+            QGroupBox {
+                background-color: #2b2b2b;
+                border: 1px solid #3a3a3a;
+                border-radius: 8px;
+                padding: 15px;
+                margin-top: 10px;
+            }
+            QGroupBox::title {
+                color: white;
+                subcontrol-origin: margin;
+                left: 10px;
+                padding: 0 5px;
+            }
+        """)
+        location_layout = QFormLayout(location_group)
+        
+        self.lat_spin = QDoubleSpinBox()
+        self.lat_spin.setRange(-90, 90)
+        self.lat_spin.setDecimals(4)
+        location_layout.addRow("Широта:", self.lat_spin)
+        
+        self.lon_spin = QDoubleSpinBox()
+        self.lon_spin.setRange(-180, 180)
+        self.lon_spin.setDecimals(4)
+        location_layout.addRow("Долгота:", self.lon_spin)
+        
+        layout.addWidget(location_group)
+        
+        # Логирование
+        logging_group = QGroupBox("Логирование")
+        logging_group.setStyleSheet(location_group.styleSheet())
+        logging_layout = QFormLayout(logging_group)
+        
+        self.log_level_combo = QComboBox()
+        self.log_level_combo.addItem("Все (debug)", "debug")
+        self.log_level_combo.addItem("Без показаний датчиков (info)", "info")
+        self.log_level_combo.addItem("Только предупреждения (warning)", "warning")
+        logging_layout.addRow("Уровень:", self.log_level_combo)
+        
+        self.sensor_sample_spin = QSpinBox()
+        self.sensor_sample_spin.setRange(0, 1000)
+        self.sensor_sample_spin.setSpecialValueText("Не писать")
+        self.sensor_sample_spin.setPrefix("каждое ")
+        self.sensor_sample_spin.setSuffix("-е")
+        logging_layout.addRow("Показания датчиков:", self.sensor_sample_spin)
+        
+        # Сроки хранения; старые показания датчиков сворачиваются в почасовые сводки
+        self.sensor_retention_spin = QSpinBox()
+        self.sensor_retention_spin.setRange(1, 24 * 365)
+        self.sensor_retention_spin.setSuffix(" ч")
+        logging_layout.addRow("Хранить показания датчиков:", self.sensor_retention_spin)
+        
+        self.actuator_retention_spin = QSpinBox()
+        self.actuator_retention_spin.setRange(1, 3650)
+        self.actuator_retention_spin.setSuffix(" дн")
+        logging_layout.addRow("Хранить управление устройствами:", self.actuator_retention_spin)
+        
+        self.history_retention_spin = QSpinBox()
+        self.history_retention_spin.setRange(1, 3650)
+        self.history_retention_spin.setSuffix(" дн")
+        logging_layout.addRow("Хранить правила, систему и сводки:", self.history_retention_spin)
+        
+        layout.addWidget(logging_group)
+        
         # Действия
         actions_group = QGroupBox("Действия")
         actions_group.setStyleSheet("""
@@ -198,6 +268,15 @@ class SettingsWidget(QWidget):
         
         self.refresh()
     
+    def _connect_events(self):
+        """Подключить события"""
+        self.event_bus.event_emitted.connect(self._on_event)
+    
+    def _on_event(self, event: dict):
+        """Обработка события"""
+        if event.get("type") == "data_reset":
+            self.mark_dirty()
+    
     def refresh(self):
         """Обновить настройки"""
         settings = self.storage.get_settings()
@@ -213,35 +292,74 @@ class SettingsWidget(QWidget):
         self.mqtt_host.setText(mqtt.get("host", "localhost"))
         self.mqtt_port.setValue(mqtt.get("port", 1883))
         self.mqtt_topic.setText(mqtt.get("base_topic", "smarthome"))
+        
+        # Местоположение
+        location = settings.get("location", {})
+        self.lat_spin.setValue(location.get("lat", 55.75))
+        self.lon_spin.setValue(location.get("lon", 37.62))
+        
+        # Логирование
+        logging = settings.get("logging", {})
+        index = self.log_level_combo.findData(logging.get("level", "debug"))
+        if index >= 0:
+            self.log_level_combo.setCurrentIndex(index)
+        self.sensor_sample_spin.setValue(logging.get("sample", {}).get("sensor", 1))
+        retention = settings.get("retention", {})
+        self.sensor_retention_spin.setValue(retention.get("sensor", 24))
+        self.actuator_retention_spin.setValue(retention.get("actuator", 720) // 24)
+        self.history_retention_spin.setValue(retention.get("rule", 2160) // 24)
     
     def _save_settings(self):
         """Сохранить настройки"""
+        logging = self.storage.get_settings().get("logging", {})
+        history_hours = self.history_retention_spin.value() * 24
         settings = {
             "mode": self.mode_combo.currentText(),
             "mqtt": {
                 "host": self.mqtt_host.text(),
                 "port": self.mqtt_port.value(),
                 "base_topic": self.mqtt_topic.text()
+            },
+            "location": {
+                "lat": self.lat_spin.value(),
+                "lon": self.lon_spin.value()
+            },
+            "logging": {
+                **logging,
+                "level": self.log_level_combo.currentData(),
+                "sample": {**logging.get("sample", {}), "sensor": self.sensor_sample_spin.value()}
+            },
+            "retention": {
+                "sensor": self.sensor_retention_spin.value(),
+                "actuator": self.actuator_retention_spin.value() * 24,
+                "rule": history_hours,
+                "system": history_hours,
+                "summary": history_hours
             }
         }
         
         self.storage.update_settings(settings)
+        self.event_bus.emit("settings_changed", settings)
         QMessageBox.information(self, "Успех", "Настройки сохранены")
         
         # Уведомить о необходимости перезапуска для MQTT
         if settings["mode"] == "mqtt":
             QMessageBox.warning(
                 self, "Внимание",
-                "Для применения MQTT режима требуется перезапуск приложения.\n"
-                "MQTT режим пока не реализован полностью."
+                "Для применения MQTT режима требуется перезапуск приложения."
             )
     
     def _test_mqtt(self):
         """Тест подключения MQTT"""
+        try:
+            connection = create_connection({"host": self.mqtt_host.text(), "port": self.mqtt_port.value()})
+        except (RuntimeError, OSError) as e:
+            QMessageBox.warning(self, "Ошибка", f"Не удалось подключиться к брокеру:\n{e}")
+            return
+        connection.close()
         QMessageBox.information(
-            self, "Информация",
-            "MQTT режим пока не реализован.\n"
-            "В текущей версии используется только Local Simulation Mode."
+            self, "Успех",
+            f"Подключение к {self.mqtt_host.text()}:{self.mqtt_port.value()} установлено"
         )
     
     def _reset_demo_data(self):
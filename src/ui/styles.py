@@ -0,0 +1,91 @@
+"""Общая таблица стилей приложения
+
+Стили повторяющихся виджетов задаются здесь через objectName, а не через
+setStyleSheet у каждого экземпляра: Qt разбирает эту таблицу один раз.
+"""
+
+# Тёмная тема
+APP_STYLESHEET = """
+    QMainWindow {
+        background-color: #1e1e1e;
+    }
+    QWidget {
+        background-color: #1e1e1e;
+        color: white;
+    }
+    QDialog {
+        background-color: #2b2b2b;
+    }
+    QLineEdit, QSpinBox, QDoubleSpinBox, QComboBox {
+        background-color: #1e1e1e;
+        color: white;
+        border: 1px solid #3a3a3a;
+        padding: 5px;
+        border-radius: 4px;
+    }
+    QLineEdit:focus, QSpinBox:focus, QDoubleSpinBox:focus, QComboBox:focus {
+        border: 1px solid #0078d4;
+    }
+    QPushButton {
+        background-color: #0078d4;
+        color: white;
+        border: none;
+        padding: 8px 16px;
+        border-radius: 6px;
+    }
+    QPushButton:hover {
+        background-color: #106ebe;
+    }
+    QPushButton:pressed {
+        background-color: #005a9e;
+    }
+    
+    /* Дашборд */
+    QPushButton#sceneButton {
+        padding: 12px 20px;
+        font-size: 14px;
+    }
+    
+    /* Комнаты */
+    QFrame#roomDetailCard {
+        background-color: #2b2b2b;
+        border-radius: 10px;
+        padding: 20px;
+    }
+    QLabel#roomDetailTitle {
+        background-color: transparent;
+        color: white;
+    }
+    QLabel#roomDevicesLabel {
+        background-color: transparent;
+        color: #cccccc;
+        font-size: 14px;
+    }
+    QLabel#roomNoDevices {
+        background-color: transparent;
+        color: #888888;
+        font-style: italic;
+    }
+    QFrame#roomDeviceCard {
+        background-color: #1e1e1e;
+        border-radius: 6px;
+        padding: 10px;
+    }
+    QLabel#roomDeviceName {
+        color: white;
+        font-weight: bold;
+    }
+    QLabel#roomDeviceType {
+        color: #aaaaaa;
+        font-size: 11px;
+    }
+    QLabel#roomDeviceState {
+        color: #888888;
+        font-size: 11px;
+    }
+    QPushButton#roomDeviceToggle {
+        padding: 6px;
+        border-radius: 4px;
+        font-size: 11px;
+    }
+"""
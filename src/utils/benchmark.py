@@ -0,0 +1,100 @@
+"""Воспроизводимый прогон конвейера: симуляторы -> правила -> хранилище
+
+Симуляторы работают в режиме перемотки на виртуальных часах с заданным
+seed, поэтому одинаковые параметры дают одинаковую последовательность
+событий (контрольная сумма в отчёте) за секунды вместо часов.
+
+Запуск:
+    python -m src.utils.benchmark --hours 24 --seed 42
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from PySide6.QtCore import QCoreApplication
+
+from ..core.automation import AutomationEngine, RuleActionExecutor
+from ..core.clock import VirtualClock, VirtualScheduler
+from ..core.event_bus import EventBus
+from ..core.simulator import SimulatorManager
+from ..storage.storage import Storage
+from .logger import Logger
+
+
+# Начало виртуального времени по умолчанию
+DEFAULT_START = datetime(2026, 1, 1)
+
+
+def run_pipeline(hours: float, seed: int, start: datetime = DEFAULT_START) -> Dict[str, Any]:
+    """Прогнать hours часов виртуального времени, вернуть статистику"""
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    workdir = Path(tempfile.mkdtemp(prefix="smarthome-bench-"))
+    try:
+        storage = Storage(str(workdir / "state.json"))
+        event_bus = EventBus()
+        clock = VirtualClock(start)
+        scheduler = VirtualScheduler(clock)
+        simulator_manager = SimulatorManager(event_bus, storage, seed=seed, clock=clock, fast_forward=True)
+        automation_engine = AutomationEngine(event_bus, scheduler, clock)
+        logger = Logger(storage, event_bus, clock)
+        rule_executor = RuleActionExecutor(event_bus, simulator_manager, scheduler)
+        
+        devices = storage.get_devices()
+        for device in devices:
+            simulator_manager.add_device(device)
+        automation_engine.set_location(storage.get_settings().get("location"))
+        automation_engine.set_rules({r.id: r for r in storage.get_rules()})
+        automation_engine.set_devices({d.id: d for d in devices})
+        
+        counts: Dict[str, int] = {}
+        checksum = [0]
+        
+        def tap(event: Dict[str, Any]):
+            counts[event["type"]] = counts.get(event["type"], 0) + 1
+            key = repr((event["type"], sorted(event["data"].items()))).encode("utf-8")
+            checksum[0] = zlib.crc32(key, checksum[0])
+        
+        event_bus.add_tap(tap)
+        started = time.perf_counter()
+        updates = simulator_manager.fast_forward(hours * 3600, scheduler)
+        logger.close()
+        storage.flush()
+        elapsed = time.perf_counter() - started
+        event_bus.remove_tap(tap)
+        storage.close()
+        
+        return {
+            "updates": updates,
+            "events": counts,
+            "checksum": f"{checksum[0]:08x}",
+            "elapsed": elapsed,
+            "speedup": hours * 3600 / elapsed if elapsed > 0 else 0.0,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа командной строки"""
+    parser = argparse.ArgumentParser(description="Воспроизводимый прогон симуляции")
+    parser.add_argument("--hours", type=float, default=24, help="часов виртуального времени")
+    parser.add_argument("--seed", type=int, default=42, help="seed генераторов симуляторов")
+    args = parser.parse_args(argv)
+    
+    stats = run_pipeline(args.hours, args.seed)
+    print(f"Обновлений датчиков: {stats['updates']}")
+    for event_type, count in sorted(stats["events"].items()):
+        print(f"  {event_type}: {count}")
+    print(f"Контрольная сумма событий: {stats['checksum']}")
+    print(f"Время: {stats['elapsed']:.2f} с (в {stats['speedup']:,.0f} раз быстрее реального)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
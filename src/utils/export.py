@@ -0,0 +1,117 @@
+"""Потоковый экспорт логов
+
+Логи читаются из хранилища генератором (Storage.iter_logs), фильтруются
+и сразу пишутся в файл, поэтому память не зависит от размера истории.
+Формат выбирается по расширению файла: .csv, .jsonl, .txt; окончание .gz
+включает сжатие gzip (например, logs.jsonl.gz).
+"""
+import csv
+import gzip
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, Optional
+
+from ..core.models import LogEntry
+
+
+EXPORT_FORMATS = ("csv", "jsonl", "txt")
+
+# Как часто сообщать о прогрессе и проверять отмену (записей)
+PROGRESS_EVERY = 500
+
+
+class ExportCancelled(Exception):
+    """Экспорт отменён пользователем"""
+
+
+@dataclass
+class LogQuery:
+    """Фильтр логов: поиск по тексту, тип и период"""
+    search: str = ""
+    log_type: Optional[str] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    
+    def __post_init__(self):
+        self.search = self.search.lower()
+        # Время в логах - ISO-строки, сравниваются как строки
+        self._start = self.start.isoformat() if self.start else None
+        self._end = self.end.isoformat() if self.end else None
+    
+    def matches(self, log: LogEntry) -> bool:
+        """Подходит ли запись под фильтры"""
+        if self.log_type and log.type != self.log_type:
+            return False
+        if self._start and log.timestamp < self._start:
+            return False
+        if self._end and log.timestamp >= self._end:
+            return False
+        if self.search:
+            return (self.search in log.source.lower() or self.search in log.type.lower()
+                    or self.search in log.render().lower())
+        return True
+    
+    def filter(self, logs: Iterable[LogEntry]) -> Iterator[LogEntry]:
+        """Записи, подходящие под фильтры (лениво)"""
+        return (log for log in logs if self.matches(log))
+
+
+def export_format(path: str) -> str:
+    """Формат файла по расширению (без .gz)"""
+    name = path.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    ext = os.path.splitext(name)[1].lstrip(".")
+    if ext not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат экспорта: {path}")
+    return ext
+
+
+def export_logs(logs: Iterable[LogEntry], path: str, query: Optional[LogQuery] = None,
+                progress: Optional[Callable[[int], None]] = None,
+                cancelled: Optional[Callable[[], bool]] = None) -> int:
+    """Записать подходящие под query логи в файл, вернуть число записанных
+    
+    progress(число просмотренных) вызывается каждые PROGRESS_EVERY записей,
+    cancelled() проверяется там же; при отмене недописанный файл удаляется
+    и выбрасывается ExportCancelled.
+    """
+    fmt = export_format(path)
+    tmp_path = path + ".tmp"
+    opener = gzip.open if path.lower().endswith(".gz") else open
+    count = 0
+    scanned = 0
+    try:
+        with opener(tmp_path, "wt", encoding="utf-8", newline="") as f:
+            if fmt == "csv":
+                writer = csv.writer(f)
+                writer.writerow(["timestamp", "type", "level", "source", "message"])
+                write = lambda log: writer.writerow([log.timestamp, log.type, log.level, log.source, log.render()])
+            elif fmt == "jsonl":
+                write = lambda log: f.write(json.dumps(
+                    {**log.to_dict(), "message": log.render()}, ensure_ascii=False) + "\n")
+            else:
+                f.write("Логи событий SmartHome Dashboard\n")
+                f.write("=" * 50 + "\n\n")
+                write = lambda log: f.write(f"[{log.timestamp}] {log.type} | {log.source}\n  {log.render()}\n\n")
+            
+            for log in logs:
+                scanned += 1
+                if scanned % PROGRESS_EVERY == 0:
+                    if cancelled is not None and cancelled():
+                        raise ExportCancelled()
+                    if progress is not None:
+                        progress(scanned)
+                if query is None or query.matches(log):
+                    write(log)
+                    count += 1
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if progress is not None:
+        progress(scanned)
+    return count
@@ -1,15 +1,115 @@
-"""Утилита для логирования событий"""
-from datetime import datetime
+"""Утилита для логирования событий
+
+Записи лога хранят поля события, а не готовый текст: текст строится
+LogEntry.render() только при показе. LogFilter отсекает записи до их
+создания (уровень, прореживание по типу и устройству), а LogSink пишет
+записи в хранилище пакетами из фонового потока.
+"""
+import queue
+import threading
+from typing import Any, Dict, List, Optional
+
+from ..core.clock import SystemClock
 from ..core.models import LogEntry
-from ..core.event_bus import EventBus
+from ..core.event_bus import EventBus, batch_items
+
+
+class LogFilter:
+    """Уровень и прореживание записей лога
+    
+    Настройки (settings["logging"]):
+        level - минимальный уровень: debug, info, warning
+        sample - {тип: N} - писать каждую N-ю запись типа (0 - не писать)
+        devices - {ID устройства: N} - то же для устройства (важнее sample)
+    """
+    
+    LEVELS = {"debug": 0, "info": 1, "warning": 2}
+    
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        self.level = self.LEVELS.get(config.get("level", "debug"), 0)
+        self.sample: Dict[str, int] = dict(config.get("sample", {}))
+        self.devices: Dict[str, int] = dict(config.get("devices", {}))
+        self._counters: Dict[str, int] = {}
+    
+    def allow(self, log_type: str, level: str, device_id: Optional[str] = None) -> bool:
+        """Нужно ли писать запись"""
+        if self.LEVELS[level] < self.level:
+            return False
+        if device_id in self.devices:
+            every, key = self.devices[device_id], device_id
+        else:
+            every, key = self.sample.get(log_type, 1), log_type
+        if every <= 1:
+            return every == 1
+        count = self._counters.get(key, 0)
+        self._counters[key] = count + 1
+        return count % every == 0
+
+
+class LogSink:
+    """Буферизованная запись логов в хранилище из фонового потока
+    
+    Записи копятся в очереди и сохраняются пакетом (Storage.add_logs), когда
+    набралось batch_size записей или очередь пуста дольше flush_interval секунд.
+    """
+    
+    # Пауза без новых записей, после которой пакет записывается (с)
+    FLUSH_INTERVAL = 0.5
+    
+    def __init__(self, storage, flush_interval: float = FLUSH_INTERVAL, batch_size: int = 200):
+        self.storage = storage
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="LogSink", daemon=True)
+        self._thread.start()
+    
+    def put(self, log: LogEntry):
+        """Поставить запись в очередь на запись в хранилище"""
+        self._queue.put(log)
+    
+    def _run(self):
+        batch: List[LogEntry] = []
+        while True:
+            try:
+                log = self._queue.get(timeout=self.flush_interval if batch else None)
+            except queue.Empty:
+                self._write(batch)
+                batch = []
+                continue
+            if log is None:
+                break
+            batch.append(log)
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        self._write(batch)
+    
+    def _write(self, batch: List[LogEntry]):
+        try:
+            self.storage.add_logs(batch)
+        except Exception as e:
+            print(f"Error writing logs: {e}")
+    
+    def close(self):
+        """Дописать очередь и остановить поток"""
+        self._queue.put(None)
+        self._thread.join()
 
 
 class Logger:
-    """Логгер событий"""
+    """Логгер событий
     
-    def __init__(self, storage, event_bus: EventBus):
+    buffered=False пишет каждую запись в хранилище сразу (без фонового потока).
+    """
+    
+    def __init__(self, storage, event_bus: EventBus, clock=None, buffered: bool = True):
         self.storage = storage
         self.event_bus = event_bus
+        self.clock = clock or SystemClock()
+        self.filter = LogFilter(storage.get_settings().get("logging"))
+        self.sink = LogSink(storage) if buffered else None
         self._connect_events()
     
     def _connect_events(self):
@@ -17,46 +117,126 @@ class Logger:
         self.event_bus.subscribe("sensor_update", self._log_sensor)
         self.event_bus.subscribe("actuator_update", self._log_actuator)
         self.event_bus.subscribe("rule_triggered", self._log_rule)
+        self.event_bus.subscribe("rule_blocked", self._log_rule_blocked)
+        self.event_bus.subscribe("device_offline", self._log_health)
+        self.event_bus.subscribe("device_online", self._log_health)
+        self.event_bus.subscribe("settings_changed", self._on_settings_changed)
     
-    def _log_sensor(self, event: dict):
-        """Логировать обновление датчика"""
+    def _on_settings_changed(self, event: dict):
         data = event.get("data", {})
+        if "logging" in data:
+            self.configure(data["logging"])
+    
+    def configure(self, config: Optional[Dict[str, Any]]):
+        """Применить настройки уровня и прореживания"""
+        self.filter = LogFilter(config)
+    
+    def _write(self, log_type: str, source: str, event: str = "", fields: Optional[Dict[str, Any]] = None,
+               message: str = "", level: str = "info"):
         log = LogEntry(
-            timestamp=datetime.now().isoformat(),
-            type="sensor",
-            source=data.get("device_name", "Unknown"),
-            message=f"Датчик {data.get('type', 'unknown')}: {data.get('value', 'N/A')}"
+            timestamp=self.clock.now().isoformat(),
+            type=log_type,
+            source=source,
+            message=message,
+            level=level,
+            event=event,
+            fields=fields or {}
         )
-        self.storage.add_log(log)
+        if self.sink is not None:
+            self.sink.put(log)
+        else:
+            self.storage.add_log(log)
+    
+    def _log_sensor(self, event: dict):
+        """Логировать обновление датчика"""
+        data = event.get("data", {})
+        if "devices" in data:
+            self._log_sensor_batch(data)
+            return
+        if not self.filter.allow("sensor", "debug", data.get("device_id")):
+            return
+        fields = {
+            "device_id": data.get("device_id"),
+            "type": data.get("type", "unknown"),
+            "value": data.get("value", "N/A")
+        }
+        if data.get("heartbeat"):
+            fields["heartbeat"] = True
+        self._write("sensor", data.get("device_name", "Unknown"), "sensor", fields, level="debug")
+    
+    def _log_sensor_batch(self, data: dict):
+        """Логировать пакет показаний одной записью
+        
+        Показания, прошедшие фильтр по устройству, хранятся компактным
+        списком [ID устройства, название, тип, значение].
+        """
+        readings = [
+            [item.get("device_id"), item.get("device_name", "Unknown"), item.get("type", "unknown"),
+             item.get("value", "N/A")]
+            for item in batch_items(data)
+            if self.filter.allow("sensor", "debug", item.get("device_id"))
+        ]
+        if not readings:
+            return
+        self._write("sensor", data.get("source") or "Пакет датчиков", "sensor_batch",
+                    {"count": len(readings), "readings": readings}, level="debug")
     
     def _log_actuator(self, event: dict):
         """Логировать обновление актуатора"""
         data = event.get("data", {})
-        log = LogEntry(
-            timestamp=datetime.now().isoformat(),
-            type="actuator",
-            source=data.get("device_name", "Unknown"),
-            message=f"Устройство {data.get('action', 'unknown')}: {data.get('state', {})}"
-        )
-        self.storage.add_log(log)
+        if "devices" in data:
+            self._log_actuator_batch(data)
+            return
+        if not self.filter.allow("actuator", "info", data.get("device_id")):
+            return
+        self._write("actuator", data.get("device_name", "Unknown"), "actuator",
+                    {"action": data.get("action", "unknown"), "state": data.get("state", {})})
+    
+    def _log_actuator_batch(self, data: dict):
+        """Логировать пакетное управление одной записью"""
+        if not self.filter.allow("actuator", "info"):
+            return
+        devices = [
+            [item.get("device_name", "Unknown"), item.get("action", "unknown")]
+            for item in batch_items(data)
+        ]
+        self._write("actuator", data.get("source") or "Пакетное управление", "actuator_batch",
+                    {"devices": devices})
     
     def _log_rule(self, event: dict):
         """Логировать срабатывание правила"""
         data = event.get("data", {})
-        log = LogEntry(
-            timestamp=datetime.now().isoformat(),
-            type="rule",
-            source=data.get("rule_name", "Unknown Rule"),
-            message=f"Правило сработало: {data.get('action', 'unknown')} на устройстве {data.get('device_id', 'unknown')}"
-        )
-        self.storage.add_log(log)
+        if not self.filter.allow("rule", "info"):
+            return
+        actions = [
+            {key: a[key] for key in ("action", "device_id", "delay") if a.get(key) is not None}
+            for a in data.get("actions", [data])
+        ]
+        self._write("rule", data.get("rule_name", "Unknown Rule"), "rule", {"actions": actions})
+    
+    def _log_rule_blocked(self, event: dict):
+        """Логировать подавленное срабатывание правила"""
+        data = event.get("data", {})
+        if not self.filter.allow("rule", "warning"):
+            return
+        self._write("rule", data.get("rule_name", "Unknown Rule"), "rule_blocked",
+                    {"reason": data.get("reason", "")}, level="warning")
+    
+    def _log_health(self, event: dict):
+        """Логировать потерю и восстановление связи с устройством"""
+        data = event.get("data", {})
+        level = "warning" if event["type"] == "device_offline" else "info"
+        if not self.filter.allow("system", level):
+            return
+        self._write("system", data.get("device_name", "Unknown"), event["type"],
+                    {"device_id": data.get("device_id")}, level=level)
     
     def log_system(self, message: str):
         """Логировать системное сообщение"""
-        log = LogEntry(
-            timestamp=datetime.now().isoformat(),
-            type="system",
-            source="System",
-            message=message
-        )
-        self.storage.add_log(log)
+        self._write("system", "System", message=message)
+    
+    def close(self):
+        """Дописать буфер логов в хранилище"""
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
@@ -0,0 +1,212 @@
+"""Сроки хранения логов и их уплотнение
+
+LogCompactor по расписанию проходит логи от старых к новым окнами по
+BATCH записей: записи старше срока хранения своего типа удаляются, а
+показания датчиков сворачиваются в почасовые сводки (мин/макс/среднее
+по устройству). За один проход читается и переписывается не больше
+одного окна, между проходами управление возвращается циклу событий.
+"""
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from ..core.clock import SystemClock
+from ..core.models import LogEntry
+
+
+class LogCompactor:
+    """Фоновое уплотнение логов по срокам хранения (settings["retention"], часы)"""
+    
+    # Пауза между полными обходами логов (с)
+    INTERVAL = 600
+    # Пауза между проходами одного обхода (с)
+    PASS_DELAY = 1.0
+    # Записей за один проход
+    BATCH = 500
+    
+    def __init__(self, storage, scheduler, event_bus=None, clock=None):
+        self.storage = storage
+        self.scheduler = scheduler
+        self.event_bus = event_bus
+        self.clock = clock or SystemClock()
+        self._handle: Optional[int] = None
+        self._cursor = 0
+        self._cutoffs: Dict[str, str] = {}
+        # Записи новее horizon не устаревают ни по одному сроку - обход можно закончить
+        self._horizon = ""
+        self._finished = False
+        self._removed = 0
+        self._summaries = 0
+        # Записей в конце окна, которые следующее окно читает заново
+        self._revisit = 0
+    
+    def start(self, delay: float = PASS_DELAY):
+        """Запустить уплотнение по расписанию"""
+        self.stop()
+        self._handle = self.scheduler.call_later(delay, self._on_timer)
+    
+    def stop(self):
+        """Остановить уплотнение"""
+        if self._handle is not None:
+            self.scheduler.cancel(self._handle)
+            self._handle = None
+    
+    def _on_timer(self):
+        """Выполнить проход и запланировать следующий"""
+        self._handle = None
+        more = self.run_pass()
+        self._handle = self.scheduler.call_later(self.PASS_DELAY if more else self.INTERVAL, self._on_timer)
+    
+    def run_pass(self) -> bool:
+        """Обработать одно окно логов, вернуть True, если обход не закончен"""
+        if self._cursor == 0:
+            self._begin_round()
+            if not self._cutoffs:
+                return False
+        self._finished = False
+        size, total = self.storage.compact_logs(self._cursor, self.BATCH, self._compact)
+        if not self._finished and self._cursor + size < total:
+            self._cursor += size - self._revisit
+            return True
+        
+        self._cursor = 0
+        if (self._removed or self._summaries) and self.event_bus is not None:
+            self.event_bus.emit("logs_compacted", {"removed": self._removed, "summaries": self._summaries})
+        return False
+    
+    def run(self):
+        """Выполнить полный обход сразу"""
+        while self.run_pass():
+            pass
+    
+    def _begin_round(self):
+        """Вычислить границы хранения на начало обхода"""
+        now = self.clock.now()
+        retention = self.storage.get_settings().get("retention", {})
+        self._cutoffs = {
+            key: (now - timedelta(hours=hours)).isoformat()
+            for key, hours in retention.items() if hours
+        }
+        self._horizon = max(self._cutoffs.values(), default="")
+        self._removed = 0
+        self._summaries = 0
+    
+    def _compact(self, window: List[dict]) -> List[dict]:
+        """Удалить устаревшие записи окна, показания датчиков свернуть в сводки
+        
+        Показания дописываются в уже существующую сводку того же устройства
+        за тот же час, если она попала в окно. Последний час окна может
+        продолжаться в следующем, поэтому следующее окно начинается с его
+        первой сводки (self._revisit записей от конца результата).
+        """
+        cutoffs = self._cutoffs
+        summary_cutoff = cutoffs.get("summary", "")
+        result: List[dict] = []
+        buckets: Dict[tuple, Dict[str, Any]] = {}
+        last_hour = ""
+        self._revisit = 0
+        for i, log in enumerate(window):
+            timestamp = log["timestamp"]
+            if timestamp >= self._horizon:
+                # Логи идут по времени - дальше устаревших записей нет
+                self._finished = True
+                result.extend(window[i:])
+                break
+            last_hour = timestamp[:13]
+            summary = log.get("event") == "sensor_summary"
+            cutoff = cutoffs.get("summary" if summary else log["type"])
+            if cutoff is None or timestamp >= cutoff:
+                if summary:
+                    self._merge_summary(log, buckets, result)
+                else:
+                    result.append(log)
+                continue
+            self._removed += 1
+            if log["type"] != "sensor" or summary:
+                continue
+            
+            fields = log.get("fields", {})
+            hour = timestamp[:13] + ":00:00"
+            if hour < summary_cutoff:
+                continue
+            for source, device_id, sensor_type, value, count in self._readings(log):
+                key = (source, device_id, sensor_type, hour)
+                bucket = buckets.get(key)
+                if bucket is None:
+                    bucket = buckets[key] = self._new_bucket(len(result))
+                    result.append(log)  # место сводки, заменяется ниже
+                bucket["changed"] = True
+                bucket["count"] += count
+                self._add_value(bucket, value)
+        
+        changed = 0
+        for (source, device_id, sensor_type, hour), bucket in buckets.items():
+            if not bucket["changed"]:
+                continue
+            changed += 1
+            fields = {"device_id": device_id, "type": sensor_type, "count": bucket["count"]}
+            if bucket["numeric"]:
+                fields.update(min=bucket["min"], max=bucket["max"],
+                              avg=round(bucket["total"] / bucket["numeric"], 2))
+            elif bucket["true"]:
+                fields["true"] = bucket["true"]
+            result[bucket["position"]] = LogEntry(
+                timestamp=hour, type="sensor", source=source, level="debug",
+                event="sensor_summary", fields=fields
+            ).to_dict()
+        self._summaries += changed
+        
+        if not self._finished:
+            positions = [b["position"] for key, b in buckets.items() if key[3][:13] == last_hour]
+            # Окно, которое ничего не уменьшило, повторять нельзя - обход не продвинется
+            if positions and (min(positions) > 0 or len(result) < len(window)):
+                self._revisit = len(result) - min(positions)
+        return result
+    
+    @staticmethod
+    def _readings(log: dict) -> List[tuple]:
+        """Показания записи: (источник, ID устройства, тип, значение, число показаний)"""
+        fields = log.get("fields", {})
+        if log.get("event") != "sensor_batch":
+            return [(log["source"], fields.get("device_id"), fields.get("type"), fields.get("value"), 1)]
+        if "readings" in fields:
+            return [(name, device_id, sensor_type, value, 1)
+                    for device_id, name, sensor_type, value in fields["readings"]]
+        # Старые пакетные записи хранят только число показаний
+        return [(log["source"], None, None, None, fields.get("count", 1))]
+    
+    @staticmethod
+    def _new_bucket(position: int) -> Dict[str, Any]:
+        """Пустая сводка; position - её место в результате окна"""
+        return {"count": 0, "true": 0, "numeric": 0, "total": 0.0, "min": None, "max": None,
+                "position": position, "changed": False}
+    
+    @staticmethod
+    def _add_value(bucket: Dict[str, Any], value: Any):
+        """Учесть значение показания в сводке"""
+        if isinstance(value, bool):
+            bucket["true"] += value
+        elif isinstance(value, (int, float)):
+            bucket["numeric"] += 1
+            bucket["total"] += value
+            bucket["min"] = value if bucket["min"] is None else min(bucket["min"], value)
+            bucket["max"] = value if bucket["max"] is None else max(bucket["max"], value)
+    
+    def _merge_summary(self, log: dict, buckets: Dict[tuple, Dict[str, Any]], result: List[dict]):
+        """Учесть сохранённую сводку: первая за час становится основой, остальные сливаются в неё"""
+        fields = log.get("fields", {})
+        key = (log["source"], fields.get("device_id"), fields.get("type"), log["timestamp"])
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = self._new_bucket(len(result))
+            result.append(log)
+        else:
+            bucket["changed"] = True
+        count = fields.get("count", 0)
+        bucket["count"] += count
+        bucket["true"] += fields.get("true", 0)
+        if "avg" in fields:
+            bucket["numeric"] += count
+            bucket["total"] += fields["avg"] * count
+            for name, pick in (("min", min), ("max", max)):
+                value = fields[name]
+                bucket[name] = value if bucket[name] is None else pick(bucket[name], value)
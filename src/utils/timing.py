@@ -0,0 +1,27 @@
+"""Замер времени этапов запуска"""
+import time
+from typing import List, Tuple
+
+
+class StageTimer:
+    """Секундомер с разбивкой по этапам"""
+    
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._last = self._start
+        self.stages: List[Tuple[str, float]] = []
+    
+    def mark(self, stage: str):
+        """Завершить этап и запомнить его длительность (мс)"""
+        now = time.perf_counter()
+        self.stages.append((stage, (now - self._last) * 1000))
+        self._last = now
+    
+    def total(self) -> float:
+        """Общее время с момента создания (мс)"""
+        return (self._last - self._start) * 1000
+    
+    def summary(self) -> str:
+        """Текстовая разбивка по этапам"""
+        parts = [f"{stage} {ms:.0f} мс" for stage, ms in self.stages]
+        return f"{', '.join(parts)}; всего {self.total():.0f} мс"
@@ -0,0 +1,32 @@
+"""Общие фикстуры тестов"""
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtWidgets import QApplication
+
+from src.core.event_bus import EventBus
+
+
+@pytest.fixture(scope="session")
+def app():
+    return QApplication.instance() or QApplication(sys.argv[:1])
+
+
+@pytest.fixture(scope="session")
+def event_bus(app):
+    # Шина событий - синглтон, создаётся один раз на все тесты
+    return EventBus()
+
+
+@pytest.fixture
+def storage(tmp_path):
+    from src.storage.storage import Storage
+    
+    storage = Storage(str(tmp_path / "state.json"))
+    yield storage
+    storage.close()
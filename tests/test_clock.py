@@ -0,0 +1,23 @@
+"""Тесты виртуальных часов и планировщика"""
+from datetime import datetime, timedelta
+
+from src.core.clock import VirtualClock, VirtualScheduler
+
+
+def test_cancelled_tasks_are_not_counted_or_run():
+    clock = VirtualClock(datetime(2026, 1, 1))
+    scheduler = VirtualScheduler(clock)
+    calls = []
+    first = scheduler.call_later(10, calls.append, "first")
+    scheduler.call_later(20, calls.append, "second")
+    scheduler.cancel(first)
+    assert len(scheduler) == 1
+    
+    scheduler.run_until(clock.now() + timedelta(seconds=30))
+    assert calls == ["second"]
+    assert len(scheduler) == 0
+    
+    # Отмена уже выполненной задачи не влияет на счётчик
+    scheduler.cancel(first)
+    scheduler.call_later(10, calls.append, "third")
+    assert len(scheduler) == 1
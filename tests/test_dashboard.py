@@ -0,0 +1,32 @@
+"""Тесты главного экрана"""
+from src.core.scenes import SceneManager
+from src.core.simulator import SimulatorManager
+from src.ui.dashboard import DashboardWidget
+
+
+def test_sensor_update_changes_label_in_place(app, event_bus, storage):
+    simulator_manager = SimulatorManager(event_bus, storage, fast_forward=True)
+    widget = DashboardWidget(storage, event_bus, simulator_manager,
+                             SceneManager(storage, event_bus, simulator_manager))
+    widget.show()
+    app.processEvents()
+    
+    sensor = next(d for d in storage.get_devices() if d.type == "temperature")
+    label = widget._sensor_labels[sensor.id]
+    labels = dict(widget._sensor_labels)
+    event_bus.emit("sensor_update", {"devices": [{
+        "device_id": sensor.id, "device_name": sensor.name, "type": sensor.type,
+        "value": 42.5, "room_id": sensor.room_id, "last_seen": sensor.last_seen
+    }]})
+    app.processEvents()
+    
+    assert "42.5" in label.text()
+    # Карточки не перестраивались
+    assert widget._sensor_labels == labels
+    
+    event_bus.emit("devices_changed", {})
+    app.processEvents()
+    assert widget._sensor_labels[sensor.id] is not label
+    widget.close()
+    widget.deleteLater()
+    simulator_manager.stop_all()
@@ -0,0 +1,38 @@
+"""Тесты модели комнат"""
+import pytest
+
+from src.core.physics import RoomPhysics
+
+
+def _equilibrium(*actuators):
+    physics = RoomPhysics()
+    physics.add_room("room")
+    for i, device_type in enumerate(actuators):
+        physics.set_actuator(f"dev_{i}", "room", device_type, {"powered": True})
+    # Десять суток модельного времени - заведомо больше постоянной времени
+    physics.step(10 * 24 * 3600)
+    return physics.room_temperature("room"), physics.room_humidity("room")
+
+
+def test_comfort_without_actuators():
+    temperature, humidity = _equilibrium()
+    assert temperature == pytest.approx(21.0)
+    assert humidity == pytest.approx(45.0)
+
+
+def test_heater_settles_a_few_degrees_above_comfort():
+    temperature, humidity = _equilibrium("heater")
+    assert 23.0 <= temperature <= 28.0
+    assert 30.0 <= humidity < 45.0
+
+
+def test_fan_cools_mildly():
+    temperature, _ = _equilibrium("fan")
+    assert 16.0 <= temperature < 21.0
+    # Вентилятор сдерживает обогреватель, но не переохлаждает комнату
+    assert 21.0 < _equilibrium("heater", "fan")[0] < _equilibrium("heater")[0]
+
+
+def test_kettle_does_not_saturate_humidity():
+    _, humidity = _equilibrium("kettle")
+    assert 45.0 < humidity < 80.0
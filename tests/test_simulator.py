@@ -0,0 +1,22 @@
+"""Тесты симулятора устройств"""
+from datetime import datetime
+
+from src.core.clock import VirtualClock
+from src.core.simulator import SimulatorManager
+
+
+def test_fast_forward_saves_sensor_readings(event_bus, storage):
+    manager = SimulatorManager(event_bus, storage, seed=42, clock=VirtualClock(datetime(2026, 1, 1)),
+                               fast_forward=True)
+    for device in storage.get_devices():
+        manager.add_device(device)
+    
+    assert manager.fast_forward(3600) > 0
+    
+    saved = {d.id: d for d in storage.get_devices()}
+    sensors = [s.device for s in manager.simulators.values() if s.device.category == "sensor"]
+    assert sensors
+    for device in sensors:
+        assert saved[device.id].state["value"] == device.state["value"]
+        assert saved[device.id].last_seen == device.last_seen
+    manager.stop_all()
@@ -0,0 +1,38 @@
+"""Тесты хранилища"""
+from src.core.models import LogEntry, Room
+from src.storage.storage import Storage
+
+
+def test_corrupt_snapshot_moves_journal_aside(tmp_path):
+    storage = Storage(str(tmp_path / "state.json"))
+    storage._journal.close()
+    storage._journal = None
+    # Журнал с записью, которая не должна попасть в демо-данные
+    storage.journal_file.write_text(
+        '{"seq": 1, "op": "add_room", "data": {"id": "room_x", "name": "Старая"}}\n', encoding="utf-8"
+    )
+    storage.data_file.write_text("{not json", encoding="utf-8")
+    
+    storage = Storage(str(tmp_path / "state.json"))
+    
+    assert "room_x" not in {r.id for r in storage.get_rooms()}
+    assert (tmp_path / "state.json.corrupt").exists()
+    assert (tmp_path / "state.journal.corrupt").exists()
+    storage.close()
+
+
+def test_reset_demo_data(tmp_path):
+    storage = Storage(str(tmp_path / "state.json"))
+    storage.add_room(Room(id="room_x", name="Новая"))
+    storage.add_log(LogEntry(timestamp="2026-01-01T00:00:00", type="system", source="test", message="до сброса"))
+    
+    storage.reset_demo_data()
+    
+    assert storage.get_logs_after(0) == ([], 0)
+    storage.add_log(LogEntry(timestamp="2026-01-01T00:01:00", type="system", source="test", message="после сброса"))
+    assert len(storage.get_logs_after(0)[0]) == 1
+    storage.close()
+    reopened = Storage(str(tmp_path / "state.json"))
+    assert "room_x" not in {r.id for r in reopened.get_rooms()}
+    assert len(reopened.get_logs_after(0)[0]) == 1
+    reopened.close()
@@ -0,0 +1,28 @@
+"""Тесты расчёта времени срабатывания по cron"""
+from datetime import datetime
+
+import pytest
+
+from src.core.triggers import next_cron, parse_cron
+
+
+def test_day_of_month_or_day_of_week():
+    # 2026-10-19 - понедельник; следующие совпадения: понедельник 26-го и 1 ноября (воскресенье)
+    assert next_cron("0 7 1 * 1", datetime(2026, 10, 19, 8, 0)) == datetime(2026, 10, 26, 7, 0)
+    assert next_cron("0 7 1 * 1", datetime(2026, 10, 27)) == datetime(2026, 11, 1, 7, 0)
+
+
+def test_day_of_week_alone_keeps_and():
+    assert next_cron("0 7 * * 1", datetime(2026, 10, 20)) == datetime(2026, 10, 26, 7, 0)
+    assert next_cron("0 7 */2 * 1", datetime(2026, 10, 20)) == datetime(2026, 11, 9, 7, 0)
+
+
+def test_start_with_step():
+    assert parse_cron("5/15 * * * *")[0] == {5, 20, 35, 50}
+    assert next_cron("5/15 * * * *", datetime(2026, 1, 1, 10, 36)) == datetime(2026, 1, 1, 10, 50)
+
+
+@pytest.mark.parametrize("expr", ["60/5 * * * *", "* * * * 0/0", "MON * * * *", "* * * *"])
+def test_invalid_expressions(expr):
+    with pytest.raises(ValueError):
+        parse_cron(expr)